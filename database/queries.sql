@@ -5,6 +5,12 @@
 -- 1. DÉTECTION DE CONFLITS
 -- ============================================
 
+-- Répartition effective des examens par salle
+-- (examen_salles contient toutes les salles de chaque examen, salle principale comprise)
+CREATE OR REPLACE VIEW repartition_salles AS
+SELECT es.examen_id, es.salle_id, es.nb_places
+FROM examen_salles es;
+
 -- Conflits étudiants (plus d'1 examen par jour)
 CREATE OR REPLACE VIEW conflits_etudiants AS
 SELECT 
@@ -38,40 +44,118 @@ JOIN modules m ON ex.module_id = m.id
 GROUP BY p.id, p.nom, p.prenom, DATE(ex.date_heure)
 HAVING COUNT(DISTINCT ex.id) > 3;
 
--- Conflits de capacité des salles
+-- Conflits de capacité des salles (capacité cumulée des salles de l'examen,
+-- ou une salle recevant plus d'étudiants que sa capacité)
+DROP VIEW IF EXISTS conflits_capacite;
 CREATE OR REPLACE VIEW conflits_capacite AS
 SELECT 
     ex.id as examen_id,
     m.nom as module,
-    l.nom as salle,
-    l.capacite_examen as capacite_max,
+    STRING_AGG(l.nom, ', ' ORDER BY l.nom) as salle,
+    SUM(l.capacite_examen) as capacite_max,
     ex.nb_inscrits,
-    ex.nb_inscrits - l.capacite_examen as depassement,
+    GREATEST(ex.nb_inscrits - SUM(l.capacite_examen), MAX(rs.nb_places - l.capacite_examen)) as depassement,
     ex.date_heure
 FROM examens ex
 JOIN modules m ON ex.module_id = m.id
-JOIN lieu_examen l ON ex.salle_id = l.id
-WHERE ex.nb_inscrits > l.capacite_examen;
+JOIN repartition_salles rs ON rs.examen_id = ex.id
+JOIN lieu_examen l ON rs.salle_id = l.id
+GROUP BY ex.id, m.nom, ex.nb_inscrits, ex.date_heure
+HAVING ex.nb_inscrits > SUM(l.capacite_examen)
+    OR BOOL_OR(rs.nb_places > l.capacite_examen);
 
 -- Conflits de chevauchement de salles
+-- Balayage par salle : la fenêtre donne, pour chaque occupation, la fin la plus tardive
+-- des occupations précédentes de la salle (par début). Seules les occupations qui
+-- commencent avant cette fin sont rapprochées de leurs prédécesseurs, au lieu de
+-- comparer toutes les paires d'examens de chaque salle.
 CREATE OR REPLACE VIEW conflits_salles AS
+WITH occupations AS (
+    SELECT es.salle_id, es.examen_id,
+           lower(es.creneau) as debut,
+           upper(es.creneau) as fin
+    FROM examen_salles es
+),
+balayage AS (
+    SELECT o.*,
+           MAX(o.fin) OVER (
+               PARTITION BY o.salle_id ORDER BY o.debut, o.examen_id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+           ) as fin_precedente
+    FROM occupations o
+),
+paires AS (
+    SELECT b.salle_id,
+           LEAST(a.examen_id, b.examen_id) as examen1_id,
+           GREATEST(a.examen_id, b.examen_id) as examen2_id
+    FROM balayage b
+    JOIN occupations a ON a.salle_id = b.salle_id
+                      AND (a.debut, a.examen_id) < (b.debut, b.examen_id)
+                      AND a.fin > b.debut
+    WHERE b.debut < b.fin_precedente
+)
 SELECT 
-    ex1.id as examen1_id,
-    ex2.id as examen2_id,
+    p.examen1_id,
+    p.examen2_id,
     l.nom as salle,
     m1.nom as module1,
     m2.nom as module2,
     ex1.date_heure as debut1,
-    ex1.date_heure + (ex1.duree_minutes || ' minutes')::INTERVAL as fin1,
+    upper(ex1.creneau) as fin1,
+    ex2.date_heure as debut2,
+    upper(ex2.creneau) as fin2
+FROM paires p
+JOIN examens ex1 ON p.examen1_id = ex1.id
+JOIN examens ex2 ON p.examen2_id = ex2.id
+JOIN lieu_examen l ON p.salle_id = l.id
+JOIN modules m1 ON ex1.module_id = m1.id
+JOIN modules m2 ON ex2.module_id = m2.id;
+
+-- Chevauchements horaires des professeurs (surveillances), même balayage par professeur
+CREATE OR REPLACE VIEW chevauchements_professeurs AS
+WITH affectations AS (
+    SELECT s.prof_id, s.examen_id,
+           lower(ex.creneau) as debut,
+           upper(ex.creneau) as fin
+    FROM surveillances s
+    JOIN examens ex ON s.examen_id = ex.id
+),
+balayage AS (
+    SELECT a.*,
+           MAX(a.fin) OVER (
+               PARTITION BY a.prof_id ORDER BY a.debut, a.examen_id
+               ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING
+           ) as fin_precedente
+    FROM affectations a
+),
+paires AS (
+    SELECT b.prof_id,
+           LEAST(a.examen_id, b.examen_id) as examen1_id,
+           GREATEST(a.examen_id, b.examen_id) as examen2_id
+    FROM balayage b
+    JOIN affectations a ON a.prof_id = b.prof_id
+                       AND (a.debut, a.examen_id) < (b.debut, b.examen_id)
+                       AND a.fin > b.debut
+    WHERE b.debut < b.fin_precedente
+)
+SELECT 
+    p.examen1_id,
+    p.examen2_id,
+    p.prof_id,
+    pr.nom,
+    pr.prenom,
+    m1.nom as module1,
+    m2.nom as module2,
+    ex1.date_heure as debut1,
+    upper(ex1.creneau) as fin1,
     ex2.date_heure as debut2,
-    ex2.date_heure + (ex2.duree_minutes || ' minutes')::INTERVAL as fin2
-FROM examens ex1
-JOIN examens ex2 ON ex1.salle_id = ex2.salle_id AND ex1.id < ex2.id
-JOIN lieu_examen l ON ex1.salle_id = l.id
+    upper(ex2.creneau) as fin2
+FROM paires p
+JOIN professeurs pr ON p.prof_id = pr.id
+JOIN examens ex1 ON p.examen1_id = ex1.id
+JOIN examens ex2 ON p.examen2_id = ex2.id
 JOIN modules m1 ON ex1.module_id = m1.id
-JOIN modules m2 ON ex2.module_id = m2.id
-WHERE ex1.date_heure < ex2.date_heure + (ex2.duree_minutes || ' minutes')::INTERVAL
-  AND ex2.date_heure < ex1.date_heure + (ex1.duree_minutes || ' minutes')::INTERVAL;
+JOIN modules m2 ON ex2.module_id = m2.id;
 
 -- ============================================
 -- 2. KPIs GLOBAUX
@@ -94,13 +178,14 @@ SELECT
 CREATE OR REPLACE VIEW occupation_salles_par_jour AS
 SELECT 
     DATE(ex.date_heure) as date_examen,
-    COUNT(DISTINCT ex.salle_id) as salles_utilisees,
+    COUNT(DISTINCT rs.salle_id) as salles_utilisees,
     (SELECT COUNT(*) FROM lieu_examen WHERE disponible = TRUE) as salles_disponibles,
-    ROUND(100.0 * COUNT(DISTINCT ex.salle_id) / 
+    ROUND(100.0 * COUNT(DISTINCT rs.salle_id) / 
           (SELECT COUNT(*) FROM lieu_examen WHERE disponible = TRUE), 2) as taux_occupation_pct,
-    SUM(ex.nb_inscrits) as total_etudiants_examens,
-    COUNT(ex.id) as nb_examens
+    SUM(rs.nb_places) as total_etudiants_examens,
+    COUNT(DISTINCT ex.id) as nb_examens
 FROM examens ex
+JOIN repartition_salles rs ON rs.examen_id = ex.id
 WHERE ex.statut = 'planifié'
 GROUP BY DATE(ex.date_heure)
 ORDER BY date_examen;
@@ -166,14 +251,20 @@ BEGIN
         ex.date_heure,
         m.nom::TEXT as module,
         m.code::TEXT as code_module,
-        l.nom::TEXT as salle,
-        l.batiment::TEXT,
+        r.salles as salle,
+        r.batiments as batiment,
         ex.duree_minutes,
         (p.nom || ' ' || p.prenom)::TEXT as professeur
     FROM inscriptions i
     JOIN examens ex ON i.module_id = ex.module_id
     JOIN modules m ON ex.module_id = m.id
-    JOIN lieu_examen l ON ex.salle_id = l.id
+    JOIN LATERAL (
+        SELECT STRING_AGG(l.nom, ', ' ORDER BY l.nom)::TEXT as salles,
+               STRING_AGG(DISTINCT l.batiment, ', ')::TEXT as batiments
+        FROM repartition_salles rs
+        JOIN lieu_examen l ON rs.salle_id = l.id
+        WHERE rs.examen_id = ex.id
+    ) r ON TRUE
     JOIN professeurs p ON ex.prof_responsable_id = p.id
     WHERE i.etudiant_id = p_etudiant_id
       AND ex.periode_id = p_periode_id
@@ -198,15 +289,21 @@ BEGIN
     SELECT 
         ex.date_heure,
         m.nom::TEXT as module_nom,
-        l.nom::TEXT as salle_nom,
-        l.batiment::TEXT,
+        r.salles as salle_nom,
+        r.batiments as batiment,
         ex.duree_minutes,
         ex.nb_inscrits,
         s.role::TEXT
     FROM surveillances s
     JOIN examens ex ON s.examen_id = ex.id
     JOIN modules m ON ex.module_id = m.id
-    JOIN lieu_examen l ON ex.salle_id = l.id
+    JOIN LATERAL (
+        SELECT STRING_AGG(l.nom, ', ' ORDER BY l.nom)::TEXT as salles,
+               STRING_AGG(DISTINCT l.batiment, ', ')::TEXT as batiments
+        FROM repartition_salles rs
+        JOIN lieu_examen l ON rs.salle_id = l.id
+        WHERE rs.examen_id = ex.id
+    ) r ON TRUE
     WHERE s.prof_id = p_prof_id
       AND ex.periode_id = p_periode_id
     ORDER BY ex.date_heure;
@@ -224,13 +321,14 @@ SELECT
     l.nom as salle,
     l.batiment,
     l.capacite_examen,
-    COALESCE(AVG(ex.nb_inscrits), 0) as moyenne_occupation,
-    ROUND(100.0 * COALESCE(AVG(ex.nb_inscrits), 0) / l.capacite_examen, 2) as taux_utilisation_pct,
+    COALESCE(AVG(rs.nb_places) FILTER (WHERE ex.id IS NOT NULL), 0) as moyenne_occupation,
+    ROUND(100.0 * COALESCE(AVG(rs.nb_places) FILTER (WHERE ex.id IS NOT NULL), 0) / l.capacite_examen, 2) as taux_utilisation_pct,
     COUNT(ex.id) as nb_utilisations
 FROM lieu_examen l
-LEFT JOIN examens ex ON l.id = ex.salle_id AND ex.statut = 'planifié'
+LEFT JOIN repartition_salles rs ON l.id = rs.salle_id
+LEFT JOIN examens ex ON rs.examen_id = ex.id AND ex.statut = 'planifié'
 GROUP BY l.id, l.nom, l.batiment, l.capacite_examen
-HAVING COALESCE(AVG(ex.nb_inscrits), 0) < l.capacite_examen * 0.5
+HAVING COALESCE(AVG(rs.nb_places) FILTER (WHERE ex.id IS NOT NULL), 0) < l.capacite_examen * 0.5
 ORDER BY taux_utilisation_pct;
 
 -- Distribution des examens par jour de la semaine
@@ -238,10 +336,11 @@ CREATE OR REPLACE VIEW distribution_examens_semaine AS
 SELECT 
     TO_CHAR(ex.date_heure, 'Day') as jour_semaine,
     EXTRACT(DOW FROM ex.date_heure) as jour_numero,
-    COUNT(ex.id) as nb_examens,
-    SUM(ex.nb_inscrits) as total_etudiants,
-    COUNT(DISTINCT ex.salle_id) as salles_utilisees
+    COUNT(DISTINCT ex.id) as nb_examens,
+    SUM(rs.nb_places) as total_etudiants,
+    COUNT(DISTINCT rs.salle_id) as salles_utilisees
 FROM examens ex
+JOIN repartition_salles rs ON rs.examen_id = ex.id
 WHERE ex.statut = 'planifié'
 GROUP BY TO_CHAR(ex.date_heure, 'Day'), EXTRACT(DOW FROM ex.date_heure)
 ORDER BY jour_numero;
@@ -2,7 +2,12 @@
 -- Schéma de base de données PostgreSQL
 
 -- Suppression des tables existantes (ordre inverse des dépendances)
+DROP TABLE IF EXISTS schedule_jobs CASCADE;
 DROP TABLE IF EXISTS utilisateurs CASCADE;
+DROP TABLE IF EXISTS surveillances_staging CASCADE;
+DROP TABLE IF EXISTS examen_salles_staging CASCADE;
+DROP TABLE IF EXISTS examens_staging CASCADE;
+DROP TABLE IF EXISTS examen_salles CASCADE;
 DROP TABLE IF EXISTS examens CASCADE;
 DROP TABLE IF EXISTS surveillances CASCADE;
 DROP TABLE IF EXISTS inscriptions CASCADE;
@@ -14,6 +19,9 @@ DROP TABLE IF EXISTS lieu_examen CASCADE;
 DROP TABLE IF EXISTS departements CASCADE;
 DROP TABLE IF EXISTS periodes_examen CASCADE;
 
+-- GiST sur des colonnes scalaires (salle_id) pour les contraintes d'exclusion
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
 -- Table des départements
 CREATE TABLE departements (
     id SERIAL PRIMARY KEY,
@@ -121,9 +129,56 @@ CREATE TABLE examens (
     nb_inscrits INTEGER NOT NULL DEFAULT 0 CHECK (nb_inscrits >= 0),
     statut VARCHAR(20) DEFAULT 'planifié' CHECK (statut IN ('planifié', 'en_cours', 'terminé', 'annulé')),
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    -- Plage [début, fin) de l'examen, indexable (GiST) pour les tests de chevauchement
+    creneau TSRANGE GENERATED ALWAYS AS (tsrange(date_heure, date_heure + duree_minutes * INTERVAL '1 minute')) STORED,
     CONSTRAINT unique_examen UNIQUE (module_id, periode_id)
 );
 
+-- Salles occupées par chaque examen (même créneau), salle principale examens.salle_id comprise :
+-- une ligne par salle, y compris pour un examen dans une seule salle. Toute occupation de salle
+-- est donc ici, et une seule contrainte d'exclusion interdit les doubles réservations.
+CREATE TABLE examen_salles (
+    id SERIAL PRIMARY KEY,
+    examen_id INTEGER NOT NULL REFERENCES examens(id) ON DELETE CASCADE,
+    salle_id INTEGER NOT NULL REFERENCES lieu_examen(id) ON DELETE RESTRICT,
+    nb_places INTEGER NOT NULL CHECK (nb_places >= 0),
+    -- Copie de examens.creneau, tenue à jour par les triggers ci-dessous
+    creneau TSRANGE NOT NULL,
+    CONSTRAINT unique_examen_salle UNIQUE (examen_id, salle_id),
+    -- Une salle n'accueille qu'un examen à la fois (vérifié en fin d'instruction, ou au commit
+    -- après SET CONSTRAINTS ... DEFERRED, pour que les mises à jour en masse puissent échanger deux examens)
+    CONSTRAINT examen_salles_salle_libre EXCLUDE USING GIST (salle_id WITH =, creneau WITH &&)
+        DEFERRABLE INITIALLY IMMEDIATE
+);
+
+-- La salle principale d'un examen a toujours sa ligne dans examen_salles (vérifié au commit,
+-- l'examen et ses salles étant écrits dans la même transaction)
+ALTER TABLE examens ADD CONSTRAINT examens_salle_principale
+    FOREIGN KEY (id, salle_id) REFERENCES examen_salles (examen_id, salle_id)
+    DEFERRABLE INITIALLY DEFERRED;
+
+CREATE OR REPLACE FUNCTION examen_salles_creneau() RETURNS TRIGGER AS $$
+BEGIN
+    SELECT creneau INTO NEW.creneau FROM examens WHERE id = NEW.examen_id;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_examen_salles_creneau
+    BEFORE INSERT OR UPDATE OF examen_id ON examen_salles
+    FOR EACH ROW EXECUTE FUNCTION examen_salles_creneau();
+
+CREATE OR REPLACE FUNCTION examens_creneau_propager() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE examen_salles SET creneau = NEW.creneau WHERE examen_id = NEW.id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER trg_examens_creneau_propager
+    AFTER UPDATE OF date_heure, duree_minutes ON examens
+    FOR EACH ROW EXECUTE FUNCTION examens_creneau_propager();
+
 -- Table des surveillances (affectation des professeurs à la surveillance)
 CREATE TABLE surveillances (
     id SERIAL PRIMARY KEY,
@@ -134,6 +189,35 @@ CREATE TABLE surveillances (
     CONSTRAINT unique_surveillance UNIQUE (examen_id, prof_id)
 );
 
+-- Tables de staging de la génération: le nouvel EDT d'une période y est écrit,
+-- puis basculé dans examens / examen_salles / surveillances en une seule transaction
+CREATE UNLOGGED TABLE examens_staging (
+    periode_id INTEGER NOT NULL,
+    module_id INTEGER NOT NULL,
+    prof_responsable_id INTEGER NOT NULL,
+    salle_id INTEGER NOT NULL,
+    date_heure TIMESTAMP NOT NULL,
+    duree_minutes INTEGER NOT NULL,
+    nb_inscrits INTEGER NOT NULL,
+    PRIMARY KEY (periode_id, module_id)
+);
+
+CREATE UNLOGGED TABLE examen_salles_staging (
+    periode_id INTEGER NOT NULL,
+    module_id INTEGER NOT NULL,
+    salle_id INTEGER NOT NULL,
+    nb_places INTEGER NOT NULL,
+    PRIMARY KEY (periode_id, module_id, salle_id)
+);
+
+-- Surveillants d'un examen en plus du professeur responsable
+CREATE UNLOGGED TABLE surveillances_staging (
+    periode_id INTEGER NOT NULL,
+    module_id INTEGER NOT NULL,
+    prof_id INTEGER NOT NULL,
+    PRIMARY KEY (periode_id, module_id, prof_id)
+);
+
 -- Index pour optimisation des performances
 CREATE INDEX idx_etudiants_formation ON etudiants(formation_id);
 CREATE INDEX idx_etudiants_promo ON etudiants(promo);
@@ -147,11 +231,15 @@ CREATE INDEX idx_examens_salle ON examens(salle_id);
 CREATE INDEX idx_examens_module ON examens(module_id);
 CREATE INDEX idx_examens_periode ON examens(periode_id);
 CREATE INDEX idx_surveillances_prof ON surveillances(prof_id);
+CREATE INDEX idx_examen_salles_salle ON examen_salles(salle_id);
 CREATE INDEX idx_surveillances_examen ON surveillances(examen_id);
 CREATE INDEX idx_professeurs_dept ON professeurs(dept_id);
 
 -- Index composites pour requêtes complexes
 CREATE INDEX idx_examens_date_salle ON examens(date_heure, salle_id);
+-- Chevauchements des professeurs et des étudiants (la contrainte d'exclusion
+-- de examen_salles indexe déjà (salle_id, creneau))
+CREATE INDEX idx_examens_creneau ON examens USING GIST (creneau);
 CREATE INDEX idx_inscriptions_etudiant_annee ON inscriptions(etudiant_id, annee_universitaire);
 
 -- Commentaires sur les tables
@@ -163,7 +251,9 @@ COMMENT ON TABLE professeurs IS 'Corps enseignant';
 COMMENT ON TABLE modules IS 'Modules d''enseignement';
 COMMENT ON TABLE inscriptions IS 'Inscriptions des étudiants aux modules';
 COMMENT ON TABLE examens IS 'Planification des examens';
+COMMENT ON TABLE examen_salles IS 'Salles occupées par chaque examen (salle principale comprise) et répartition des étudiants';
 COMMENT ON TABLE surveillances IS 'Affectation des surveillants aux examens';
+COMMENT ON TABLE examens_staging IS 'EDT en cours de génération, basculé atomiquement par période';
 COMMENT ON TABLE periodes_examen IS 'Périodes d''examen (session normale, rattrapage)';
 
 -- ============================================
@@ -198,3 +288,33 @@ CREATE INDEX idx_utilisateurs_username ON utilisateurs(username);
 CREATE INDEX idx_utilisateurs_role ON utilisateurs(role);
 
 COMMENT ON TABLE utilisateurs IS 'Comptes utilisateurs pour l''authentification (5 rôles: vice_doyen, admin_examens, chef_departement, professeur, etudiant)';
+
+-- ============================================
+-- TÂCHES DE GÉNÉRATION EN ARRIÈRE-PLAN
+-- ============================================
+
+-- File des générations d'EDT, exécutées par src/jobs.py hors du thread Streamlit
+CREATE TABLE schedule_jobs (
+    id SERIAL PRIMARY KEY,
+    periode_id INTEGER NOT NULL REFERENCES periodes_examen(id) ON DELETE CASCADE,
+    annee_universitaire VARCHAR(9) NOT NULL,
+    mode VARCHAR(20) NOT NULL DEFAULT 'complet' CHECK (mode IN ('complet', 'incremental')),
+    options JSONB NOT NULL DEFAULT '{}',
+    statut VARCHAR(20) NOT NULL DEFAULT 'en_attente' CHECK (statut IN ('en_attente', 'en_cours', 'terminé', 'échec')),
+    progression REAL NOT NULL DEFAULT 0 CHECK (progression BETWEEN 0 AND 1),
+    phase VARCHAR(30),
+    message TEXT,
+    resultat JSONB,
+    erreur TEXT,
+    duree_secondes REAL,
+    created_by INTEGER REFERENCES utilisateurs(id) ON DELETE SET NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+-- Au plus une génération en attente ou en cours par période
+CREATE UNIQUE INDEX idx_schedule_jobs_actif ON schedule_jobs(periode_id) WHERE statut IN ('en_attente', 'en_cours');
+CREATE INDEX idx_schedule_jobs_statut ON schedule_jobs(statut, created_at);
+
+COMMENT ON TABLE schedule_jobs IS 'Générations d''EDT en arrière-plan: statut, progression et résultats persistés';
@@ -3,13 +3,14 @@ import pandas as pd
 from datetime import datetime
 import sys
 import os
+import time
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.database import Database
-from src.fast_scheduler import FastScheduler
+from src.jobs import JobRunner, enqueue_job, get_active_job, get_recent_jobs
 from src.analytics import Analytics
-from src.session import require_auth, show_user_sidebar
+from src.session import require_auth, show_user_sidebar, get_current_user
 
 st.set_page_config(
     page_title="Administration Examens",
@@ -29,12 +30,77 @@ def get_database():
 def get_analytics(_db):
     return Analytics(_db)
 
+@st.cache_resource
+def get_job_runner():
+    # One background runner per Streamlit server process, shared by every session
+    return JobRunner(Database()).start()
+
+def show_job_result(job):
+    """Metrics of a finished generation job"""
+    result = job['resultat'] or {}
+    if job['statut'] == 'échec':
+        feasibility = result.get('feasibility')
+        if feasibility:
+            st.error(" Planification impossible pour cette période (génération non lancée) :")
+            for reason in feasibility['reasons']:
+                st.markdown(f"- {reason}")
+            return
+        st.error(f" Échec de la génération : {job['erreur']}")
+        return
+    
+    if job['mode'] == 'incremental':
+        st.success(f" EDT mis à jour ({job['finished_at']:%d/%m %H:%M})")
+        col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+        with col_r1:
+            st.metric("Examens inchangés", result.get('unchanged', 0))
+        with col_r2:
+            st.metric("Examens modifiés", result.get('updated', 0) + result.get('inserted', 0))
+        with col_r3:
+            st.metric("Échecs", result.get('failed', 0))
+        with col_r4:
+            st.metric("Durée", f"{job['duree_secondes'] or 0:.2f}s")
+        if result.get('dropped'):
+            st.warning(f"{result['dropped']} examen(s) ne pouvant être ni replacés ni gardés à leur ancien créneau ont été retirés de l'EDT")
+        return
+    
+    st.success(f" EDT généré avec succès ({job['finished_at']:%d/%m %H:%M})")
+    col_r1, col_r2, col_r3, col_r4 = st.columns(4)
+    with col_r1:
+        st.metric("Examens planifiés", result.get('scheduled', 0))
+    with col_r2:
+        st.metric("Échecs", result.get('failed', 0))
+    with col_r3:
+        st.metric("Créneaux testés", result.get('probes', 0))
+    with col_r4:
+        st.metric("Durée", f"{job['duree_secondes'] or 0:.2f}s")
+    
+    local_search = result.get('local_search')
+    if local_search:
+        st.info(
+            f"Recuit simulé : {local_search['iterations']} itérations, "
+            f"non planifiés {local_search['unplaced_before']} → {local_search['unplaced_after']}, "
+            f"conflits étudiants {local_search['conflicts_before']} → {local_search['conflicts_after']}"
+        )
+    
+    if result.get('violations'):
+        st.warning("Contraintes non respectées avant enregistrement : " + ", ".join(
+            f"{message} ({count} examens)" for message, count in result['violations'].items()
+        ))
+    
+    if result.get('cohorts'):
+        st.caption(
+            f"Étudiants regroupés en {result['cohorts']} cohortes de modules identiques "
+            f"(compression x{result['compression_ratio']})"
+        )
+
 def main():
     st.title(" Administration des Examens")
     st.markdown("**Génération automatique des EDT, détection des conflits et optimisation**")
     
     db = get_database()
     analytics = get_analytics(db)
+    job_runner = get_job_runner()
+    poll_job = False
     
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         " Générer EDT",
@@ -77,48 +143,86 @@ def main():
             
             st.markdown("---")
             
-            col_btn1, col_btn2 = st.columns(2)
+            algorithmes = {
+                "FastScheduler (glouton)": "fast",
+                "DSatur (graphe de conflits)": "dsatur"
+            }
+            algorithme = st.radio("Algorithme", list(algorithmes.keys()), horizontal=True)
+            
+            col_opt1, col_opt2 = st.columns(2)
+            with col_opt1:
+                improve = st.checkbox("Amélioration par recuit simulé", value=False,
+                                      help="Réduit les modules non planifiés et les conflits après la passe gloutonne")
+            with col_opt2:
+                time_budget = st.slider("Budget de recherche (s)", 5, 30, 10, disabled=not improve)
+            
+            criteres = {
+                "Moins de modules non planifiés": "echecs",
+                "Moins d'étudiants sans examen": "etudiants",
+                "Session la plus courte": "jours"
+            }
+            col_opt3, col_opt4 = st.columns(2)
+            with col_opt3:
+                n_starts = st.slider("Démarrages parallèles", 1, max(os.cpu_count() or 1, 2), 1,
+                                     help="Lance plusieurs essais en parallèle et conserve le meilleur")
+            with col_opt4:
+                critere = st.selectbox("Critère de sélection", list(criteres.keys()), disabled=n_starts == 1)
+            precheck = st.checkbox("Vérifier la faisabilité avant de générer", value=True,
+                                   help="Arrête la génération si la période est trop courte ou les salles/enseignants insuffisants")
+            
+            # Generation runs as a background job: at most one per period, survives page reloads
+            active_job = get_active_job(db, periode_id)
+            user = get_current_user()
+            
+            col_btn1, col_btn2, col_btn3 = st.columns(3)
             
             with col_btn1:
-                if st.button(" Générer l'EDT", type="primary", use_container_width=True):
-                    with st.spinner("Génération en cours..."):
-                        try:
-                            scheduler = FastScheduler(db)
-                            success, result = scheduler.generate_schedule(periode_id, annee_univ)
-                            
-                            if success:
-                                st.success(" EDT généré avec succès!")
-                                st.balloons()
-                                
-                                col_r1, col_r2, col_r3 = st.columns(3)
-                                with col_r1:
-                                    st.metric("Examens planifiés", result.get('scheduled', 0))
-                                with col_r2:
-                                    st.metric("Échecs", result.get('failed', 0))
-                                with col_r3:
-                                    st.metric("Durée", f"{result.get('execution_time', 0):.2f}s")
-                                
-                                # Show generated exams
-                                st.markdown("---")
-                                st.subheader(" Examens Générés")
-                                
-                                examens_generes = db.get_examens(periode_id)
-                                if examens_generes:
-                                    df = pd.DataFrame(examens_generes)
-                                    st.dataframe(df, use_container_width=True, hide_index=True)
-                                    
-                                    # Export button
-                                    csv = df.to_csv(index=False, encoding='utf-8')
-                                    st.download_button(" Exporter CSV", csv, "examens_generes.csv", "text/csv")
-                            else:
-                                st.error(f" Erreur: {result.get('error')}")
-                        except Exception as e:
-                            st.error(f" Erreur: {e}")
+                if st.button(" Générer l'EDT", type="primary", use_container_width=True,
+                             disabled=active_job is not None):
+                    options = {
+                        'algorithme': algorithmes[algorithme],
+                        'improve': improve,
+                        'time_budget': time_budget,
+                        'n_starts': n_starts,
+                        'score': criteres[critere],
+                        'precheck': precheck
+                    }
+                    job_id, created = enqueue_job(db, periode_id, annee_univ, 'complet', options,
+                                                  user['id'] if user else None)
+                    if not created:
+                        st.warning("Une génération est déjà en cours pour cette période")
+                    job_runner.notify()
+                    st.rerun()
             
             with col_btn2:
+                if st.button(" Mise à jour incrémentale", use_container_width=True,
+                             disabled=active_job is not None,
+                             help="Replace uniquement les examens touchés par les changements d'inscriptions, de salles ou d'enseignants"):
+                    job_id, created = enqueue_job(db, periode_id, annee_univ, 'incremental',
+                                                  created_by=user['id'] if user else None)
+                    if not created:
+                        st.warning("Une génération est déjà en cours pour cette période")
+                    job_runner.notify()
+                    st.rerun()
+            
+            with col_btn3:
                 if st.button(" Actualiser", use_container_width=True):
                     st.rerun()
             
+            if active_job:
+                statut = "En attente d'un worker" if active_job['statut'] == 'en_attente' else "Génération en cours"
+                st.progress(min(float(active_job['progression']), 1.0),
+                            text=f"{statut} — {active_job['message'] or ''}")
+                poll_job = True
+            else:
+                recent_jobs = get_recent_jobs(db, periode_id, limit=5)
+                if recent_jobs:
+                    show_job_result(recent_jobs[0])
+                    with st.expander("Historique des générations"):
+                        st.dataframe(pd.DataFrame(recent_jobs)[[
+                            'id', 'mode', 'statut', 'created_at', 'duree_secondes', 'erreur'
+                        ]], use_container_width=True, hide_index=True)
+            
             # Always show existing exams below
             if examens_existants:
                 st.markdown("---")
@@ -184,7 +288,7 @@ def main():
                 st.dataframe(df, use_container_width=True, hide_index=True)
                 
                 # Export
-                csv = df.to_csv(index=False, encoding='utf-8')
+                csv = db.export_csv_text(*db.examens_query(periode_id))
                 st.download_button(" Exporter CSV", csv, "examens.csv", "text/csv")
             else:
                 st.info("Aucun examen planifié pour cette période")
@@ -308,7 +412,7 @@ def main():
                     col_exp1, col_exp2 = st.columns(2)
                     
                     with col_exp1:
-                        csv = df.to_csv(index=False, encoding='utf-8')
+                        csv = db.export_csv_text(*db.planning_formation_query(formation_id, periode_id))
                         st.download_button(" Exporter CSV", csv, f"planning_formation_{formation_id}.csv", "text/csv")
                     
                     with col_exp2:
@@ -523,7 +627,7 @@ def main():
                     col_exp1, col_exp2 = st.columns(2)
                     
                     with col_exp1:
-                        csv = df.to_csv(index=False, encoding='utf-8')
+                        csv = db.export_csv_text(*db.planning_professeur_query(prof_id, periode_id))
                         st.download_button(" Exporter CSV", csv, f"planning_prof_{prof_id}.csv", "text/csv")
                     
                     with col_exp2:
@@ -614,6 +718,11 @@ def main():
                 st.warning("Aucun professeur disponible")
         else:
             st.warning("Aucune période d'examen active")
+    
+    # A generation job is running: refresh every 2 s until it finishes
+    if poll_job:
+        time.sleep(2)
+        st.rerun()
 
 if __name__ == "__main__":
     main()
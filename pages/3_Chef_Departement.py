@@ -145,11 +145,14 @@ def main():
             
             # Get exams for department
             examens = db.execute_query("""
-                SELECT e.*, m.nom as module, l.nom as salle
+                SELECT e.*, m.nom as module,
+                       (SELECT STRING_AGG(l.nom, ', ' ORDER BY l.nom)
+                        FROM repartition_salles rs
+                        JOIN lieu_examen l ON rs.salle_id = l.id
+                        WHERE rs.examen_id = e.id) as salle
                 FROM examens e
                 JOIN modules m ON e.module_id = m.id
                 JOIN formations f ON m.formation_id = f.id
-                JOIN lieu_examen l ON e.salle_id = l.id
                 WHERE f.dept_id = %s AND e.periode_id = %s
                 ORDER BY e.date_heure
             """, (dept_id, periode_id))
@@ -98,7 +98,7 @@ def main():
                 st.markdown("---")
                 
                 # Export
-                csv = df.to_csv(index=False, encoding='utf-8')
+                csv = db.export_csv_text(*db.planning_professeur_query(prof_id, periode_id))
                 st.download_button(" Télécharger mon planning", csv, "mon_planning.csv", "text/csv")
             else:
                 st.info("📭 Aucune surveillance planifiée pour cette période")
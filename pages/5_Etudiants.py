@@ -114,7 +114,7 @@ def main():
             st.markdown("---")
             
             # Export
-            csv = df.to_csv(index=False, encoding='utf-8')
+            csv = db.export_csv_text(*db.planning_etudiant_query(etudiant_id, periode_id))
             st.download_button(" Télécharger mon planning", csv, "mon_planning_examens.csv", "text/csv")
         else:
             st.info("📭 Aucun examen planifié pour cette période")
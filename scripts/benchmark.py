@@ -7,6 +7,9 @@ from datetime import datetime
 from src.database import Database
 from src.scheduler import ExamScheduler
 from src.analytics import Analytics
+from src.enrollment import EnrollmentMatrix
+import numpy as np
+import tracemalloc
 
 def benchmark_queries(db):
     print("\n" + "="*60)
@@ -110,6 +113,40 @@ def benchmark_scheduler(db):
         'result': result
     }
 
+def benchmark_enrollment(db):
+    print("\n" + "="*60)
+    print("BENCHMARK DE LA MATRICE D'INSCRIPTIONS (CSR)")
+    print("="*60)
+    
+    start = time.time()
+    enrollment = EnrollmentMatrix.load(db)
+    duration = (time.time() - start) * 1000
+    print(f"\n📥 Chargement depuis la base: {duration:.2f} ms")
+    print(f"  - Modules: {enrollment.n_modules:,}")
+    print(f"  - Étudiants: {enrollment.n_students:,}")
+    print(f"  - Inscriptions: {enrollment.n_enrollments:,}")
+    print(f"  - Mémoire: {enrollment.nbytes / 1024:.1f} KB")
+    
+    # Build-only scaling on synthetic pairs (no database)
+    print("\n📈 Construction seule (données synthétiques):")
+    rng = np.random.default_rng(42)
+    results = []
+    for n in (130_000, 1_300_000, 5_000_000):
+        module_ids = rng.integers(1, 1_500, size=n, dtype=np.int32)
+        student_ids = rng.integers(1, max(n // 10, 2), size=n, dtype=np.int32)
+        
+        tracemalloc.start()
+        start = time.time()
+        matrix = EnrollmentMatrix(module_ids, student_ids)
+        duration = (time.time() - start) * 1000
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        print(f"  {n:>10,} inscriptions | {duration:8.2f} ms | pic {peak / 1024**2:7.1f} MB | {matrix.nbytes / 1024**2:6.1f} MB")
+        results.append((n, duration, peak))
+    
+    return results
+
 def benchmark_analytics(db):
     print("\n" + "="*60)
     print("BENCHMARK DES ANALYSES")
@@ -204,6 +241,8 @@ def main():
     try:
         query_results = benchmark_queries(db)
         
+        benchmark_enrollment(db)
+        
         scheduler_result = benchmark_scheduler(db)
         
         analytics_results = benchmark_analytics(db)
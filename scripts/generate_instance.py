@@ -0,0 +1,52 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import argparse
+from src.synthetic import generate_instance
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Génération d'instances synthétiques (.npz) sans base de données"
+    )
+    parser.add_argument('--etudiants', type=int, nargs='+', default=[10_000, 50_000, 100_000, 500_000],
+                        help="Nombre(s) d'étudiants, une instance par valeur")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--etudiants-par-formation', type=int, default=124)
+    parser.add_argument('--modules-min', type=int, default=8, help="Modules par formation (min)")
+    parser.add_argument('--modules-max', type=int, default=12, help="Modules par formation (max)")
+    parser.add_argument('--min-modules-etudiant', type=int, default=6,
+                        help="Modules minimum par étudiant (le maximum est toute la formation)")
+    parser.add_argument('--jours', type=int, default=27, help="Durée de la période (jours)")
+    parser.add_argument('--output-dir', default='instances')
+    parser.add_argument('--compress', action='store_true', help="Compresser les fichiers")
+    args = parser.parse_args()
+    
+    os.makedirs(args.output_dir, exist_ok=True)
+    
+    print("=" * 60)
+    print("GÉNÉRATION D'INSTANCES SYNTHÉTIQUES")
+    print("=" * 60)
+    
+    for n_etudiants in args.etudiants:
+        start = time.time()
+        instance = generate_instance(
+            n_etudiants,
+            seed=args.seed,
+            etudiants_par_formation=args.etudiants_par_formation,
+            modules_par_formation=(args.modules_min, args.modules_max),
+            min_modules_par_etudiant=args.min_modules_etudiant,
+            n_days=args.jours
+        )
+        duration = time.time() - start
+        
+        path = os.path.join(args.output_dir, f"synthetique_{n_etudiants}_s{args.seed}.npz")
+        instance.save(path, compressed=args.compress)
+        
+        print(f"\n✅ {n_etudiants:,} étudiants en {duration:.2f} s → {path}")
+        print(f"  {instance}")
+        print(f"  Mémoire: {instance.nbytes / 1024**2:.1f} MB")
+
+if __name__ == "__main__":
+    main()
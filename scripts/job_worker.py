@@ -0,0 +1,26 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import argparse
+from src.database import Database
+from src.jobs import JobRunner
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker des générations d'EDT en arrière-plan (table schedule_jobs)")
+    parser.add_argument('--workers', type=int, default=2, help="Nombre de générations simultanées (périodes différentes)")
+    parser.add_argument('--poll', type=float, default=2.0, help="Intervalle de scrutation de la file (secondes)")
+    args = parser.parse_args()
+    
+    runner = JobRunner(Database(), max_workers=args.workers, poll_interval=args.poll).start()
+    print(f"Worker démarré ({args.workers} workers), en attente de tâches... (Ctrl+C pour arrêter)")
+    try:
+        while True:
+            time.sleep(60)
+    except KeyboardInterrupt:
+        runner.stop()
+        print("Worker arrêté")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+import argparse
+from src.problem import ProblemInstance
+from src.feasibility import check_feasibility
+from src.fast_scheduler import FastScheduler
+from src.dsatur_scheduler import DSaturScheduler
+
+ALGORITHMES = {
+    'fast': FastScheduler,
+    'dsatur': DSaturScheduler
+}
+
+def export_instance(args):
+    # Imported here so 'run' works without psycopg2 / a database
+    from src.database import Database
+    
+    start = time.time()
+    instance = ProblemInstance.from_db(Database(), args.periode, args.annee)
+    print(f"📥 Chargement depuis la base: {(time.time() - start) * 1000:.1f} ms")
+    print(f"  {instance}")
+    print(f"  Mémoire: {instance.nbytes / 1024:.1f} KB")
+    
+    instance.save(args.output, compressed=args.compress)
+    print(f"✅ Instance enregistrée dans {args.output}")
+
+def run_instance(args):
+    start = time.time()
+    instance = ProblemInstance.load(args.instance)
+    print(f"📂 Chargement du fichier: {(time.time() - start) * 1000:.1f} ms")
+    print(f"  {instance}")
+    
+    problem = instance.to_problem()
+    report = check_feasibility(problem)
+    print(f"🔎 Pré-vérification: {report['execution_time'] * 1000:.1f} ms, "
+          f"{report['bounds']['days_needed']} jours requis au minimum / {report['bounds']['days_available']}")
+    for reason in report['reasons']:
+        print(f"  ❌ {reason}")
+    
+    start = time.time()
+    scheduler = ALGORITHMES[args.algo](None)
+    solution = scheduler.build_schedule(problem, seed=args.seed, improve=args.improve, time_budget=args.budget)
+    duration = time.time() - start
+    
+    print(f"\n⏱️  {args.algo}: {duration:.2f} s (sans base de données)")
+    print(f"  - Examens planifiés: {len(solution['exams'])}")
+    print(f"  - Modules non planifiés: {len(solution['failed_modules'])}")
+    print(f"  - Sondages: {solution['probes']}")
+    if solution['local_search']:
+        ls = solution['local_search']
+        print(f"  - Recuit simulé: {ls['unplaced_before']} → {ls['unplaced_after']} non planifiés")
+
+def main():
+    parser = argparse.ArgumentParser(description="Instances de planification hors base (.npz)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    export_parser = commands.add_parser('export', help="Exporter une période de la base vers un .npz")
+    export_parser.add_argument('periode', type=int, help="ID de la période d'examen")
+    export_parser.add_argument('output', help="Fichier .npz de sortie")
+    export_parser.add_argument('--annee', default=None, help="Année universitaire des inscriptions (toutes par défaut)")
+    export_parser.add_argument('--compress', action='store_true', help="Compresser le fichier")
+    export_parser.set_defaults(handler=export_instance)
+    
+    run_parser = commands.add_parser('run', help="Générer un EDT en mémoire à partir d'un .npz")
+    run_parser.add_argument('instance', help="Fichier .npz")
+    run_parser.add_argument('--algo', choices=sorted(ALGORITHMES), default='fast')
+    run_parser.add_argument('--seed', type=int, default=None)
+    run_parser.add_argument('--improve', action='store_true', help="Ajouter le recuit simulé")
+    run_parser.add_argument('--budget', type=float, default=10.0, help="Budget du recuit simulé (secondes)")
+    run_parser.set_defaults(handler=run_instance)
+    
+    args = parser.parse_args()
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
@@ -56,6 +56,7 @@ def test_database_views(db):
         'conflits_professeurs',
         'conflits_capacite',
         'conflits_salles',
+        'chevauchements_professeurs',
         'occupation_salles_par_jour',
         'charge_professeurs'
     ]
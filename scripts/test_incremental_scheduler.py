@@ -0,0 +1,82 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import Database
+from src.fast_scheduler import FastScheduler
+from src.incremental_scheduler import IncrementalScheduler
+from src.constraints import ConstraintChecker
+
+NB_SALLES_FERMEES = 10
+
+def test_repair_without_professor_overlaps():
+    print("\n" + "="*60)
+    print("RÉPARATION INCRÉMENTALE: SALLES HORS SERVICE")
+    print("="*60)
+    
+    db = Database()
+    
+    periodes = db.get_periodes_examen(actif=True)
+    if not periodes:
+        print("❌ No active exam period found")
+        return False
+    
+    periode_id = periodes[0]['id']
+    print(f"\n📅 Période: {periodes[0]['nom']}")
+    
+    print("\n🚀 Génération initiale (FastScheduler)...")
+    success, result = FastScheduler(db).generate_schedule(periode_id, "2024-2025", precheck=False)
+    if not success:
+        print(f"❌ Génération impossible: {result.get('error')}")
+        return False
+    print(f"  ✅ {result['scheduled']} examens planifiés")
+    
+    # The busiest rooms of the period go out of service, so many exams must move
+    salles = db.execute_query("""
+        SELECT es.salle_id
+        FROM examen_salles es
+        JOIN examens ex ON es.examen_id = ex.id
+        WHERE ex.periode_id = %s
+        GROUP BY es.salle_id
+        ORDER BY COUNT(*) DESC, es.salle_id
+        LIMIT %s
+    """, (periode_id, NB_SALLES_FERMEES))
+    salle_ids = [s['salle_id'] for s in salles]
+    
+    try:
+        db.execute_query("UPDATE lieu_examen SET disponible = FALSE WHERE id = ANY(%s)", (salle_ids,), fetch=False)
+        print(f"\n🔧 {len(salle_ids)} salles hors service, réparation...")
+        success, result = IncrementalScheduler(db).reschedule(periode_id, "2024-2025")
+    finally:
+        db.execute_query("UPDATE lieu_examen SET disponible = TRUE WHERE id = ANY(%s)", (salle_ids,), fetch=False)
+    
+    if not success:
+        print(f"❌ Réparation impossible: {result.get('error')}")
+        return False
+    print(f"  - Modules touchés: {result['affected']}")
+    print(f"  - Examens modifiés: {result['updated']}, ajoutés: {result['inserted']}, retirés: {result['deleted']}")
+    print(f"  - Modules non planifiés: {result['failed']}")
+    
+    chevauchements = db.execute_query("SELECT * FROM chevauchements_professeurs")
+    examens = db.execute_query(
+        "SELECT id, module_id, prof_responsable_id, date_heure, duree_minutes FROM examens WHERE periode_id = %s",
+        (periode_id,)
+    )
+    modules = db.execute_query("SELECT id, nom FROM modules")
+    overlaps = ConstraintChecker.find_professor_overlaps(examens, modules)
+    
+    print(f"\n🔍 Vérifications:")
+    print(f"  - chevauchements_professeurs: {len(chevauchements)}")
+    print(f"  - find_professor_overlaps: {len(overlaps)}")
+    
+    if chevauchements or overlaps:
+        for overlap in (chevauchements or overlaps)[:5]:
+            print(f"    ❌ {overlap['module1']} / {overlap['module2']} ({overlap['debut1']} - {overlap['debut2']})")
+        return False
+    
+    print("✅ Aucun professeur en double réservation après la réparation")
+    return True
+
+if __name__ == "__main__":
+    success = test_repair_without_professor_overlaps()
+    sys.exit(0 if success else 1)
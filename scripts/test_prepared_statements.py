@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.database import Database
+
+def server_prepared(db):
+    """Statements really PREPAREd on the server session of the pool's only connection"""
+    rows = db.execute_query("SELECT name FROM pg_prepared_statements")
+    return {row['name'] for row in rows}
+
+def test_prepare_once(db, etudiant_id, periode_id):
+    print("\n" + "="*60)
+    print("TEST 1: PREPARE UNE FOIS PAR CONNEXION")
+    print("="*60)
+    
+    expected = db.execute_query("SELECT * FROM get_planning_etudiant(%s, %s)", (etudiant_id, periode_id))
+    before = Database.prepared_stats().get('planning_etudiant', {'executions': 0, 'preparations': 0})
+    for _ in range(5):
+        result = db.execute_prepared('planning_etudiant', (etudiant_id, periode_id))
+        if result != expected:
+            print("❌ Résultat différent de la requête non préparée")
+            return False
+    after = Database.prepared_stats()['planning_etudiant']
+    
+    executions = after['executions'] - before['executions']
+    preparations = after['preparations'] - before['preparations']
+    print(f"  {executions} exécutions, {preparations} préparation(s)")
+    if preparations > 1:
+        print("❌ Instruction préparée plusieurs fois sur la même connexion")
+        return False
+    if 'planning_etudiant' not in server_prepared(db):
+        print("❌ Instruction absente de pg_prepared_statements")
+        return False
+    print("✅ Préparée une seule fois, résultats identiques")
+    return True
+
+def test_survives_rollback(db, etudiant_id, periode_id):
+    print("\n" + "="*60)
+    print("TEST 2: APRÈS UNE TRANSACTION ANNULÉE")
+    print("="*60)
+    
+    try:
+        db.execute_query("SELECT * FROM table_inexistante")
+    except Exception as e:
+        print(f"  Erreur attendue: {str(e).splitlines()[0][:50]}")
+    
+    try:
+        db.execute_prepared('planning_etudiant', (etudiant_id, periode_id))
+        print("✅ L'instruction préparée reste utilisable")
+        return True
+    except Exception as e:
+        print(f"❌ {e}")
+        return False
+
+def test_after_reset(db, etudiant_id, periode_id):
+    print("\n" + "="*60)
+    print("TEST 3: APRÈS conn.reset() (DISCARD ALL)")
+    print("="*60)
+    
+    with db.get_connection() as conn:
+        conn.reset()
+        if conn.prepared:
+            print(f"❌ Instructions toujours marquées comme préparées: {sorted(conn.prepared)}")
+            return False
+    
+    try:
+        db.execute_prepared('planning_etudiant', (etudiant_id, periode_id))
+        print("✅ Instruction préparée à nouveau après le reset")
+        return True
+    except Exception as e:
+        print(f"❌ {e}")
+        return False
+
+def main():
+    print("="*60)
+    print("INSTRUCTIONS PRÉPARÉES SUR LES CONNEXIONS DU POOL")
+    print("="*60)
+    
+    # One connection: every call reuses the same server session
+    db = Database(minconn=1, maxconn=1)
+    
+    periode = db.execute_query("SELECT id FROM periodes_examen ORDER BY id LIMIT 1")
+    etudiant = db.execute_query("SELECT id FROM etudiants ORDER BY id LIMIT 1")
+    if not periode or not etudiant:
+        print("❌ Base vide: lancer scripts/generate_data.py d'abord")
+        return False
+    etudiant_id, periode_id = etudiant[0]['id'], periode[0]['id']
+    
+    results = [
+        test_prepare_once(db, etudiant_id, periode_id),
+        test_survives_rollback(db, etudiant_id, periode_id),
+        test_after_reset(db, etudiant_id, periode_id)
+    ]
+    
+    print("\n" + "="*60)
+    if all(results):
+        print("✅ TOUS LES TESTS RÉUSSIS")
+    else:
+        print(f"❌ {results.count(False)} test(s) en échec")
+    print("="*60)
+    return all(results)
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from typing import Dict, List
 
@@ -10,47 +11,36 @@ class Analytics:
         return kpis
     
     def get_occupation_analysis(self) -> pd.DataFrame:
-        data = self.db.get_occupation_salles()
-        if data:
-            df = pd.DataFrame(data)
-            return df
-        return pd.DataFrame()
+        return self.db.get_occupation_salles(frame=True)
     
     def get_department_stats(self) -> pd.DataFrame:
-        data = self.db.get_stats_departement()
-        if data:
-            df = pd.DataFrame(data)
-            return df
-        return pd.DataFrame()
+        return self.db.get_stats_departement(frame=True)
     
     def get_professor_workload(self) -> pd.DataFrame:
-        data = self.db.get_charge_professeurs()
-        if data:
-            df = pd.DataFrame(data)
-            return df
-        return pd.DataFrame()
+        return self.db.get_charge_professeurs(frame=True)
     
     def calculate_efficiency_score(self, periode_id: int) -> Dict:
-        examens = self.db.get_examens(periode_id)
+        examens = self.db.fetch_columns(*self.db.examens_query(periode_id))
+        nb_examens = len(examens['id'])
         
-        if not examens:
+        if not nb_examens:
             return {
                 'score': 0,
                 'metrics': {}
             }
         
-        total_capacity = sum(e.get('capacite_examen', 0) for e in examens)
-        total_students = sum(e.get('nb_inscrits', 0) for e in examens)
+        total_capacity = float(np.nansum(examens['capacite_examen']))
+        total_students = int(examens['nb_inscrits'].sum())
         
         utilization_rate = (total_students / total_capacity * 100) if total_capacity > 0 else 0
         
         conflits_etu = self.db.get_conflits_etudiants() or []
         conflits_prof = self.db.get_conflits_professeurs() or []
         total_conflicts = len(conflits_etu) + len(conflits_prof)
-        conflict_rate = total_conflicts / len(examens) * 100 if examens else 0
+        conflict_rate = total_conflicts / nb_examens * 100
         
-        unique_dates = len(set(e['date_heure'].date() for e in examens if e.get('date_heure')))
-        avg_exams_per_day = len(examens) / unique_dates if unique_dates > 0 else 0
+        unique_dates = len(np.unique(examens['date_heure'].astype('datetime64[D]')))
+        avg_exams_per_day = nb_examens / unique_dates if unique_dates > 0 else 0
         
         score = max(0, 100 - conflict_rate - (100 - utilization_rate) * 0.5)
         
@@ -60,7 +50,7 @@ class Analytics:
                 'utilization_rate': round(utilization_rate, 2),
                 'conflict_rate': round(conflict_rate, 2),
                 'avg_exams_per_day': round(avg_exams_per_day, 2),
-                'total_exams': len(examens),
+                'total_exams': nb_examens,
                 'unique_dates': unique_dates
             }
         }
@@ -76,11 +66,3 @@ class Analytics:
             'capacite': len(conflits_cap),
             'salles': len(conflits_sal)
         }
-    
-    def export_schedule_to_csv(self, periode_id: int, filepath: str):
-        examens = self.db.get_examens(periode_id)
-        if examens:
-            df = pd.DataFrame(examens)
-            df.to_csv(filepath, index=False, encoding='utf-8')
-            return True
-        return False
@@ -45,28 +45,15 @@ class Auth:
         """Authenticate a user with username and password"""
         password_hash = self.hash_password(password)
         
-        query = """
-            SELECT u.id, u.username, u.role, u.etudiant_id, u.professeur_id, 
-                   u.departement_id, u.actif
-            FROM utilisateurs u
-            WHERE u.username = %s AND u.password_hash = %s AND u.actif = TRUE
-        """
-        
-        result = self.db.execute_query(query, (username.lower(), password_hash))
+        # Hot path at every login: prepared statements (see PREPARED_STATEMENTS)
+        result = self.db.execute_prepared('auth_utilisateur', (username.lower(), password_hash))
         
         if result and len(result) > 0:
             user = result[0]
             
             # Update last login
             try:
-                conn = self.db.get_connection()
-                cursor = conn.cursor()
-                cursor.execute(
-                    "UPDATE utilisateurs SET derniere_connexion = %s WHERE id = %s",
-                    (datetime.now(), user['id'])
-                )
-                conn.commit()
-                cursor.close()
+                self.db.execute_prepared('auth_derniere_connexion', (datetime.now(), user['id']), fetch=False)
             except:
                 pass
             
@@ -82,20 +69,14 @@ class Auth:
             
             # Get name based on role
             if user['role'] == 'etudiant' and user['etudiant_id']:
-                etudiant = self.db.execute_query(
-                    "SELECT nom, prenom, formation_id FROM etudiants WHERE id = %s",
-                    (user['etudiant_id'],)
-                )
+                etudiant = self.db.execute_prepared('auth_etudiant', (user['etudiant_id'],))
                 if etudiant:
                     user_info['nom'] = etudiant[0]['nom']
                     user_info['prenom'] = etudiant[0]['prenom']
                     user_info['formation_id'] = etudiant[0]['formation_id']
             
             elif user['professeur_id']:
-                prof = self.db.execute_query(
-                    "SELECT nom, prenom, dept_id, grade FROM professeurs WHERE id = %s",
-                    (user['professeur_id'],)
-                )
+                prof = self.db.execute_prepared('auth_professeur', (user['professeur_id'],))
                 if prof:
                     user_info['nom'] = prof[0]['nom']
                     user_info['prenom'] = prof[0]['prenom']
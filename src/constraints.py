@@ -1,9 +1,48 @@
 from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Sequence
+import heapq
+import numpy as np
+
+# Per-exam violation codes of ConstraintChecker.validate_batch (bit flags)
+VIOLATION_CAPACITE = 1
+VIOLATION_SALLE = 2
+VIOLATION_PROF_CHARGE = 4
+VIOLATION_PROF_CHEVAUCHEMENT = 8
+VIOLATION_ETUDIANT = 16
+
+VIOLATION_MESSAGES = {
+    VIOLATION_CAPACITE: "Capacité insuffisante ou salle introuvable",
+    VIOLATION_SALLE: "Salle occupée par un autre examen",
+    VIOLATION_PROF_CHARGE: "Le professeur a plus de 3 examens ce jour",
+    VIOLATION_PROF_CHEVAUCHEMENT: "Chevauchement horaire pour le professeur",
+    VIOLATION_ETUDIANT: "Conflit étudiant: inscrits communs le même jour"
+}
+
+def sweep_overlaps(resources: Sequence, starts: Sequence, ends: Sequence) -> List[Tuple[int, int]]:
+    """Index pairs (i, j) of intervals [start, end) overlapping on the same resource.
+    
+    Sweep line in O(n log n + pairs): intervals are visited by (resource, start), a
+    min-heap keeps the ends of the still-open ones, and every open interval overlaps
+    the one being visited. Intervals that only touch (end == start) do not overlap.
+    """
+    pairs = []
+    active = []  # (end, index) of the open intervals of the current resource
+    current = object()
+    for i in sorted(range(len(starts)), key=lambda i: (resources[i], starts[i])):
+        if resources[i] != current:
+            current = resources[i]
+            active = []
+        while active and active[0][0] <= starts[i]:
+            heapq.heappop(active)
+        pairs.extend((j, i) for _, j in active)
+        heapq.heappush(active, (ends[i], i))
+    return pairs
 
 class ConstraintChecker:
-    def __init__(self, db):
+    def __init__(self, db, enrollment=None):
         self.db = db
+        # Optional EnrollmentMatrix: when set, student conflicts are checked on real shared students
+        self.enrollment = enrollment
     
     def check_student_conflicts(self, examen_data: Dict, existing_examens: List[Dict]) -> Tuple[bool, str]:
         exam_date = examen_data['date_heure'].date() if isinstance(examen_data['date_heure'], datetime) else examen_data['date_heure']
@@ -11,7 +50,10 @@ class ConstraintChecker:
         for existing in existing_examens:
             existing_date = existing['date_heure'].date() if isinstance(existing['date_heure'], datetime) else existing['date_heure']
             if existing_date == exam_date and existing['module_id'] != examen_data['module_id']:
-                return False, "Conflit potentiel étudiant"
+                if self.enrollment is None:
+                    return False, "Conflit potentiel étudiant"
+                if self.enrollment.shares_students(existing['module_id'], examen_data['module_id']):
+                    return False, "Conflit étudiant: inscrits communs le même jour"
         
         return True, "OK"
     
@@ -35,11 +77,10 @@ class ConstraintChecker:
             JOIN examens ex ON s.examen_id = ex.id
             JOIN modules m ON ex.module_id = m.id
             WHERE s.prof_id = %s
-              AND ex.date_heure < %s
-              AND ex.date_heure + (ex.duree_minutes || ' minutes')::INTERVAL > %s
+              AND ex.creneau && tsrange(%s, %s)
         """
         end_time = date_heure + timedelta(minutes=duree_minutes)
-        overlaps = self.db.execute_query(query_overlap, (prof_id, end_time, date_heure))
+        overlaps = self.db.execute_query(query_overlap, (prof_id, date_heure, end_time))
         
         if overlaps:
             return False, f"Conflit: Chevauchement horaire avec l'examen {overlaps[0]['nom']}"
@@ -62,15 +103,16 @@ class ConstraintChecker:
     def check_room_availability(self, salle_id: int, date_heure: datetime, duree_minutes: int) -> Tuple[bool, str]:
         end_time = date_heure + timedelta(minutes=duree_minutes)
         
+        # examen_salles holds every room of every exam; served by its (salle_id, creneau) exclusion index
         query = """
             SELECT ex.id, m.nom
-            FROM examens ex
+            FROM examen_salles es
+            JOIN examens ex ON es.examen_id = ex.id
             JOIN modules m ON ex.module_id = m.id
-            WHERE ex.salle_id = %s
-              AND ex.date_heure < %s
-              AND ex.date_heure + (ex.duree_minutes || ' minutes')::INTERVAL > %s
+            WHERE es.salle_id = %s
+              AND es.creneau && tsrange(%s, %s)
         """
-        conflicts = self.db.execute_query(query, (salle_id, end_time, date_heure))
+        conflicts = self.db.execute_query(query, (salle_id, date_heure, end_time))
         
         if conflicts:
             return False, f"Salle occupée par l'examen {conflicts[0]['nom']}"
@@ -106,6 +148,137 @@ class ConstraintChecker:
         
         return len(errors) == 0, errors
     
+    def validate_batch(self, exams: List[Dict], salles: List[Dict], enrollment=None) -> np.ndarray:
+        """Check a whole proposed schedule in memory; returns one VIOLATION_* bit mask per exam (0 = valid).
+        
+        Exams use the scheduler format (module_id, prof_id, salle_id, optional
+        salles [(salle_id, nb_places)], date_heure, duree_minutes, nb_inscrits).
+        Overlaps are found with sort-based sweeps, daily counts with one grouping
+        each; no database query is issued. The student check needs an
+        EnrollmentMatrix (this one or self.enrollment) and is skipped without one.
+        """
+        enrollment = enrollment if enrollment is not None else self.enrollment
+        n = len(exams)
+        codes = np.zeros(n, dtype=np.int16)
+        if n == 0:
+            return codes
+        
+        start = np.array([e['date_heure'] for e in exams], dtype='datetime64[m]').astype(np.int64)
+        end = start + np.array([e['duree_minutes'] for e in exams], dtype=np.int64)
+        day = start // (24 * 60)
+        day -= day.min()
+        n_days = int(day.max()) + 1
+        
+        # One row per (exam, room) of the seat allocation
+        allocations = [e.get('salles') or [(e['salle_id'], e['nb_inscrits'])] for e in exams]
+        room_exam = np.repeat(np.arange(n), [len(a) for a in allocations])
+        room_ids = np.array([salle_id for a in allocations for salle_id, _ in a], dtype=np.int64)
+        room_places = np.array([nb_places for a in allocations for _, nb_places in a], dtype=np.int64)
+        
+        capacity_of = {s['id']: s['capacite_examen'] for s in salles}
+        room_capacity = np.array([capacity_of.get(salle_id, -1) for salle_id in room_ids.tolist()], dtype=np.int64)
+        seated = np.bincount(room_exam, weights=room_places, minlength=n)
+        bad_room = (room_capacity < 0) | (room_places > room_capacity)
+        codes[np.unique(room_exam[bad_room])] |= VIOLATION_CAPACITE
+        codes[seated < np.array([e['nb_inscrits'] for e in exams])] |= VIOLATION_CAPACITE
+        
+        codes[self._overlapping(room_exam, room_ids, start[room_exam], end[room_exam])] |= VIOLATION_SALLE
+        
+        prof_ids = np.array([e.get('prof_id', e.get('prof_responsable_id')) for e in exams], dtype=np.int64)
+        codes[self._overlapping(np.arange(n), prof_ids, start, end)] |= VIOLATION_PROF_CHEVAUCHEMENT
+        
+        _, group, counts = np.unique(prof_ids * n_days + day, return_inverse=True, return_counts=True)
+        codes[counts[group] > 3] |= VIOLATION_PROF_CHARGE
+        
+        if enrollment is not None:
+            students = [enrollment.students_of(e['module_id']) for e in exams]
+            student_exam = np.repeat(np.arange(n), [len(s) for s in students])
+            if len(student_exam):
+                student_days = np.concatenate(students).astype(np.int64) * n_days + day[student_exam]
+                _, group, counts = np.unique(student_days, return_inverse=True, return_counts=True)
+                codes[np.unique(student_exam[counts[group] > 1])] |= VIOLATION_ETUDIANT
+        
+        return codes
+    
+    @staticmethod
+    def _overlapping(owners: np.ndarray, keys: np.ndarray, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Owners of intervals overlapping another interval with the same key (one sweep over all keys)"""
+        order = np.lexsort((start, keys))
+        keys, owners = keys[order], owners[order]
+        
+        # Shift each key into its own time range so one running max covers every key
+        origin = start.min()
+        span = int(end.max() - origin) + 1
+        offset = np.cumsum(np.r_[0, keys[1:] != keys[:-1]]) * span
+        start = start[order] - origin + offset
+        end = end[order] - origin + offset
+        
+        reach = np.maximum.accumulate(end)
+        holder = np.maximum.accumulate(np.where(end == reach, np.arange(len(end)), 0))  # interval reaching furthest
+        clash = np.flatnonzero(start[1:] < reach[:-1]) + 1
+        return np.unique(np.concatenate((owners[clash], owners[holder[clash - 1]])))
+    
+    @staticmethod
+    def find_room_overlaps(exams: List[Dict], salles: List[Dict], modules: List[Dict]) -> List[Dict]:
+        """Room double-bookings of a schedule in memory, with the columns of the conflits_salles view.
+        
+        Exams use the scheduler format; examen ids are those of saved rows (None before saving).
+        """
+        salle_noms = {s['id']: s['nom'] for s in salles}
+        module_noms = {m['id']: m['nom'] for m in modules}
+        
+        rooms, exam_of = [], []
+        for idx, exam in enumerate(exams):
+            for salle_id, _ in exam.get('salles') or [(exam['salle_id'], exam['nb_inscrits'])]:
+                rooms.append(salle_id)
+                exam_of.append(idx)
+        starts = [exams[idx]['date_heure'] for idx in exam_of]
+        ends = [exams[idx]['date_heure'] + timedelta(minutes=exams[idx]['duree_minutes']) for idx in exam_of]
+        
+        conflicts = []
+        for i, j in sweep_overlaps(rooms, starts, ends):
+            ex1, ex2 = sorted((exams[exam_of[i]], exams[exam_of[j]]), key=lambda e: (e.get('id') or 0, e['module_id']))
+            conflicts.append({
+                'examen1_id': ex1.get('id'),
+                'examen2_id': ex2.get('id'),
+                'salle': salle_noms.get(rooms[i]),
+                'module1': module_noms.get(ex1['module_id']),
+                'module2': module_noms.get(ex2['module_id']),
+                'debut1': ex1['date_heure'],
+                'fin1': ex1['date_heure'] + timedelta(minutes=ex1['duree_minutes']),
+                'debut2': ex2['date_heure'],
+                'fin2': ex2['date_heure'] + timedelta(minutes=ex2['duree_minutes'])
+            })
+        return conflicts
+    
+    @staticmethod
+    def find_professor_overlaps(exams: List[Dict], modules: List[Dict]) -> List[Dict]:
+        """Responsible professors holding two overlapping exams (same columns, 'prof_id' instead of 'salle')"""
+        module_noms = {m['id']: m['nom'] for m in modules}
+        profs = [e.get('prof_id', e.get('prof_responsable_id')) for e in exams]
+        starts = [e['date_heure'] for e in exams]
+        ends = [e['date_heure'] + timedelta(minutes=e['duree_minutes']) for e in exams]
+        
+        conflicts = []
+        for i, j in sweep_overlaps(profs, starts, ends):
+            ex1, ex2 = sorted((exams[i], exams[j]), key=lambda e: (e.get('id') or 0, e['module_id']))
+            conflicts.append({
+                'examen1_id': ex1.get('id'),
+                'examen2_id': ex2.get('id'),
+                'prof_id': profs[i],
+                'module1': module_noms.get(ex1['module_id']),
+                'module2': module_noms.get(ex2['module_id']),
+                'debut1': ex1['date_heure'],
+                'fin1': ex1['date_heure'] + timedelta(minutes=ex1['duree_minutes']),
+                'debut2': ex2['date_heure'],
+                'fin2': ex2['date_heure'] + timedelta(minutes=ex2['duree_minutes'])
+            })
+        return conflicts
+    
+    @staticmethod
+    def describe_violations(code: int) -> List[str]:
+        return [message for flag, message in VIOLATION_MESSAGES.items() if code & flag]
+    
     def get_all_conflicts(self):
         conflicts = {
             'etudiants': self.db.get_conflits_etudiants(),
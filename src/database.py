@@ -1,13 +1,257 @@
+import numpy as np
+import pandas as pd
 import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2 import extensions
+from psycopg2.pool import PoolError
+from psycopg2.extras import RealDictCursor, execute_values
+import csv
+import io
+import itertools
 import os
+import threading
+import time
+from collections import deque
 from dotenv import load_dotenv
 from contextlib import contextmanager
 
 load_dotenv()
 
+class ConnectionPool:
+    """Thread-safe pool of psycopg2 connections for one configuration.
+    
+    Checkout hands back an idle connection (opening one while below maxconn, else
+    waiting up to `timeout` seconds). Connections that are closed or broken are
+    dropped on checkout, and ones idle for longer than `health_check_interval`
+    seconds are pinged first.
+    
+    A returned connection is rolled back if a transaction is still open, and its
+    client-side session flags (autocommit, isolation level, read only, deferrable)
+    are restored without a round trip. Server-side session state is kept: the
+    statements PREPAREd by Database.execute_prepared() stay valid, and session
+    advisory locks stay held, so whoever takes one must release it. Nothing here
+    issues a session-wide SET, so no RESET ALL / DISCARD ALL is sent.
+    """
+    
+    def __init__(self, config, minconn=1, maxconn=10, timeout=30.0, health_check_interval=30.0):
+        self.config = dict(config)
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.pid = os.getpid()
+        self._idle = deque()  # (connection, returned_at)
+        self._size = 0
+        self._available = threading.Condition()
+        for _ in range(minconn):
+            self._idle.append((psycopg2.connect(connection_factory=PooledConnection, **self.config), time.monotonic()))
+            self._size += 1
+    
+    def _healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def getconn(self):
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._available:
+                while not self._idle and self._size >= self.maxconn:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolError(f"Pool de connexions épuisé ({self.maxconn} connexions utilisées)")
+                    self._available.wait(remaining)
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                else:
+                    self._size += 1
+                    conn = None
+            
+            if conn is None:
+                try:
+                    return psycopg2.connect(connection_factory=PooledConnection, **self.config)
+                except Exception:
+                    with self._available:
+                        self._size -= 1
+                        self._available.notify()
+                    raise
+            # Health check outside the lock: a ping must not block other checkouts
+            if self._healthy(conn, returned_at):
+                return conn
+            with self._available:
+                self._discard(conn)
+                self._available.notify()
+    
+    def putconn(self, conn, close=False):
+        if not close and not conn.closed:
+            try:
+                if conn.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+                conn.set_session(isolation_level='DEFAULT', readonly='DEFAULT', deferrable='DEFAULT',
+                                 autocommit=False)
+            except psycopg2.Error:
+                close = True
+        with self._available:
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._available.notify()
+    
+    def _discard(self, conn):
+        # Caller holds self._available
+        self._size -= 1
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+    
+    def closeall(self):
+        with self._available:
+            while self._idle:
+                self._discard(self._idle.pop()[0])
+    
+    @property
+    def stats(self):
+        with self._available:
+            return {'ouvertes': self._size, 'disponibles': len(self._idle), 'max': self.maxconn}
+
+# Column types of fetch_frame(), by PostgreSQL type OID (other types are read as text)
+# Integers: (NumPy dtype, nullable pandas dtype used when the column has NULLs)
+_FRAME_INTS = {20: (np.int64, 'Int64'), 21: (np.int16, 'Int16'), 23: (np.int32, 'Int32')}  # int8, int2, int4
+_FRAME_FLOATS = {700: np.float32, 701: np.float64, 1700: np.float64}  # float4, float8, numeric
+_FRAME_BOOL = 16
+_FRAME_DATES = {1082, 1114, 1184}  # date, timestamp, timestamptz
+
+class _Int32CopyReader:
+    """File-like sink for COPY ... (FORMAT binary) of NOT NULL int4 columns.
+    
+    With n int4 columns every tuple is a fixed 2 + 8n byte record (field count,
+    then length + value per field), so the stream is decoded with np.frombuffer
+    in chunks of about chunk_bytes, without a Python object per row.
+    """
+    
+    SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+    
+    def __init__(self, n_columns, chunk_bytes=1 << 20):
+        self.n_columns = n_columns
+        self.chunk_bytes = chunk_bytes
+        fields = [('n_fields', '>i2')]
+        for i in range(n_columns):
+            fields += [(f'len{i}', '>i4'), (f'col{i}', '>i4')]
+        self.record = np.dtype(fields)
+        self.pending = bytearray()
+        self.header_done = False
+        self.chunks = [[] for _ in range(n_columns)]
+    
+    def write(self, data):
+        self.pending += data
+        if len(self.pending) >= self.chunk_bytes:
+            self._decode()
+        return len(data)
+    
+    def _decode(self, final=False):
+        if not self.header_done:
+            if len(self.pending) < 19:
+                return
+            if bytes(self.pending[:11]) != self.SIGNATURE:
+                raise ValueError("Flux COPY binaire invalide")
+            extension = int.from_bytes(self.pending[15:19], 'big')
+            del self.pending[:19 + extension]
+            self.header_done = True
+        
+        n_records = len(self.pending) // self.record.itemsize
+        if final:
+            # Trailer: a field count of -1
+            n_records = (len(self.pending) - 2) // self.record.itemsize
+        if n_records <= 0:
+            return
+        records = np.frombuffer(self.pending, dtype=self.record, count=n_records)
+        if (records['n_fields'] != self.n_columns).any() or any(
+                (records[f'len{i}'] != 4).any() for i in range(self.n_columns)):
+            raise ValueError("COPY binaire : colonnes int4 NOT NULL attendues")
+        for i in range(self.n_columns):
+            self.chunks[i].append(records[f'col{i}'].astype(np.int32))
+        del records
+        del self.pending[:n_records * self.record.itemsize]
+    
+    def columns(self):
+        self._decode(final=True)
+        if self.pending != b'\xff\xff':
+            raise ValueError("COPY binaire : fin de flux inattendue")
+        return tuple(
+            np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int32)
+            for chunks in self.chunks
+        )
+
+class PooledConnection(extensions.connection):
+    """psycopg2 connection remembering which registered statements it has PREPAREd"""
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared = set()
+
+    def reset(self):
+        # psycopg2 resets with DISCARD ALL, which deallocates every prepared statement
+        super().reset()
+        self.prepared.clear()
+
+# Hot per-user statements, PREPAREd once per pooled connection and run by name:
+# name -> (parameter types, SQL with $n placeholders)
+PREPARED_STATEMENTS = {
+    'planning_etudiant': ('integer, integer', "SELECT * FROM get_planning_etudiant($1, $2)"),
+    'planning_professeur': ('integer, integer', "SELECT * FROM get_planning_professeur($1, $2)"),
+    'auth_utilisateur': ('text, text', """
+        SELECT u.id, u.username, u.role, u.etudiant_id, u.professeur_id,
+               u.departement_id, u.actif
+        FROM utilisateurs u
+        WHERE u.username = $1 AND u.password_hash = $2 AND u.actif = TRUE
+    """),
+    'auth_derniere_connexion': ('timestamp, integer',
+                                "UPDATE utilisateurs SET derniere_connexion = $1 WHERE id = $2"),
+    'auth_etudiant': ('integer', "SELECT nom, prenom, formation_id FROM etudiants WHERE id = $1"),
+    'auth_professeur': ('integer', "SELECT nom, prenom, dept_id, grade FROM professeurs WHERE id = $1")
+}
+
+# Per-statement counters, for the whole process: executions and PREPAREs (one per connection)
+_statement_stats = {}
+_statement_stats_lock = threading.Lock()
+
+# Unique server-side cursor names within the process
+_stream_ids = itertools.count()
+
+# One pool per connection configuration, shared by every Database instance of the process
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_pool(config, minconn=None, maxconn=None):
+    """Shared pool for a configuration; a forked process (multi-start workers) gets its own"""
+    key = tuple(sorted(config.items()))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool.pid != os.getpid():
+            pool = ConnectionPool(
+                config,
+                minconn=int(os.getenv('DB_POOL_MIN', '1')) if minconn is None else minconn,
+                maxconn=int(os.getenv('DB_POOL_MAX', '10')) if maxconn is None else maxconn,
+                timeout=float(os.getenv('DB_POOL_TIMEOUT', '30'))
+            )
+            _pools[key] = pool
+        return pool
+
+def _salles_examen(exam):
+    """examen_salles rows [(salle_id, nb_places)] of a scheduler-format exam: its split, else its single room"""
+    return exam.get('salles') or [(exam['salle_id'], exam['nb_inscrits'])]
+
 class Database:
-    def __init__(self):
+    def __init__(self, minconn=None, maxconn=None):
         self.config = {
             'host': os.getenv('DB_HOST', 'localhost'),
             'port': os.getenv('DB_PORT', '5432'),
@@ -15,18 +259,31 @@ class Database:
             'user': os.getenv('DB_USER', 'postgres'),
             'password': os.getenv('DB_PASSWORD', '')
         }
+        self.minconn = minconn
+        self.maxconn = maxconn
+    
+    @property
+    def pool(self):
+        return get_pool(self.config, self.minconn, self.maxconn)
     
     @contextmanager
     def get_connection(self):
-        conn = psycopg2.connect(**self.config)
+        pool = self.pool
+        conn = pool.getconn()
+        broken = False
         try:
             yield conn
             conn.commit()
         except Exception as e:
-            conn.rollback()
+            broken = isinstance(e, (psycopg2.OperationalError, psycopg2.InterfaceError))
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    broken = True
             raise e
         finally:
-            conn.close()
+            pool.putconn(conn, close=broken)
     
     @contextmanager
     def get_cursor(self, dict_cursor=True):
@@ -45,10 +302,169 @@ class Database:
                 return cursor.fetchall()
             return None
     
+    def stream_query(self, query, params=None, itersize=10000, batches=False, with_header=False):
+        """Rows of a query through a named server-side cursor, itersize rows per round trip.
+        
+        Yields plain tuples, or lists of up to itersize tuples with batches=True, so only
+        one batch is held in memory whatever the result size. With with_header=True the
+        first item is the tuple of column names. The pooled connection is held until the
+        generator is exhausted or closed.
+        """
+        with self.get_connection() as conn:
+            cursor = conn.cursor(name=f"stream_{next(_stream_ids)}")
+            cursor.itersize = itersize
+            try:
+                cursor.execute(query, params)
+                # A named cursor only describes its columns after the first FETCH
+                rows = cursor.fetchmany(itersize)
+                if with_header:
+                    yield tuple(column.name for column in cursor.description)
+                while rows:
+                    if batches:
+                        yield rows
+                    else:
+                        yield from rows
+                    rows = cursor.fetchmany(itersize)
+            finally:
+                cursor.close()
+    
+    def fetch_frame(self, query, params=None):
+        """Query result as a DataFrame built column by column, without per-row objects.
+        
+        The rows are exported with COPY (...) TO STDOUT (FORMAT csv, NULL '\\N') and parsed
+        by the pandas C reader; only the \\N marker becomes NaN, so empty strings stay ''.
+        Column types come from the query's description (a LIMIT 0 run on the same
+        connection): integers keep their width (nullable pandas integers when they hold
+        NULLs), numeric is float64, dates and timestamps are datetime64, the rest is text.
+        """
+        with self.get_cursor(dict_cursor=False) as cursor:
+            sql = cursor.mogrify(query, params).decode()
+            cursor.execute(f"SELECT * FROM ({sql}) q LIMIT 0")
+            columns = [(column.name, column.type_code) for column in cursor.description]
+            buffer = io.BytesIO()
+            cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, NULL '\\N')", buffer)
+        
+        buffer.seek(0)
+        names = [name for name, _ in columns]
+        if not buffer.getbuffer().nbytes:
+            return pd.DataFrame(columns=names)
+        # Integers are parsed by the C reader's native path (int64, or float64 with
+        # NULLs) and narrowed afterwards: nullable dtypes at parse time are much slower
+        dtype = {}
+        for name, oid in columns:
+            if oid in _FRAME_FLOATS:
+                dtype[name] = _FRAME_FLOATS[oid]
+            elif oid not in _FRAME_INTS and oid not in _FRAME_DATES and oid != _FRAME_BOOL:
+                dtype[name] = object
+        frame = pd.read_csv(
+            buffer, names=names, header=None, dtype=dtype,
+            true_values=['t'], false_values=['f'],
+            keep_default_na=False, na_values=['\\N']
+        )
+        for name, oid in columns:
+            if oid in _FRAME_INTS:
+                numpy_dtype, nullable_dtype = _FRAME_INTS[oid]
+                frame[name] = frame[name].astype(nullable_dtype if frame[name].dtype.kind == 'f' else numpy_dtype)
+            elif oid == _FRAME_BOOL and frame[name].dtype.kind != 'b':
+                frame[name] = frame[name].astype('boolean')
+            elif oid in _FRAME_DATES:
+                frame[name] = pd.to_datetime(frame[name], format='ISO8601')
+        return frame
+    
+    def fetch_columns(self, query, params=None):
+        """Query result as {column: NumPy array} (see fetch_frame()).
+        
+        Integer columns keep their width unless they contain NULLs (float64 with NaN);
+        booleans with NULLs are object arrays.
+        """
+        frame = self.fetch_frame(query, params)
+        columns = {}
+        for name in frame.columns:
+            series = frame[name]
+            nullable = isinstance(series.dtype, pd.api.extensions.ExtensionDtype)
+            if nullable and series.dtype.kind in 'iu' and series.hasnans:
+                columns[name] = series.to_numpy(dtype=np.float64, na_value=np.nan)
+            elif nullable and series.dtype.kind == 'b' and series.hasnans:
+                columns[name] = series.to_numpy(dtype=object, na_value=None)
+            elif nullable and series.dtype.kind in 'iub':
+                columns[name] = series.to_numpy(dtype=series.dtype.numpy_dtype)
+            else:
+                columns[name] = series.to_numpy()
+        return columns
+    
+    def copy_int32_columns(self, query, params=None, n_columns=2):
+        """Columns of a query returning only NOT NULL int4 values, as int32 arrays.
+        
+        The rows are streamed with COPY (...) TO STDOUT (FORMAT binary) and decoded
+        in 1 MB chunks, so only the arrays and one chunk are ever held in memory.
+        """
+        reader = _Int32CopyReader(n_columns)
+        with self.get_cursor(dict_cursor=False) as cursor:
+            sql = cursor.mogrify(query, params).decode()
+            cursor.copy_expert(f"COPY ({sql}) TO STDOUT WITH (FORMAT binary)", reader)
+        return reader.columns()
+    
+    def export_csv(self, query, params, fileobj, itersize=10000):
+        """Stream a query into an open text file as CSV with a header row; returns the row count"""
+        rows = self.stream_query(query, params, itersize=itersize, batches=True, with_header=True)
+        writer = csv.writer(fileobj)
+        writer.writerow(next(rows))
+        count = 0
+        for batch in rows:
+            writer.writerows(batch)
+            count += len(batch)
+        return count
+    
+    def export_csv_text(self, query, params=None, itersize=10000):
+        """CSV of a query as a string (for download buttons), written batch by batch by export_csv()"""
+        buffer = io.StringIO()
+        self.export_csv(query, params, buffer, itersize=itersize)
+        return buffer.getvalue()
+    
+    def execute_prepared(self, name, params=None, fetch=True):
+        """Run a statement of PREPARED_STATEMENTS by name (dict rows, like execute_query).
+        
+        The statement is PREPAREd the first time it runs on a pooled connection, then
+        only EXECUTEd: parsing and planning are paid once per connection.
+        """
+        param_types, statement = PREPARED_STATEMENTS[name]
+        params = tuple(params or ())
+        with self.get_cursor() as cursor:
+            prepared = cursor.connection.prepared
+            first = name not in prepared
+            if first:
+                cursor.execute(f"PREPARE {name} ({param_types}) AS {statement}")
+                prepared.add(name)
+            placeholders = ', '.join(['%s'] * len(params))
+            cursor.execute(f"EXECUTE {name} ({placeholders})" if params else f"EXECUTE {name}", params)
+            with _statement_stats_lock:
+                stats = _statement_stats.setdefault(name, {'executions': 0, 'preparations': 0})
+                stats['executions'] += 1
+                stats['preparations'] += int(first)
+            if fetch:
+                return cursor.fetchall()
+            return None
+    
+    @staticmethod
+    def prepared_stats():
+        """{statement: {'executions', 'preparations'}} since the process started"""
+        with _statement_stats_lock:
+            return {name: dict(stats) for name, stats in _statement_stats.items()}
+    
     def execute_many(self, query, params_list):
         with self.get_cursor(dict_cursor=False) as cursor:
             cursor.executemany(query, params_list)
     
+    @staticmethod
+    def copy_rows(cursor, table, columns, rows):
+        """COPY plain rows (numbers, dates, tab-free text) into a table in one round trip"""
+        buffer = io.StringIO()
+        for row in rows:
+            buffer.write('\t'.join('\\N' if value is None else str(value) for value in row))
+            buffer.write('\n')
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN", buffer)
+    
     def get_departements(self):
         query = "SELECT * FROM departements ORDER BY nom"
         return self.execute_query(query)
@@ -88,29 +504,31 @@ class Database:
         query = "SELECT * FROM lieu_examen WHERE disponible = TRUE ORDER BY capacite_examen DESC"
         return self.execute_query(query)
     
-    def get_examens(self, periode_id=None):
-        if periode_id:
-            query = """
-                SELECT e.*, m.nom as module_nom, l.nom as salle_nom, 
-                       p.nom || ' ' || p.prenom as professeur
-                FROM examens e
-                JOIN modules m ON e.module_id = m.id
-                JOIN lieu_examen l ON e.salle_id = l.id
-                JOIN professeurs p ON e.prof_responsable_id = p.id
-                WHERE e.periode_id = %s
-                ORDER BY e.date_heure
-            """
-            return self.execute_query(query, (periode_id,))
+    @staticmethod
+    def examens_query(periode_id=None):
+        """Query (and params) of get_examens(), for callers that stream it"""
         query = """
-            SELECT e.*, m.nom as module_nom, l.nom as salle_nom,
+            SELECT e.*, m.nom as module_nom, r.salles as salle_nom,
+                   r.nb_salles, r.capacite_examen,
                    p.nom || ' ' || p.prenom as professeur
             FROM examens e
             JOIN modules m ON e.module_id = m.id
-            JOIN lieu_examen l ON e.salle_id = l.id
+            JOIN LATERAL (
+                SELECT STRING_AGG(l.nom, ', ' ORDER BY l.nom) as salles,
+                       COUNT(*) as nb_salles,
+                       SUM(l.capacite_examen) as capacite_examen
+                FROM repartition_salles rs
+                JOIN lieu_examen l ON rs.salle_id = l.id
+                WHERE rs.examen_id = e.id
+            ) r ON TRUE
             JOIN professeurs p ON e.prof_responsable_id = p.id
-            ORDER BY e.date_heure
         """
-        return self.execute_query(query)
+        if periode_id:
+            return query + " WHERE e.periode_id = %s ORDER BY e.date_heure", (periode_id,)
+        return query + " ORDER BY e.date_heure", None
+    
+    def get_examens(self, periode_id=None):
+        return self.execute_query(*self.examens_query(periode_id))
     
     def get_kpi_global(self):
         query = "SELECT * FROM kpi_global"
@@ -133,25 +551,33 @@ class Database:
         query = "SELECT * FROM conflits_salles ORDER BY debut1"
         return self.execute_query(query)
     
-    def get_occupation_salles(self):
+    def get_occupation_salles(self, frame=False):
         query = "SELECT * FROM occupation_salles_par_jour ORDER BY date_examen"
-        return self.execute_query(query)
+        return self.fetch_frame(query) if frame else self.execute_query(query)
     
-    def get_charge_professeurs(self):
+    def get_charge_professeurs(self, frame=False):
         query = "SELECT * FROM charge_professeurs ORDER BY nb_surveillances DESC"
-        return self.execute_query(query)
+        return self.fetch_frame(query) if frame else self.execute_query(query)
     
-    def get_stats_departement(self):
+    def get_stats_departement(self, frame=False):
         query = "SELECT * FROM stats_departement ORDER BY nb_etudiants DESC"
-        return self.execute_query(query)
+        return self.fetch_frame(query) if frame else self.execute_query(query)
+    
+    @staticmethod
+    def planning_etudiant_query(etudiant_id, periode_id):
+        """Query (and params) of get_planning_etudiant(), for callers that stream it"""
+        return "SELECT * FROM get_planning_etudiant(%s, %s)", (etudiant_id, periode_id)
+    
+    @staticmethod
+    def planning_professeur_query(prof_id, periode_id):
+        """Query (and params) of get_planning_professeur(), for callers that stream it"""
+        return "SELECT * FROM get_planning_professeur(%s, %s)", (prof_id, periode_id)
     
     def get_planning_etudiant(self, etudiant_id, periode_id):
-        query = "SELECT * FROM get_planning_etudiant(%s, %s)"
-        return self.execute_query(query, (etudiant_id, periode_id))
+        return self.execute_prepared('planning_etudiant', (etudiant_id, periode_id))
     
     def get_planning_professeur(self, prof_id, periode_id):
-        query = "SELECT * FROM get_planning_professeur(%s, %s)"
-        return self.execute_query(query, (prof_id, periode_id))
+        return self.execute_prepared('planning_professeur', (prof_id, periode_id))
     
     def get_periodes_examen(self, actif=True):
         if actif:
@@ -161,15 +587,22 @@ class Database:
         return self.execute_query(query)
     
     def create_examen(self, module_id, prof_id, salle_id, periode_id, date_heure, duree_minutes, nb_inscrits):
+        # The exam and its examen_salles row for salle_id go in one transaction
+        # (examens_salle_principale is checked at commit); more rooms: create_examen_salle()
         query = """
             INSERT INTO examens (module_id, prof_responsable_id, salle_id, periode_id, 
                                 date_heure, duree_minutes, nb_inscrits)
             VALUES (%s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """
-        result = self.execute_query(query, 
-            (module_id, prof_id, salle_id, periode_id, date_heure, duree_minutes, nb_inscrits))
-        return result[0]['id'] if result else None
+        with self.get_cursor() as cursor:
+            cursor.execute(query, (module_id, prof_id, salle_id, periode_id, date_heure, duree_minutes, nb_inscrits))
+            examen_id = cursor.fetchone()['id']
+            cursor.execute("""
+                INSERT INTO examen_salles (examen_id, salle_id, nb_places)
+                VALUES (%s, %s, %s)
+            """, (examen_id, salle_id, nb_inscrits))
+        return examen_id
     
     def create_surveillance(self, examen_id, prof_id, role='surveillant'):
         query = """
@@ -181,13 +614,197 @@ class Database:
         result = self.execute_query(query, (examen_id, prof_id, role))
         return result[0]['id'] if result else None
     
+    def create_examen_salle(self, examen_id, salle_id, nb_places):
+        query = """
+            INSERT INTO examen_salles (examen_id, salle_id, nb_places)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (examen_id, salle_id) DO UPDATE SET nb_places = EXCLUDED.nb_places
+            RETURNING id
+        """
+        result = self.execute_query(query, (examen_id, salle_id, nb_places))
+        return result[0]['id'] if result else None
+    
+    @staticmethod
+    def _update_examens(cursor, exams, page_size):
+        """Set-based UPDATE ... FROM (VALUES ...) of slot, main room, professor and size for existing exams"""
+        values = [
+            (e['id'], e['prof_id'], e['salle_id'], e['date_heure'], e['duree_minutes'], e['nb_inscrits'])
+            for e in exams
+        ]
+        execute_values(cursor, """
+            UPDATE examens e
+            SET prof_responsable_id = v.prof_id, salle_id = v.salle_id, date_heure = v.date_heure,
+                duree_minutes = v.duree_minutes, nb_inscrits = v.nb_inscrits
+            FROM (VALUES %s) AS v(id, prof_id, salle_id, date_heure, duree_minutes, nb_inscrits)
+            WHERE e.id = v.id
+        """, values, page_size=page_size)
+    
+    @staticmethod
+    def _replace_examen_salles(cursor, exams, page_size):
+        """exams: [(examen_id, scheduler-format exam)]; all their rooms, primary one included"""
+        cursor.execute("DELETE FROM examen_salles WHERE examen_id = ANY(%s)", ([examen_id for examen_id, _ in exams],))
+        execute_values(cursor, """
+            INSERT INTO examen_salles (examen_id, salle_id, nb_places)
+            VALUES %s
+        """, [
+            (examen_id, salle_id, nb_places)
+            for examen_id, e in exams
+            for salle_id, nb_places in _salles_examen(e)
+        ], page_size=page_size)
+    
+    def apply_examen_changes(self, updates, inserts, deleted_ids, page_size=1000):
+        """Write a repaired schedule in one transaction.
+        
+        deleted_ids are removed (examen_salles and surveillances follow through ON DELETE
+        CASCADE), updates (scheduler format with 'id' and 'prof_changed') are rewritten
+        and inserts added. Then the examen_salles rows of every written exam are
+        replaced, and 'responsable' surveillances are created for new exams and changed
+        professors. Room clashes are checked at commit.
+        """
+        with self.get_cursor(dict_cursor=False) as cursor:
+            cursor.execute("SET CONSTRAINTS examen_salles_salle_libre DEFERRED")
+            if deleted_ids:
+                cursor.execute("DELETE FROM examens WHERE id = ANY(%s)", (list(deleted_ids),))
+            
+            written = [(e['id'], e) for e in updates]
+            if updates:
+                self._update_examens(cursor, updates, page_size)
+                prof_changed = [e['id'] for e in updates if e['prof_changed']]
+                if prof_changed:
+                    cursor.execute(
+                        "DELETE FROM surveillances WHERE examen_id = ANY(%s) AND role = 'responsable'",
+                        (prof_changed,)
+                    )
+            if inserts:
+                rows = execute_values(cursor, """
+                    INSERT INTO examens (module_id, prof_responsable_id, salle_id, periode_id,
+                                         date_heure, duree_minutes, nb_inscrits)
+                    VALUES %s
+                    RETURNING id, module_id
+                """, [
+                    (e['module_id'], e['prof_id'], e['salle_id'], e['periode_id'],
+                     e['date_heure'], e['duree_minutes'], e['nb_inscrits'])
+                    for e in inserts
+                ], page_size=page_size, fetch=True)
+                id_by_module = {module_id: examen_id for examen_id, module_id in rows}
+                written += [(id_by_module[e['module_id']], dict(e, prof_changed=True)) for e in inserts]
+            if not written:
+                return
+            
+            self._replace_examen_salles(cursor, written, page_size)
+            surveillance_values = [(examen_id, e['prof_id'], 'responsable') for examen_id, e in written if e['prof_changed']]
+            if surveillance_values:
+                execute_values(cursor, """
+                    INSERT INTO surveillances (examen_id, prof_id, role)
+                    VALUES %s
+                    ON CONFLICT (examen_id, prof_id) DO NOTHING
+                """, surveillance_values, page_size=page_size)
+    
+    def bulk_update_salles(self, exams, page_size=1000):
+        """Move exams to new rooms in one transaction: one UPDATE ... FROM (VALUES ...) of
+        examens.salle_id, then the examen_salles rows of the moved exams are replaced.
+        
+        exams use the scheduler format (id, salle_id, salles as [(salle_id, nb_places)]).
+        """
+        if not exams:
+            return
+        values = [(e['id'], e['salle_id']) for e in exams]
+        with self.get_cursor(dict_cursor=False) as cursor:
+            # Rooms are exchanged between exams across pages: check room clashes at commit
+            cursor.execute("SET CONSTRAINTS examen_salles_salle_libre DEFERRED")
+            execute_values(cursor, """
+                UPDATE examens e
+                SET salle_id = v.salle_id
+                FROM (VALUES %s) AS v(id, salle_id)
+                WHERE e.id = v.id
+            """, values, page_size=page_size)
+            self._replace_examen_salles(cursor, [(e['id'], e) for e in exams], page_size)
+    
     def delete_all_examens(self, periode_id):
-        # First delete all surveillances (simpler, avoids subquery timeout)
-        self.execute_query("DELETE FROM surveillances", fetch=False)
-        # Then delete exams for this period
+        # Surveillances and examen_salles rows of this period follow through ON DELETE CASCADE
         query = "DELETE FROM examens WHERE periode_id = %s"
         self.execute_query(query, (periode_id,), fetch=False)
     
+    def stage_examens(self, periode_id, exams):
+        """Write a generated schedule into the staging tables, replacing the period's previous staging.
+        
+        Besides the responsible professor (prof_id), an exam may list extra supervisors as 'surveillants'.
+        """
+        exam_values = [
+            (periode_id, e['module_id'], e['prof_id'], e['salle_id'],
+             e['date_heure'], e['duree_minutes'], e['nb_inscrits'])
+            for e in exams
+        ]
+        salle_values = [
+            (periode_id, e['module_id'], salle_id, nb_places)
+            for e in exams
+            for salle_id, nb_places in _salles_examen(e)
+        ]
+        surveillance_values = [
+            (periode_id, e['module_id'], prof_id)
+            for e in exams
+            for prof_id in e.get('surveillants', [])
+        ]
+        
+        with self.get_cursor(dict_cursor=False) as cursor:
+            cursor.execute("DELETE FROM examens_staging WHERE periode_id = %s", (periode_id,))
+            cursor.execute("DELETE FROM examen_salles_staging WHERE periode_id = %s", (periode_id,))
+            cursor.execute("DELETE FROM surveillances_staging WHERE periode_id = %s", (periode_id,))
+            if exam_values:
+                self.copy_rows(cursor, 'examens_staging', (
+                    'periode_id', 'module_id', 'prof_responsable_id', 'salle_id',
+                    'date_heure', 'duree_minutes', 'nb_inscrits'
+                ), exam_values)
+            if salle_values:
+                self.copy_rows(cursor, 'examen_salles_staging',
+                               ('periode_id', 'module_id', 'salle_id', 'nb_places'), salle_values)
+            if surveillance_values:
+                self.copy_rows(cursor, 'surveillances_staging', ('periode_id', 'module_id', 'prof_id'),
+                               surveillance_values)
+    
+    def swap_examens(self, periode_id):
+        """Replace a period's schedule by its staged version in one transaction.
+        
+        Readers keep seeing the previous schedule until the commit; other periods
+        are never touched. Returns the number of exams now planned for the period.
+        """
+        with self.get_cursor(dict_cursor=False) as cursor:
+            cursor.execute("DELETE FROM examens WHERE periode_id = %s", (periode_id,))
+            cursor.execute("""
+                INSERT INTO examens (module_id, prof_responsable_id, salle_id, periode_id,
+                                     date_heure, duree_minutes, nb_inscrits)
+                SELECT module_id, prof_responsable_id, salle_id, periode_id,
+                       date_heure, duree_minutes, nb_inscrits
+                FROM examens_staging
+                WHERE periode_id = %s
+            """, (periode_id,))
+            nb_examens = cursor.rowcount
+            cursor.execute("""
+                INSERT INTO examen_salles (examen_id, salle_id, nb_places)
+                SELECT e.id, s.salle_id, s.nb_places
+                FROM examen_salles_staging s
+                JOIN examens e ON e.periode_id = s.periode_id AND e.module_id = s.module_id
+                WHERE s.periode_id = %s
+            """, (periode_id,))
+            cursor.execute("""
+                INSERT INTO surveillances (examen_id, prof_id, role)
+                SELECT id, prof_responsable_id, 'responsable'
+                FROM examens
+                WHERE periode_id = %s
+            """, (periode_id,))
+            cursor.execute("""
+                INSERT INTO surveillances (examen_id, prof_id, role)
+                SELECT e.id, s.prof_id, 'surveillant'
+                FROM surveillances_staging s
+                JOIN examens e ON e.periode_id = s.periode_id AND e.module_id = s.module_id
+                WHERE s.periode_id = %s
+                ON CONFLICT (examen_id, prof_id) DO NOTHING
+            """, (periode_id,))
+            cursor.execute("DELETE FROM examens_staging WHERE periode_id = %s", (periode_id,))
+            cursor.execute("DELETE FROM examen_salles_staging WHERE periode_id = %s", (periode_id,))
+            cursor.execute("DELETE FROM surveillances_staging WHERE periode_id = %s", (periode_id,))
+        return nb_examens
+    
     def get_inscriptions_count_by_module(self, annee_universitaire):
         query = """
             SELECT module_id, COUNT(*) as nb_inscrits
@@ -197,7 +814,7 @@ class Database:
         """
         return self.execute_query(query, (annee_universitaire,))
     
-    def get_modules_with_inscriptions(self):
+    def get_modules_with_inscriptions(self, annee_universitaire=None):
         """Get all modules with their enrollment counts and exam duration"""
         query = """
             SELECT 
@@ -207,18 +824,26 @@ class Database:
                 m.formation_id,
                 m.duree_examen,
                 f.dept_id,
+                d.batiment,
                 COUNT(i.id) as nb_inscrits
             FROM modules m
             LEFT JOIN inscriptions i ON m.id = i.module_id AND i.statut = 'inscrit'
+                                    AND (%(annee)s::text IS NULL OR i.annee_universitaire = %(annee)s)
             LEFT JOIN formations f ON m.formation_id = f.id
-            GROUP BY m.id, m.nom, m.code, m.formation_id, m.duree_examen, f.dept_id
+            LEFT JOIN departements d ON f.dept_id = d.id
+            GROUP BY m.id, m.nom, m.code, m.formation_id, m.duree_examen, f.dept_id, d.batiment
             HAVING COUNT(i.id) > 0
             ORDER BY COUNT(i.id) DESC
         """
-        return self.execute_query(query)
+        return self.execute_query(query, {'annee': annee_universitaire})
     
     def get_planning_by_formation(self, formation_id, periode_id):
         """Get exam planning for a specific formation"""
+        return self.execute_query(*self.planning_formation_query(formation_id, periode_id))
+    
+    @staticmethod
+    def planning_formation_query(formation_id, periode_id):
+        """Query (and params) of get_planning_by_formation(), for callers that stream it"""
         query = """
             SELECT 
                 e.id as examen_id,
@@ -229,9 +854,10 @@ class Database:
                 m.code as module_code,
                 m.credits,
                 m.semestre,
-                l.nom as salle_nom,
-                l.type as salle_type,
-                l.capacite_examen,
+                r.salles as salle_nom,
+                r.types as salle_type,
+                r.capacite_examen,
+                r.nb_salles,
                 p.nom || ' ' || p.prenom as professeur_responsable,
                 p.grade as professeur_grade,
                 f.nom as formation_nom,
@@ -241,12 +867,20 @@ class Database:
             JOIN modules m ON e.module_id = m.id
             JOIN formations f ON m.formation_id = f.id
             JOIN departements d ON f.dept_id = d.id
-            JOIN lieu_examen l ON e.salle_id = l.id
+            JOIN LATERAL (
+                SELECT STRING_AGG(l.nom, ', ' ORDER BY l.nom) as salles,
+                       STRING_AGG(DISTINCT l.type, ', ') as types,
+                       COUNT(*) as nb_salles,
+                       SUM(l.capacite_examen) as capacite_examen
+                FROM repartition_salles rs
+                JOIN lieu_examen l ON rs.salle_id = l.id
+                WHERE rs.examen_id = e.id
+            ) r ON TRUE
             JOIN professeurs p ON e.prof_responsable_id = p.id
             WHERE m.formation_id = %s AND e.periode_id = %s
             ORDER BY e.date_heure, m.nom
         """
-        return self.execute_query(query, (formation_id, periode_id))
+        return query, (formation_id, periode_id)
     
     def get_all_planning_by_formations(self, periode_id):
         """Get exam planning grouped by all formations"""
@@ -0,0 +1,184 @@
+from datetime import datetime
+from typing import List, Dict, Set, Optional
+import heapq
+import random
+from src.fast_scheduler import FastScheduler
+from src.enrollment import EnrollmentMatrix
+from src.room_index import RoomOccupancyIndex, ProfOccupancyIndex
+
+class DSaturScheduler(FastScheduler):
+    """Conflict-graph scheduler: DSatur colouring of modules into exam days and slots"""
+    
+    def build_schedule(self, problem: Dict, modules: Optional[List[Dict]] = None, seed: Optional[int] = None,
+                       improve: bool = False, time_budget: float = 10.0) -> Dict:
+        """DSatur colouring (and optional local search) in memory; nothing is written.
+        
+        `seed` randomises the ties between equally saturated modules and the order
+        of equally loaded days and slots, then the local search, so several starts
+        build different schedules. Without a seed the construction is deterministic.
+        """
+        periode_id = problem['periode_id']
+        modules = problem['modules'] if modules is None else modules
+        salles = problem['salles']
+        professeurs = problem['professeurs']
+        prof_by_dept = problem['prof_by_dept']
+        time_slots = problem['time_slots']
+        available_dates = problem['available_dates']
+        enrollment = problem['enrollment']
+        rng = random.Random(seed)
+        
+        print("Building conflict graph...")
+        phase_start = self._phase_start('graphe')
+        module_index = {m['id']: i for i, m in enumerate(modules)}
+        neighbours = self.build_conflict_graph(enrollment, module_index)
+        conflict_edges = sum(len(n) for n in neighbours) // 2
+        self._phase_end('graphe', phase_start, conflict_edges=conflict_edges)
+        
+        # In-memory tracking
+        tick = RoomOccupancyIndex.grid_resolution(time_slots, (m['duree_examen'] for m in modules))
+        room_index = RoomOccupancyIndex(salles, len(available_dates), tick)  # rooms x time grid
+        prof_index = ProfOccupancyIndex(max_per_day=3)  # exam intervals per professor and day
+        day_load = [0] * len(available_dates)
+        slot_load = {}  # {(date_idx, time_idx): count}
+        placements = {}  # {module_id: (date_idx, time_idx, allocation, prof_id)}
+        
+        exams_to_insert = []
+        failed_modules = []
+        total_probes = 0
+        
+        # Tie-break ranks: random when seeded, else module, day and slot order
+        module_rank = list(range(len(modules)))
+        day_rank = list(range(len(available_dates)))
+        slot_rank = list(range(len(time_slots)))
+        if seed is not None:
+            for ranks in (module_rank, day_rank, slot_rank):
+                rng.shuffle(ranks)
+        
+        # DSatur: always colour the module whose neighbours already occupy the most
+        # distinct days, ties broken by degree, then by enrollment, then by rank
+        saturation = [set() for _ in modules]
+        done = [False] * len(modules)
+        heap = [
+            (0, -len(neighbours[i]), -m['nb_inscrits'], module_rank[i], i)
+            for i, m in enumerate(modules)
+        ]
+        heapq.heapify(heap)
+        
+        phase_start = self._phase_start('placement')
+        progress_step = max(len(modules) // 100, 1)
+        processed = 0
+        
+        while heap:
+            neg_sat, neg_degree, neg_inscrits, rank, i = heapq.heappop(heap)
+            if done[i] or -neg_sat != len(saturation[i]):
+                continue  # stale heap entry
+            done[i] = True
+            processed += 1
+            if processed % progress_step == 0 or processed == len(modules):
+                self._emit('progress', 'placement', done=processed, total=len(modules),
+                           placed=len(exams_to_insert), failed=len(failed_modules))
+            
+            module = modules[i]
+            nb_inscrits = module['nb_inscrits']
+            
+            dept_profs = prof_by_dept.get(module['dept_id'], professeurs[:5])
+            
+            # Least loaded free days first so exams spread over the period
+            candidate_days = sorted(
+                (d for d in range(len(available_dates)) if d not in saturation[i]),
+                key=lambda d: (day_load[d], day_rank[d])
+            )
+            
+            placement = None
+            for date_idx in candidate_days:
+                exam_date = available_dates[date_idx]
+                time_order = sorted(
+                    range(len(time_slots)),
+                    key=lambda t: (slot_load.get((date_idx, t), 0), slot_rank[t])
+                )
+                
+                for time_idx in time_order:
+                    total_probes += 1
+                    slot_hour, slot_minute = time_slots[time_idx]
+                    exam_datetime = datetime.combine(
+                        exam_date,
+                        datetime.min.time().replace(hour=slot_hour, minute=slot_minute)
+                    )
+                    start_minute = slot_hour * 60 + slot_minute
+                    
+                    # Smallest fitting room, or a split over rooms of one building
+                    allocation = room_index.allocate(
+                        date_idx, start_minute, module['duree_examen'], nb_inscrits, module.get('batiment')
+                    )
+                    if allocation is None:
+                        continue
+                    
+                    prof = None
+                    for p in dept_profs:
+                        if prof_index.is_free(p['id'], date_idx, start_minute, module['duree_examen']):
+                            prof = p
+                            break
+                    if not prof:
+                        continue
+                    
+                    placement = (date_idx, time_idx, exam_datetime, start_minute, allocation, prof)
+                    break
+                
+                if placement:
+                    break
+            
+            if not placement:
+                failed_modules.append({'module': module['nom'], 'nb_inscrits': nb_inscrits})
+                self._emit('module_failed', 'placement', module=module['nom'], nb_inscrits=nb_inscrits)
+                continue
+            
+            date_idx, time_idx, exam_datetime, start_minute, allocation, prof = placement
+            exams_to_insert.append({
+                'module_id': module['id'],
+                'prof_id': prof['id'],
+                'salle_id': room_index.salles[allocation[0][0]]['id'],
+                'salles': [(room_index.salles[pos]['id'], nb_places) for pos, nb_places in allocation],
+                'periode_id': periode_id,
+                'date_heure': exam_datetime,
+                'duree_minutes': module['duree_examen'],
+                'nb_inscrits': nb_inscrits
+            })
+            
+            for pos, _ in allocation:
+                room_index.reserve(pos, date_idx, start_minute, module['duree_examen'])
+            
+            prof_index.reserve(prof['id'], date_idx, start_minute, module['duree_examen'])
+            placements[module['id']] = (date_idx, time_idx, allocation, prof['id'])
+            day_load[date_idx] += 1
+            slot_load[(date_idx, time_idx)] = slot_load.get((date_idx, time_idx), 0) + 1
+            
+            for j in neighbours[i]:
+                if not done[j] and date_idx not in saturation[j]:
+                    saturation[j].add(date_idx)
+                    heapq.heappush(heap, (-len(saturation[j]), -len(neighbours[j]), -modules[j]['nb_inscrits'],
+                                          module_rank[j], j))
+        
+        self._phase_end('placement', phase_start, placed=len(exams_to_insert), failed=len(failed_modules))
+        
+        local_search = None
+        if improve:
+            local_search, exams_to_insert, failed_modules = self._improve(
+                problem, modules, placements, room_index, seed, time_budget
+            )
+        
+        return {
+            'exams': exams_to_insert,
+            'failed_modules': failed_modules,
+            'probes': total_probes,
+            'local_search': local_search,
+            'stats': {
+                **self._cohort_stats(enrollment),
+                'conflict_edges': conflict_edges,
+                'days_used': len({exam['date_heure'].date() for exam in exams_to_insert})
+            }
+        }
+    
+    @staticmethod
+    def build_conflict_graph(enrollment: EnrollmentMatrix, module_index: Dict[int, int]) -> List[Set[int]]:
+        """Adjacency sets (by module index): two modules conflict when they share a student (or cohort)"""
+        return enrollment.conflict_graph(module_index)
@@ -0,0 +1,212 @@
+import numpy as np
+from typing import Dict, List, Optional, Set
+
+class EnrollmentMatrix:
+    """Compact CSR enrollment structure shared by the schedulers.
+    
+    Module and student ids are re-indexed densely (0..n-1). The matrix is kept in
+    both orientations: module -> student indices and student -> module indices.
+    student_weights is the number of students each row stands for: 1 here, the
+    cohort size in the matrix returned by cohorts().
+    """
+    
+    def __init__(self, module_ids, student_ids):
+        module_ids = np.asarray(module_ids, dtype=np.int32)
+        student_ids = np.asarray(student_ids, dtype=np.int32)
+        
+        self.module_ids, self._module_lookup, module_idx = self._reindex(module_ids)
+        self.student_ids, self._student_lookup, student_idx = self._reindex(student_ids)
+        
+        self.module_indptr, self.module_students = self._csr(module_idx, student_idx, len(self.module_ids))
+        self.student_indptr, self.student_modules = self._csr(student_idx, module_idx, len(self.student_ids))
+        self.student_weights = np.ones(len(self.student_ids), dtype=np.int32)
+    
+    @staticmethod
+    def _reindex(ids: np.ndarray):
+        """Dense ids through a lookup table: linear in len(ids) + max(id)"""
+        if len(ids) == 0:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32), np.empty(0, dtype=np.int32)
+        present = np.zeros(int(ids.max()) + 1, dtype=bool)
+        present[ids] = True
+        dense_ids = np.flatnonzero(present).astype(np.int32)
+        lookup = np.full(len(present), -1, dtype=np.int32)
+        lookup[dense_ids] = np.arange(len(dense_ids), dtype=np.int32)
+        return dense_ids, lookup, lookup[ids]
+    
+    @staticmethod
+    def _csr(rows: np.ndarray, cols: np.ndarray, n_rows: int):
+        indptr = np.zeros(n_rows + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=n_rows), out=indptr[1:])
+        order = np.argsort(rows, kind='stable')
+        return indptr, cols[order].astype(np.int32)
+    
+    @classmethod
+    def from_rows(cls, rows: List) -> 'EnrollmentMatrix':
+        """Build from (module_id, etudiant_id) tuples or dict rows"""
+        if rows and isinstance(rows[0], dict):
+            module_ids = np.fromiter((r['module_id'] for r in rows), dtype=np.int32, count=len(rows))
+            student_ids = np.fromiter((r['etudiant_id'] for r in rows), dtype=np.int32, count=len(rows))
+        else:
+            pairs = np.array(rows, dtype=np.int32).reshape(-1, 2)
+            module_ids, student_ids = pairs[:, 0], pairs[:, 1]
+        return cls(module_ids, student_ids)
+    
+    @classmethod
+    def from_arrays(cls, module_ids, student_ids, module_indptr, module_students,
+                    student_indptr, student_modules, student_weights=None) -> 'EnrollmentMatrix':
+        """Rebuild from the arrays of to_arrays() without re-sorting the enrollments"""
+        matrix = cls.__new__(cls)
+        matrix.module_ids = np.asarray(module_ids, dtype=np.int32)
+        matrix.student_ids = np.asarray(student_ids, dtype=np.int32)
+        matrix._module_lookup = cls._lookup(matrix.module_ids)
+        matrix._student_lookup = cls._lookup(matrix.student_ids)
+        matrix.module_indptr = np.asarray(module_indptr, dtype=np.int64)
+        matrix.module_students = np.asarray(module_students, dtype=np.int32)
+        matrix.student_indptr = np.asarray(student_indptr, dtype=np.int64)
+        matrix.student_modules = np.asarray(student_modules, dtype=np.int32)
+        if student_weights is None:
+            matrix.student_weights = np.ones(len(matrix.student_ids), dtype=np.int32)
+        else:
+            matrix.student_weights = np.asarray(student_weights, dtype=np.int32)
+        return matrix
+    
+    @staticmethod
+    def _lookup(dense_ids: np.ndarray) -> np.ndarray:
+        lookup = np.full(int(dense_ids.max()) + 1 if len(dense_ids) else 0, -1, dtype=np.int32)
+        lookup[dense_ids] = np.arange(len(dense_ids), dtype=np.int32)
+        return lookup
+    
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Both CSR orientations and the dense id tables, as accepted by from_arrays()"""
+        return {
+            'module_ids': self.module_ids,
+            'student_ids': self.student_ids,
+            'module_indptr': self.module_indptr,
+            'module_students': self.module_students,
+            'student_indptr': self.student_indptr,
+            'student_modules': self.student_modules,
+            'student_weights': self.student_weights
+        }
+    
+    @classmethod
+    def load(cls, db, annee_universitaire: Optional[str] = None) -> 'EnrollmentMatrix':
+        """Load active enrollments ('inscrit') and build the matrix"""
+        query = "SELECT module_id, etudiant_id FROM inscriptions WHERE statut = 'inscrit'"
+        params = None
+        if annee_universitaire:
+            query += " AND annee_universitaire = %s"
+            params = (annee_universitaire,)
+        
+        # Binary COPY decoded straight into int32 arrays, filtered server-side
+        module_ids, student_ids = db.copy_int32_columns(query, params)
+        return cls(module_ids, student_ids)
+    
+    def cohorts(self) -> 'EnrollmentMatrix':
+        """Students grouped into cohorts sharing the exact same module set.
+        
+        Each row of the returned matrix is one cohort (row ids are cohort numbers,
+        not student ids) with its size in student_weights. "Is any student busy"
+        checks give the same answer on cohorts; student counts become sums of weights.
+        """
+        if self.n_students == 0:
+            return self
+        
+        # One padded row per student holding its sorted module positions (-1 filled)
+        counts = np.diff(self.student_indptr)
+        rows = np.repeat(np.arange(self.n_students), counts)
+        cols = np.arange(self.n_enrollments) - np.repeat(self.student_indptr[:-1], counts)
+        signatures = np.full((self.n_students, int(counts.max())), -1, dtype=np.int32)
+        signatures[rows, cols] = self.student_modules[np.lexsort((self.student_modules, rows))]
+        
+        unique, cohort_of = np.unique(signatures, axis=0, return_inverse=True)
+        cohort_rows, cohort_cols = np.nonzero(unique >= 0)
+        matrix = EnrollmentMatrix(self.module_ids[unique[cohort_rows, cohort_cols]], cohort_rows)
+        matrix.student_weights = np.bincount(
+            cohort_of.reshape(-1), weights=self.student_weights, minlength=len(unique)
+        ).astype(np.int32)
+        return matrix
+    
+    @property
+    def n_modules(self) -> int:
+        return len(self.module_ids)
+    
+    @property
+    def n_students(self) -> int:
+        return len(self.student_ids)
+    
+    @property
+    def n_enrollments(self) -> int:
+        return len(self.module_students)
+    
+    @property
+    def n_represented(self) -> int:
+        """Students behind the rows (n_students unless the matrix holds cohorts)"""
+        return int(self.student_weights.sum())
+    
+    @property
+    def compression_ratio(self) -> float:
+        """Represented students per row: 1.0 for a plain matrix"""
+        return self.n_represented / self.n_students if self.n_students else 1.0
+    
+    @property
+    def nbytes(self) -> int:
+        arrays = (self.module_ids, self.student_ids, self._module_lookup, self._student_lookup,
+                  self.module_indptr, self.module_students, self.student_indptr, self.student_modules,
+                  self.student_weights)
+        return sum(a.nbytes for a in arrays)
+    
+    def module_position(self, module_id: int) -> int:
+        """Dense index of a module id, -1 when the module has no enrollment"""
+        if 0 <= module_id < len(self._module_lookup):
+            return int(self._module_lookup[module_id])
+        return -1
+    
+    def student_position(self, student_id: int) -> int:
+        """Dense index of a student id, -1 when the student has no enrollment"""
+        if 0 <= student_id < len(self._student_lookup):
+            return int(self._student_lookup[student_id])
+        return -1
+    
+    def students_of(self, module_id: int) -> np.ndarray:
+        """Dense student indices enrolled in a module"""
+        pos = self.module_position(module_id)
+        if pos < 0:
+            return np.empty(0, dtype=np.int32)
+        return self.module_students[self.module_indptr[pos]:self.module_indptr[pos + 1]]
+    
+    def modules_of(self, student_id: int) -> np.ndarray:
+        """Module ids a student is enrolled in"""
+        pos = self.student_position(student_id)
+        if pos < 0:
+            return np.empty(0, dtype=np.int32)
+        return self.module_ids[self.student_modules[self.student_indptr[pos]:self.student_indptr[pos + 1]]]
+    
+    def module_sizes(self) -> Dict[int, int]:
+        """{module_id: nb_inscrits}"""
+        return dict(zip(self.module_ids.tolist(), np.diff(self.module_indptr).tolist()))
+    
+    def conflict_graph(self, module_index: Dict[int, int]) -> List[Set[int]]:
+        """Adjacency sets by module_index position: two modules conflict when they share a row"""
+        # Map the matrix's dense module positions onto the caller's module order
+        position_to_index = [module_index.get(mid, -1) for mid in self.module_ids.tolist()]
+        indptr = self.student_indptr.tolist()
+        student_modules = self.student_modules.tolist()
+        
+        neighbours = [set() for _ in module_index]
+        for s in range(self.n_students):
+            indices = [position_to_index[p] for p in student_modules[indptr[s]:indptr[s + 1]]]
+            indices = [i for i in indices if i >= 0]
+            for a in indices:
+                neighbours[a].update(indices)
+        for idx, adjacent in enumerate(neighbours):
+            adjacent.discard(idx)
+        
+        return neighbours
+    
+    def shares_students(self, module_a: int, module_b: int) -> bool:
+        """True when at least one student is enrolled in both modules"""
+        students_a = self.students_of(module_a)
+        students_b = self.students_of(module_b)
+        if len(students_a) == 0 or len(students_b) == 0:
+            return False
+        return bool(np.intersect1d(students_a, students_b, assume_unique=True).size)
@@ -1,106 +1,150 @@
-from datetime import datetime, timedelta
-from typing import List, Dict, Tuple
+from datetime import datetime
+from typing import List, Dict, Tuple, Optional, Callable
 import random
+import time
+import numpy as np
+from src.problem import ProblemInstance
+from src.room_index import RoomOccupancyIndex, ProfOccupancyIndex
+from src.local_search import SimulatedAnnealing
+from src.feasibility import check_feasibility
+from src.constraints import ConstraintChecker, VIOLATION_MESSAGES
 
 class FastScheduler:
     """Ultra-fast scheduling algorithm optimized for <45 second execution"""
     
-    def __init__(self, db):
+    def __init__(self, db, progress: Optional[Callable[[Dict], None]] = None):
         self.db = db
+        self.progress = progress
+        self._started = time.time()
     
-    def generate_schedule(self, periode_id: int, annee_universitaire: str) -> Tuple[bool, Dict]:
-        start_time = datetime.now()
+    def _emit(self, event: str, phase: str, **data):
+        """Send a progress event ({'event', 'phase', 'elapsed', ...}) to the callback, if any.
         
-        # Get period info
-        periode = self.db.execute_query(
-            "SELECT * FROM periodes_examen WHERE id = %s", 
-            (periode_id,)
-        )[0]
+        Events: phase_start, phase_end (with duration), progress (done/total) and module_failed.
+        """
+        if self.progress is not None:
+            self.progress(dict(event=event, phase=phase, elapsed=time.time() - self._started, **data))
+    
+    def _phase_start(self, phase: str) -> float:
+        self._emit('phase_start', phase)
+        return time.time()
+    
+    def _phase_end(self, phase: str, phase_start: float, **data):
+        self._emit('phase_end', phase, duration=time.time() - phase_start, **data)
+    
+    def generate_schedule(self, periode_id: int, annee_universitaire: str,
+                          improve: bool = False, time_budget: float = 10.0,
+                          precheck: bool = True) -> Tuple[bool, Dict]:
+        start_time = datetime.now()
+        self._started = time.time()
         
-        date_debut = periode['date_debut']
-        date_fin = periode['date_fin']
+        phase_start = self._phase_start('chargement')
+        problem = self.load_problem(periode_id, annee_universitaire)
+        self._phase_end('chargement', phase_start, modules=len(problem['modules']))
         
-        # Load all data in one go
-        modules = self.db.get_modules_with_inscriptions()
-        modules = sorted(modules, key=lambda x: x['nb_inscrits'], reverse=True)
+        if precheck:
+            failure = self.check_feasibility(problem, start_time)
+            if failure:
+                return False, failure
         
-        salles = self.db.get_lieu_examen()
-        salles_by_capacity = sorted(salles, key=lambda x: x['capacite_examen'], reverse=True)
+        solution = self.build_schedule(problem, improve=improve, time_budget=time_budget)
+        solution['stats']['violations'] = self.validate_solution(problem, solution)
         
-        professeurs = self.db.get_professeurs()
-        prof_by_dept = {}
-        for p in professeurs:
-            if p['dept_id'] not in prof_by_dept:
-                prof_by_dept[p['dept_id']] = []
-            prof_by_dept[p['dept_id']].append(p)
+        phase_start = self._phase_start('enregistrement')
+        result = self.save_solution(periode_id, solution, start_time)
+        self._phase_end('enregistrement', phase_start, scheduled=result['scheduled'])
         
-        # Delete existing exams - use direct SQL to ensure it works
-        print("Deleting existing exams...")
-        try:
-            self.db.execute_query("DELETE FROM surveillances", fetch=False)
-            self.db.execute_query("DELETE FROM examens WHERE periode_id = %s", (periode_id,), fetch=False)
-            print("Existing exams deleted.")
-        except Exception as e:
-            print(f"Warning: Could not delete existing exams: {e}")
-        
-        # Time slots
-        time_slots = [(8, 30), (11, 0), (14, 30), (17, 0)]
-        available_dates = [(date_debut + timedelta(days=i)) for i in range((date_fin - date_debut).days + 1)]
+        return True, result
+    
+    def check_feasibility(self, problem: Dict, start_time: datetime) -> Optional[Dict]:
+        """Run the lower-bound pre-check; returns the failure result when the period cannot be fully scheduled"""
+        phase_start = self._phase_start('faisabilite')
+        report = check_feasibility(problem)
+        self._phase_end('faisabilite', phase_start, impossible=report['impossible'])
+        if not report['impossible']:
+            return None
         
-        # In-memory tracking for fast constraint checking
-        room_schedule = {}  # {salle_id: [(start_datetime, end_datetime)]}
-        prof_daily_count = {}  # {(prof_id, date): count}
-        student_exams = {}  # {(student_id, date): count}
+        print("Schedule impossible, generation skipped:")
+        for reason in report['reasons']:
+            print(f"  - {reason}")
+        return {
+            'error': "Planification impossible : " + " ; ".join(report['reasons']),
+            'feasibility': report,
+            'execution_time': (datetime.now() - start_time).total_seconds()
+        }
+    
+    def validate_solution(self, problem: Dict, solution: Dict) -> Dict[str, int]:
+        """Hard-constraint check of a built schedule in memory, before anything is written: {message: nb_examens}"""
+        codes = ConstraintChecker(None).validate_batch(solution['exams'], problem['salles'], problem['enrollment'])
+        violations = {
+            message: int(np.count_nonzero(codes & flag))
+            for flag, message in VIOLATION_MESSAGES.items() if (codes & flag).any()
+        }
+        for message, count in violations.items():
+            print(f"⚠ {count} exams: {message}")
+        return violations
+    
+    def load_problem(self, periode_id: int, annee_universitaire: Optional[str] = None) -> Dict:
+        """Load everything the in-memory passes read, as plain picklable data.
         
-        # OPTIMIZED: Load enrollments with minimal data transfer
-        print("Loading enrollments (optimized)...")
-        enrollments = self.db.execute_query(
-            "SELECT module_id, etudiant_id FROM inscriptions WHERE statut = 'inscrit'"
-        )
+        Only enrollments of annee_universitaire are read when it is given.
+        """
+        # One pass over the database into compact arrays (see ProblemInstance)
+        print("Loading problem instance (optimized)...")
+        instance = ProblemInstance.from_db(self.db, periode_id, annee_universitaire)
+        print(instance)
+        problem = instance.to_problem()
+        enrollment = problem['enrollment']
+        print(f"Cohorts: {enrollment.n_represented} students -> {enrollment.n_students} cohorts "
+              f"(x{enrollment.compression_ratio:.1f})")
+        return problem
+    
+    def build_schedule(self, problem: Dict, modules: Optional[List[Dict]] = None, seed: Optional[int] = None,
+                       improve: bool = False, time_budget: float = 10.0) -> Dict:
+        """Greedy pass (and optional local search) in memory; nothing is written.
         
-        # Pre-allocate dictionaries for better performance
-        module_students = {m['id']: set() for m in modules}
-        student_modules = {}
+        `modules` overrides the placement order; `seed` randomises the starting
+        slot cursor and the local search, so several starts explore different schedules.
+        """
+        periode_id = problem['periode_id']
+        modules = problem['modules'] if modules is None else modules
+        salles = problem['salles']
+        professeurs = problem['professeurs']
+        prof_by_dept = problem['prof_by_dept']
+        time_slots = problem['time_slots']
+        available_dates = problem['available_dates']
+        enrollment = problem['enrollment']
+        rng = random.Random(seed)
         
-        # Single-pass enrollment processing
-        for enroll in enrollments:
-            mid = enroll['module_id']
-            sid = enroll['etudiant_id']
-            
-            if mid in module_students:
-                module_students[mid].add(sid)
-            
-            if sid not in student_modules:
-                student_modules[sid] = set()
-            student_modules[sid].add(mid)
+        # In-memory tracking for fast constraint checking
+        tick = RoomOccupancyIndex.grid_resolution(time_slots, (m['duree_examen'] for m in modules))
+        room_index = RoomOccupancyIndex(salles, len(available_dates), tick)  # rooms x time grid
+        prof_index = ProfOccupancyIndex(max_per_day=3)  # exam intervals per professor and day
+        placements = {}  # {module_id: (date_idx, time_idx, allocation, prof_id)}
         
-        student_daily_exams = {}  # {(student_id, date): count}
+        # Student (cohort) x day occupancy: one vectorised gather per candidate slot
+        student_day_busy = np.zeros((enrollment.n_students, len(available_dates)), dtype=bool)
         
         # Batch insert lists
         exams_to_insert = []
-        surveillances_to_insert = []
         
-        scheduled_count = 0
         failed_modules = []
+        total_probes = 0
         
         # Greedy scheduling
-        current_slot_index = 0
         total_slots = len(available_dates) * len(time_slots)
+        current_slot_index = rng.randrange(total_slots) if seed is not None else 0
         
-        for module in modules:
+        phase_start = self._phase_start('placement')
+        progress_step = max(len(modules) // 100, 1)
+        
+        for done, module in enumerate(modules, 1):
             module_id = module['id']
             nb_inscrits = module['nb_inscrits']
-            students = module_students.get(module_id, set())
+            students = enrollment.students_of(module_id)
             
             scheduled = False
             
-            # Get all suitable rooms (allow rooms with at least 50% capacity for flexibility)
-            suitable_rooms = [s for s in salles_by_capacity if s['capacite_examen'] >= nb_inscrits]
-            
-            # If no exact fit, use largest available rooms
-            if not suitable_rooms:
-                suitable_rooms = salles_by_capacity[:10]  # Use top 10 largest rooms
-            
             # Try to schedule in next available slot - OPTIMIZED
             attempts = 0
             max_attempts = min(50, total_slots)  # Reduced attempts for faster execution
@@ -120,27 +164,14 @@ class FastScheduler:
                     datetime.min.time().replace(hour=slot_hour, minute=slot_minute)
                 )
                 
-                # OPTIMIZED: Try each suitable room with early exit
-                suitable_room = None
-                exam_end_datetime = exam_datetime + timedelta(minutes=module['duree_examen'])
-                
-                for room in suitable_rooms:
-                    room_id = room['id']
-                    # Check for time overlap with existing exams in this room
-                    room_available = True
-                    
-                    if room_id in room_schedule:
-                        # Early termination on first conflict
-                        for existing_start, existing_end in room_schedule[room_id]:
-                            if not (exam_end_datetime <= existing_start or exam_datetime >= existing_end):
-                                room_available = False
-                                break
-                    
-                    if room_available:
-                        suitable_room = room
-                        break  # Found a room, stop searching
+                # OPTIMIZED: Smallest free fitting room from the occupancy index,
+                # split over several rooms of one building when no room is large enough
+                start_minute = slot_hour * 60 + slot_minute
+                allocation = room_index.allocate(
+                    date_idx, start_minute, module['duree_examen'], nb_inscrits, module.get('batiment')
+                )
                 
-                if not suitable_room:
+                if allocation is None:
                     attempts += 1
                     continue
                 
@@ -149,8 +180,7 @@ class FastScheduler:
                 prof = None
                 
                 for p in dept_profs:
-                    prof_key = (p['id'], exam_date)
-                    if prof_daily_count.get(prof_key, 0) < 3:
+                    if prof_index.is_free(p['id'], date_idx, start_minute, module['duree_examen']):
                         prof = p
                         break
                 
@@ -158,16 +188,8 @@ class FastScheduler:
                     attempts += 1
                     continue
                 
-                # Check student conflicts (fast) - max 1 exam per day with early termination
-                student_conflict = False
-                if len(students) > 0:  # Only check if there are students
-                    for student_id in students:
-                        student_key = (student_id, exam_date)
-                        if student_daily_exams.get(student_key, 0) >= 1:
-                            student_conflict = True
-                            break
-                
-                if student_conflict:
+                # Check student conflicts (fast) - max 1 exam per day
+                if student_day_busy[students, date_idx].any():
                     attempts += 1
                     continue
                 
@@ -175,7 +197,8 @@ class FastScheduler:
                 exams_to_insert.append({
                     'module_id': module_id,
                     'prof_id': prof['id'],
-                    'salle_id': suitable_room['id'],
+                    'salle_id': room_index.salles[allocation[0][0]]['id'],
+                    'salles': [(room_index.salles[pos]['id'], nb_places) for pos, nb_places in allocation],
                     'periode_id': periode_id,
                     'date_heure': exam_datetime,
                     'duree_minutes': module['duree_examen'],
@@ -183,114 +206,83 @@ class FastScheduler:
                 })
                 
                 # Update tracking
-                room_id = suitable_room['id']
-                if room_id not in room_schedule:
-                    room_schedule[room_id] = []
-                room_schedule[room_id].append((exam_datetime, exam_end_datetime))
+                for pos, _ in allocation:
+                    room_index.reserve(pos, date_idx, start_minute, module['duree_examen'])
                 
-                prof_key = (prof['id'], exam_date)
-                prof_daily_count[prof_key] = prof_daily_count.get(prof_key, 0) + 1
+                prof_index.reserve(prof['id'], date_idx, start_minute, module['duree_examen'])
+                placements[module_id] = (date_idx, time_idx, allocation, prof['id'])
                 
-                for student_id in students:
-                    student_key = (student_id, exam_date)
-                    student_daily_exams[student_key] = student_daily_exams.get(student_key, 0) + 1
+                student_day_busy[students, date_idx] = True
                 
                 scheduled = True
-                scheduled_count += 1
                 current_slot_index = (slot_idx + 1) % total_slots
                 
                 attempts += 1
             
+            total_probes += attempts
+            
             if not scheduled:
                 failed_modules.append({'module': module['nom'], 'nb_inscrits': nb_inscrits})
+                self._emit('module_failed', 'placement', module=module['nom'], nb_inscrits=nb_inscrits)
+            
+            if done % progress_step == 0 or done == len(modules):
+                self._emit('progress', 'placement', done=done, total=len(modules),
+                           placed=len(exams_to_insert), failed=len(failed_modules))
         
-        # Batch insert all exams - OPTIMIZED for speed
-        print(f"Inserting {len(exams_to_insert)} exams in bulk...")
-        exam_ids = []
+        self._phase_end('placement', phase_start, placed=len(exams_to_insert), failed=len(failed_modules))
         
-        if exams_to_insert:
-            # Bulk insert using executemany for maximum performance
-            exam_values = [
-                (
-                    exam['module_id'],
-                    exam['prof_id'],
-                    exam['salle_id'],
-                    exam['periode_id'],
-                    exam['date_heure'],
-                    exam['duree_minutes'],
-                    exam['nb_inscrits']
-                )
-                for exam in exams_to_insert
-            ]
-            
-            try:
-                # Use ON CONFLICT to handle duplicates gracefully
-                query = """
-                    INSERT INTO examens (module_id, prof_responsable_id, salle_id, periode_id, 
-                                        date_heure, duree_minutes, nb_inscrits)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (module_id, periode_id) DO UPDATE SET
-                        prof_responsable_id = EXCLUDED.prof_responsable_id,
-                        salle_id = EXCLUDED.salle_id,
-                        date_heure = EXCLUDED.date_heure,
-                        duree_minutes = EXCLUDED.duree_minutes,
-                        nb_inscrits = EXCLUDED.nb_inscrits
-                    RETURNING id
-                """
-                
-                with self.db.get_cursor(dict_cursor=False) as cursor:
-                    for idx, values in enumerate(exam_values):
-                        cursor.execute(query, values)
-                        result = cursor.fetchone()
-                        if result:
-                            exam_id = result[0]
-                            exam_ids.append((exam_id, exams_to_insert[idx]['prof_id'], exams_to_insert[idx]['module_id']))
-                
-                print(f"✓ Successfully inserted {len(exam_ids)} exams")
-            except Exception as e:
-                print(f"Bulk insert failed, falling back to individual inserts: {e}")
-                # Fallback to individual inserts
-                for exam_data in exams_to_insert:
-                    try:
-                        exam_id = self.db.create_examen(
-                            exam_data['module_id'],
-                            exam_data['prof_id'],
-                            exam_data['salle_id'],
-                            exam_data['periode_id'],
-                            exam_data['date_heure'],
-                            exam_data['duree_minutes'],
-                            exam_data['nb_inscrits']
-                        )
-                        if exam_id:
-                            exam_ids.append((exam_id, exam_data['prof_id'], exam_data['module_id']))
-                    except Exception as e:
-                        print(f"Error inserting exam: {e}")
+        # Optional local search on the in-memory schedule, before anything is written
+        local_search = None
+        if improve:
+            local_search, exams_to_insert, failed_modules = self._improve(
+                problem, modules, placements, room_index, seed, time_budget
+            )
         
-        # Bulk create surveillances - OPTIMIZED
-        print(f"Creating {len(exam_ids)} surveillances in bulk...")
-        if exam_ids:
-            surveillance_values = [
-                (exam_id, prof_id, 'responsable')
-                for exam_id, prof_id, module_id in exam_ids
-            ]
-            
-            try:
-                query = """
-                    INSERT INTO surveillances (examen_id, prof_id, role)
-                    VALUES (%s, %s, %s)
-                    ON CONFLICT (examen_id, prof_id) DO NOTHING
-                """
-                with self.db.get_cursor(dict_cursor=False) as cursor:
-                    cursor.executemany(query, surveillance_values)
-                print(f"✓ Successfully created {len(surveillance_values)} surveillances")
-            except Exception as e:
-                print(f"Bulk surveillance insert failed, falling back: {e}")
-                # Fallback to individual inserts
-                for exam_id, prof_id, module_id in exam_ids:
-                    try:
-                        self.db.create_surveillance(exam_id, prof_id, 'responsable')
-                    except Exception as e:
-                        print(f"Error creating surveillance: {e}")
+        return {
+            'exams': exams_to_insert,
+            'failed_modules': failed_modules,
+            'probes': total_probes,
+            'local_search': local_search,
+            'stats': self._cohort_stats(enrollment)
+        }
+    
+    @staticmethod
+    def _cohort_stats(enrollment) -> Dict:
+        return {'cohorts': enrollment.n_students, 'compression_ratio': round(enrollment.compression_ratio, 1)}
+    
+    def _improve(self, problem: Dict, modules: List[Dict], placements: Dict, room_index: RoomOccupancyIndex,
+                 seed: Optional[int], time_budget: float) -> Tuple[Dict, List[Dict], List[Dict]]:
+        """Simulated-annealing pass over a built placement; returns (stats, exams, failed_modules)"""
+        print(f"Improving schedule (simulated annealing, {time_budget:.0f}s budget)...")
+        phase_start = self._phase_start('recherche_locale')
+        annealer = SimulatedAnnealing(
+            modules, placements, problem['enrollment'], room_index, problem['prof_by_dept'],
+            problem['professeurs'], problem['available_dates'], problem['time_slots'], seed=seed
+        )
+        local_search = annealer.run(
+            time_budget,
+            progress=lambda elapsed, unplaced, conflicts: self._emit(
+                'progress', 'recherche_locale', done=elapsed, total=time_budget,
+                failed=unplaced, conflicts=conflicts
+            )
+        )
+        self._phase_end('recherche_locale', phase_start,
+                        failed=local_search['unplaced_after'], conflicts=local_search['conflicts_after'])
+        return local_search, annealer.to_exams(problem['periode_id']), annealer.failed_modules()
+    
+    def save_solution(self, periode_id: int, solution: Dict, start_time: datetime) -> Dict:
+        """Persist a built schedule and return the result summary shown on the admin page.
+        
+        The schedule is staged first and then swapped in with one transaction scoped to
+        the period, so the student and professor pages keep the old one until the commit.
+        """
+        exams_to_insert = solution['exams']
+        failed_modules = solution['failed_modules']
+        
+        print(f"Staging {len(exams_to_insert)} exams...")
+        self.db.stage_examens(periode_id, exams_to_insert)
+        nb_examens = self.db.swap_examens(periode_id)
+        print(f"✓ Schedule swapped in: {nb_examens} exams for period {periode_id}")
         
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
@@ -299,15 +291,18 @@ class FastScheduler:
         conflicts, total_conflicts = self.get_conflicts()
         
         result = {
-            'scheduled': scheduled_count,
+            'scheduled': len(exams_to_insert),
             'failed': len(failed_modules),
             'failed_modules': failed_modules[:10],
+            'probes': solution['probes'],
+            'local_search': solution['local_search'],
             'execution_time': execution_time,
             'conflicts': conflicts,
             'total_conflicts': total_conflicts
         }
+        result.update(solution['stats'])
         
-        return True, result
+        return result
     
     def get_conflicts(self):
         """Fast conflict detection"""
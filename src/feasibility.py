@@ -0,0 +1,131 @@
+import time
+from typing import Dict, List, Set
+import numpy as np
+
+# Same limits as the schedulers: one exam per student per day, three per professor per day
+MAX_EXAMS_PER_PROF_PER_DAY = 3
+
+def greedy_clique(neighbours: List[Set[int]], seeds: int = 200) -> List[int]:
+    """Large clique of the conflict graph, grown greedily from the highest-degree modules.
+    
+    Every module of a clique shares students with every other one, so a clique of
+    size k needs k distinct days: its size is a lower bound on the session length.
+    """
+    order = sorted(range(len(neighbours)), key=lambda i: len(neighbours[i]), reverse=True)
+    best = []
+    for v in order[:seeds]:
+        if len(neighbours[v]) + 1 <= len(best):
+            break  # degrees only decrease from here
+        clique = [v]
+        candidates = set(neighbours[v])
+        for u in sorted(candidates, key=lambda i: len(neighbours[i]), reverse=True):
+            if u in candidates:
+                clique.append(u)
+                candidates &= neighbours[u]
+        if len(clique) > len(best):
+            best = clique
+    return best
+
+def check_feasibility(problem: Dict) -> Dict:
+    """Lower bounds proving a period cannot be fully scheduled, computed before any placement.
+    
+    Checks days (conflict-graph clique and per-student exam count against the
+    period length), rooms (largest module, seats per slot and seat-minutes against
+    the rooms' capacity) and professors (exams per department against three per
+    professor per day). 'impossible' is only set when a bound is violated; a passing
+    check does not guarantee that every module will be placed.
+    """
+    start = time.time()
+    modules = problem['modules']
+    enrollment = problem['enrollment']
+    time_slots = problem['time_slots']
+    n_days = len(problem['available_dates'])
+    reasons = []
+    
+    # Days: a student sits at most one exam per day
+    module_index = {m['id']: i for i, m in enumerate(modules)}
+    neighbours = enrollment.conflict_graph(module_index)
+    clique = greedy_clique(neighbours)
+    exams_per_row = np.diff(enrollment.student_indptr)
+    max_exams_per_student = int(exams_per_row.max()) if len(exams_per_row) else 0
+    overloaded_students = int(enrollment.student_weights[exams_per_row > n_days].sum())
+    
+    if len(clique) > n_days:
+        names = ', '.join(modules[i]['nom'] for i in clique[:5])
+        reasons.append(
+            f"{len(clique)} modules partagent des étudiants deux à deux ({names}...) : "
+            f"il faut au moins {len(clique)} jours, la période en compte {n_days}"
+        )
+    if overloaded_students:
+        reasons.append(
+            f"{overloaded_students} étudiant(s) ont plus de {n_days} examens "
+            f"(jusqu'à {max_exams_per_student}) pour {n_days} jours à 1 examen par jour"
+        )
+    
+    # Rooms: a room hosts at most one exam per slot, and no two exams at once
+    capacities = np.array([s['capacite_examen'] for s in problem['salles']], dtype=np.int64)
+    total_capacity = int(capacities.sum())
+    sizes = np.array([m['nb_inscrits'] for m in modules], dtype=np.int64)
+    durees = np.array([m['duree_examen'] for m in modules], dtype=np.int64)
+    
+    slot_starts = [hour * 60 + minute for hour, minute in time_slots]
+    day_span = min(max(slot_starts) + int(durees.max(initial=0)), 24 * 60) - min(slot_starts)
+    seats_needed = int(sizes.sum())
+    seat_slots_available = total_capacity * len(time_slots) * n_days
+    seat_minutes_needed = int((sizes * durees).sum())
+    seat_minutes_available = total_capacity * day_span * n_days
+    largest = int(np.argmax(sizes)) if len(sizes) else None
+    
+    if largest is not None and sizes[largest] > total_capacity:
+        reasons.append(
+            f"Le module {modules[largest]['nom']} ({sizes[largest]} inscrits) dépasse la capacité "
+            f"totale des salles ({total_capacity} places)"
+        )
+    if seats_needed > seat_slots_available:
+        reasons.append(
+            f"{seats_needed} places d'examen nécessaires pour {seat_slots_available} disponibles "
+            f"({total_capacity} places x {len(time_slots)} créneaux x {n_days} jours)"
+        )
+    if seat_minutes_needed > seat_minutes_available:
+        reasons.append(
+            f"{seat_minutes_needed} places-minutes nécessaires pour {seat_minutes_available} disponibles "
+            f"({total_capacity} places x {day_span} min x {n_days} jours)"
+        )
+    
+    # Professors: each exam needs a responsible from its department (or the fallback
+    # professors), each at most three exams per day
+    prof_by_dept = problem['prof_by_dept']
+    fallback = tuple(p['id'] for p in problem['professeurs'][:5])
+    exams_by_pool = {}
+    for m in modules:
+        pool = tuple(p['id'] for p in prof_by_dept.get(m['dept_id'], [])) or fallback
+        exams_by_pool.setdefault(pool, []).append(m)
+    prof_shortfalls = []
+    for pool, pool_modules in exams_by_pool.items():
+        capacity = MAX_EXAMS_PER_PROF_PER_DAY * len(pool) * n_days
+        if len(pool_modules) > capacity:
+            dept_id = pool_modules[0]['dept_id']
+            prof_shortfalls.append(dept_id)
+            reasons.append(
+                f"Département {dept_id} : {len(pool_modules)} examens pour {len(pool)} enseignant(s), "
+                f"soit au plus {capacity} sur {n_days} jours"
+            )
+    
+    return {
+        'impossible': bool(reasons),
+        'reasons': reasons,
+        'bounds': {
+            'days_available': n_days,
+            'days_needed': max(len(clique), max_exams_per_student),
+            'clique_size': len(clique),
+            'max_exams_per_student': max_exams_per_student,
+            'total_capacity': total_capacity,
+            'largest_module': int(sizes[largest]) if largest is not None else 0,
+            'seats_needed': seats_needed,
+            'seat_slots_available': seat_slots_available,
+            'seat_minutes_needed': seat_minutes_needed,
+            'seat_minutes_available': seat_minutes_available,
+            'prof_shortfalls': prof_shortfalls
+        },
+        'execution_time': time.time() - start
+    }
@@ -0,0 +1,303 @@
+from datetime import datetime
+import time
+from typing import List, Dict, Tuple, Optional
+import numpy as np
+from src.fast_scheduler import FastScheduler
+from src.room_index import RoomOccupancyIndex, ProfOccupancyIndex
+
+class IncrementalScheduler(FastScheduler):
+    """Repairs an existing period schedule after data changes instead of rebuilding it.
+    
+    Existing exams are re-validated largest first against the current enrollments,
+    available rooms and professors. Valid exams keep their slot (and rooms when they
+    still fit); only the others are re-placed, and only changed rows are written.
+    """
+    
+    def reschedule(self, periode_id: int, annee_universitaire: str) -> Tuple[bool, Dict]:
+        start_time = datetime.now()
+        self._started = time.time()
+        
+        existing = self._load_existing(periode_id)
+        if not existing:
+            print("No existing schedule for this period, running a full generation...")
+            return self.generate_schedule(periode_id, annee_universitaire)
+        
+        phase_start = self._phase_start('chargement')
+        problem = self.load_problem(periode_id, annee_universitaire)
+        self._phase_end('chargement', phase_start, modules=len(problem['modules']))
+        modules = problem['modules']
+        professeurs = problem['professeurs']
+        prof_by_dept = problem['prof_by_dept']
+        time_slots = problem['time_slots']
+        available_dates = problem['available_dates']
+        enrollment = problem['enrollment']
+        
+        durations = [m['duree_examen'] for m in modules] + [e['duree_minutes'] for e in existing.values()]
+        tick = RoomOccupancyIndex.grid_resolution(time_slots, durations)
+        room_index = RoomOccupancyIndex(problem['salles'], len(available_dates), tick)
+        pos_by_salle = {s['id']: pos for pos, s in enumerate(room_index.salles)}
+        prof_index = ProfOccupancyIndex(max_per_day=3)  # exam intervals (and daily count) per professor and day
+        # Exams per student and day (counts, so that a held exam can be released again)
+        student_day_busy = np.zeros((enrollment.n_students, len(available_dates)), dtype=np.int16)
+        
+        def occupy(module_id, date_idx, start_minute, duree_minutes, positions, prof_id, delta=1):
+            for pos in positions:
+                if delta > 0:
+                    room_index.reserve(pos, date_idx, start_minute, duree_minutes)
+                else:
+                    room_index.release(pos, date_idx, start_minute, duree_minutes)
+            if delta > 0:
+                prof_index.reserve(prof_id, date_idx, start_minute, duree_minutes)
+            else:
+                prof_index.release(prof_id, date_idx, start_minute, duree_minutes)
+            student_day_busy[enrollment.students_of(module_id), date_idx] += delta
+        
+        def commit(module, date_idx, time_idx, allocation, prof_id):
+            start_minute = time_slots[time_idx][0] * 60 + time_slots[time_idx][1]
+            occupy(module['id'], date_idx, start_minute, module['duree_examen'], [pos for pos, _ in allocation], prof_id)
+        
+        def old_placement(exam) -> Optional[Tuple]:
+            """occupy() arguments of a stored exam that can still be held where it is, else None"""
+            slot = self._slot_of(exam, available_dates, time_slots)
+            if slot is None:
+                return None
+            date_idx, time_idx = slot
+            start_minute = time_slots[time_idx][0] * 60 + time_slots[time_idx][1]
+            positions = [pos_by_salle.get(salle_id) for salle_id, _ in exam['salles']]
+            if None in positions or not all(room_index.is_free(pos, date_idx, start_minute, exam['duree_minutes'])
+                                            for pos in positions):
+                return None
+            if not prof_index.is_free(exam['prof_responsable_id'], date_idx, start_minute, exam['duree_minutes']):
+                return None
+            return date_idx, start_minute, exam['duree_minutes'], positions, exam['prof_responsable_id']
+        
+        def pick_prof(module, date_idx, start_minute, preferred=None) -> Optional[int]:
+            candidates = [p['id'] for p in prof_by_dept.get(module['dept_id'], professeurs[:5])]
+            if preferred in candidates:
+                candidates = [preferred] + candidates
+            for prof_id in candidates:
+                if prof_index.is_free(prof_id, date_idx, start_minute, module['duree_examen']):
+                    return prof_id
+            return None
+        
+        # Pass 1: keep every existing exam that is still valid, largest first
+        phase_start = self._phase_start('validation')
+        kept = {}  # {module_id: (date_idx, time_idx, allocation, prof_id)}
+        affected = []
+        for module in modules:
+            exam = existing.get(module['id'])
+            slot = self._slot_of(exam, available_dates, time_slots) if exam else None
+            if slot is None:
+                affected.append(module)
+                continue
+            
+            date_idx, time_idx = slot
+            start_minute = time_slots[time_idx][0] * 60 + time_slots[time_idx][1]
+            positions = [pos_by_salle.get(salle_id) for salle_id, _ in exam['salles']]
+            if (None in positions
+                    or student_day_busy[enrollment.students_of(module['id']), date_idx].any()
+                    or not all(room_index.is_free(pos, date_idx, start_minute, module['duree_examen'])
+                               for pos in positions)):
+                affected.append(module)
+                continue
+            
+            allocation = self._refill(room_index, positions, module['nb_inscrits'])
+            prof_id = pick_prof(module, date_idx, start_minute, exam['prof_responsable_id'])
+            if allocation is None or prof_id is None:
+                affected.append(module)
+                continue
+            
+            commit(module, date_idx, time_idx, allocation, prof_id)
+            kept[module['id']] = (date_idx, time_idx, allocation, prof_id)
+        
+        self._phase_end('validation', phase_start, kept=len(kept), affected=len(affected))
+        
+        # Pass 2: re-place affected modules, original slot first so timetables move as little as possible.
+        # Until its turn, an affected exam keeps holding its old rooms, students and professor:
+        # a module that cannot be moved keeps its row without clashing with the ones placed before it.
+        held = {}
+        for module in affected:
+            exam = existing.get(module['id'])
+            placement = old_placement(exam) if exam else None
+            if placement is not None:
+                occupy(module['id'], *placement)
+                held[module['id']] = placement
+        
+        print(f"Re-placing {len(affected)} affected modules...")
+        phase_start = self._phase_start('placement')
+        total_slots = len(available_dates) * len(time_slots)
+        failed_modules = []
+        dropped_ids = []
+        total_probes = 0
+        progress_step = max(len(affected) // 100, 1)
+        for done, module in enumerate(affected, 1):
+            if done % progress_step == 0 or done == len(affected):
+                self._emit('progress', 'placement', done=done, total=len(affected),
+                           placed=len(kept), failed=len(failed_modules))
+            exam = existing.get(module['id'])
+            old = held.pop(module['id'], None)
+            if old is not None:
+                occupy(module['id'], *old, delta=-1)
+            slot = self._slot_of(exam, available_dates, time_slots) if exam else None
+            order = list(range(total_slots))
+            if slot is not None:
+                first = slot[0] * len(time_slots) + slot[1]
+                order = [first] + order[:first] + order[first + 1:]
+            
+            students = enrollment.students_of(module['id'])
+            placement = None
+            for slot_idx in order:
+                total_probes += 1
+                date_idx, time_idx = divmod(slot_idx, len(time_slots))
+                if student_day_busy[students, date_idx].any():
+                    continue
+                start_minute = time_slots[time_idx][0] * 60 + time_slots[time_idx][1]
+                allocation = room_index.allocate(
+                    date_idx, start_minute, module['duree_examen'], module['nb_inscrits'], module.get('batiment')
+                )
+                if allocation is None:
+                    continue
+                prof_id = pick_prof(module, date_idx, start_minute, exam['prof_responsable_id'] if exam else None)
+                if prof_id is None:
+                    continue
+                placement = (date_idx, time_idx, allocation, prof_id)
+                break
+            
+            if placement is None:
+                # The old row is kept (held again) when it still fits in the grid, else removed; both are reported
+                if old is not None:
+                    occupy(module['id'], *old)
+                elif exam is not None:
+                    dropped_ids.append(exam['id'])
+                failed_modules.append({'module': module['nom'], 'nb_inscrits': module['nb_inscrits']})
+                self._emit('module_failed', 'placement', module=module['nom'], nb_inscrits=module['nb_inscrits'])
+                continue
+            commit(module, *placement)
+            kept[module['id']] = placement
+        
+        self._phase_end('placement', phase_start, placed=len(kept), failed=len(failed_modules))
+        
+        # Diff against the stored rows
+        module_by_id = {m['id']: m for m in modules}
+        updates = []
+        inserts = []
+        for module_id, (date_idx, time_idx, allocation, prof_id) in kept.items():
+            module = module_by_id[module_id]
+            slot_hour, slot_minute = time_slots[time_idx]
+            row = {
+                'module_id': module_id,
+                'prof_id': prof_id,
+                'salle_id': room_index.salles[allocation[0][0]]['id'],
+                'salles': [(room_index.salles[pos]['id'], nb_places) for pos, nb_places in allocation],
+                'periode_id': periode_id,
+                'date_heure': datetime.combine(
+                    available_dates[date_idx],
+                    datetime.min.time().replace(hour=slot_hour, minute=slot_minute)
+                ),
+                'duree_minutes': module['duree_examen'],
+                'nb_inscrits': module['nb_inscrits']
+            }
+            exam = existing.get(module_id)
+            if exam is None:
+                inserts.append(row)
+            elif self._changed(exam, row):
+                row['id'] = exam['id']
+                row['prof_changed'] = exam['prof_responsable_id'] != prof_id
+                updates.append(row)
+        
+        deleted_ids = [exam['id'] for module_id, exam in existing.items() if module_id not in module_by_id]
+        if dropped_ids:
+            print(f"⚠ {len(dropped_ids)} unplaceable exams could not keep their old slot and are removed")
+        deleted_ids += dropped_ids
+        
+        phase_start = self._phase_start('enregistrement')
+        self._apply_changes(updates, inserts, deleted_ids)
+        self._phase_end('enregistrement', phase_start, updated=len(updates), inserted=len(inserts))
+        
+        end_time = datetime.now()
+        execution_time = (end_time - start_time).total_seconds()
+        
+        conflicts, total_conflicts = self.get_conflicts()
+        
+        result = {
+            'scheduled': len(kept),
+            'failed': len(failed_modules),
+            'failed_modules': failed_modules[:10],
+            'probes': total_probes,
+            'affected': len(affected),
+            'unchanged': len(kept) - len(updates) - len(inserts),
+            'updated': len(updates),
+            'inserted': len(inserts),
+            'deleted': len(deleted_ids),
+            'dropped': len(dropped_ids),
+            **self._cohort_stats(enrollment),
+            'execution_time': execution_time,
+            'conflicts': conflicts,
+            'total_conflicts': total_conflicts
+        }
+        
+        return True, result
+    
+    def _load_existing(self, periode_id: int) -> Dict[int, Dict]:
+        """{module_id: exam row} for the period, with 'salles' as [(salle_id, nb_places)]"""
+        exams = self.db.execute_query("""
+            SELECT id, module_id, prof_responsable_id, salle_id, date_heure, duree_minutes, nb_inscrits
+            FROM examens
+            WHERE periode_id = %s
+        """, (periode_id,)) or []
+        
+        repartition = self.db.execute_query("""
+            SELECT es.examen_id, es.salle_id, es.nb_places
+            FROM examen_salles es
+            JOIN examens e ON es.examen_id = e.id
+            WHERE e.periode_id = %s
+            ORDER BY es.id
+        """, (periode_id,)) or []
+        
+        salles_by_exam = {}
+        for r in repartition:
+            salles_by_exam.setdefault(r['examen_id'], []).append((r['salle_id'], r['nb_places']))
+        
+        existing = {}
+        for exam in exams:
+            exam = dict(exam)
+            exam['salles'] = salles_by_exam.get(exam['id']) or [(exam['salle_id'], exam['nb_inscrits'])]
+            existing[exam['module_id']] = exam
+        return existing
+    
+    @staticmethod
+    def _slot_of(exam: Dict, available_dates: List, time_slots: List[Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+        """(date_idx, time_idx) of a stored exam, or None when it is outside the period grid"""
+        date_heure = exam['date_heure']
+        date_idx = (date_heure.date() - available_dates[0]).days
+        if not 0 <= date_idx < len(available_dates):
+            return None
+        if (date_heure.hour, date_heure.minute) not in time_slots:
+            return None
+        return date_idx, time_slots.index((date_heure.hour, date_heure.minute))
+    
+    @staticmethod
+    def _refill(room_index: RoomOccupancyIndex, positions: List[int], nb_inscrits: int) -> Optional[List[Tuple[int, int]]]:
+        """Seat nb_inscrits in the exam's current rooms (in order), dropping rooms no longer needed"""
+        allocation = []
+        remaining = nb_inscrits
+        for pos in positions:
+            if remaining <= 0:
+                break
+            nb_places = min(int(room_index.capacities[pos]), remaining)
+            allocation.append((pos, nb_places))
+            remaining -= nb_places
+        return allocation if remaining <= 0 else None
+    
+    @staticmethod
+    def _changed(exam: Dict, row: Dict) -> bool:
+        return (exam['date_heure'] != row['date_heure']
+                or exam['prof_responsable_id'] != row['prof_id']
+                or exam['duree_minutes'] != row['duree_minutes']
+                or exam['nb_inscrits'] != row['nb_inscrits']
+                or list(exam['salles']) != row['salles'])
+    
+    def _apply_changes(self, updates: List[Dict], inserts: List[Dict], deleted_ids: List[int]):
+        # One transaction: readers never see a half-repaired schedule, and room clashes are checked at commit
+        print(f"Writing changes: {len(updates)} updated, {len(inserts)} new, {len(deleted_ids)} removed...")
+        self.db.apply_examen_changes(updates, inserts, deleted_ids)
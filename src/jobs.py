@@ -0,0 +1,260 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+from psycopg2.extras import Json
+from src.fast_scheduler import FastScheduler
+from src.dsatur_scheduler import DSaturScheduler
+from src.multistart import MultiStartScheduler
+from src.incremental_scheduler import IncrementalScheduler
+
+ALGORITHMES = {
+    'fast': FastScheduler,
+    'dsatur': DSaturScheduler
+}
+
+# Progress bar band of each scheduler phase: (start, end, label)
+PHASES = {
+    'chargement': (0.0, 0.1, "Chargement des données"),
+    'faisabilite': (0.1, 0.1, "Vérification de faisabilité"),
+    'graphe': (0.1, 0.15, "Graphe de conflits"),
+    'validation': (0.1, 0.3, "Vérification de l'EDT existant"),
+    'placement': (0.15, 0.7, "Placement des examens"),
+    'demarrages': (0.1, 0.9, "Démarrages parallèles"),
+    'recherche_locale': (0.7, 0.9, "Recuit simulé"),
+    'enregistrement': (0.9, 1.0, "Enregistrement")
+}
+
+# First key of pg_try_advisory_lock(int, int); the second one is the periode_id
+LOCK_NAMESPACE = 7301
+
+def describe_progress(event: Dict) -> Tuple[float, str]:
+    """(fraction, French label) of a scheduler progress event"""
+    start, end, label = PHASES.get(event['phase'], (0.0, 1.0, event['phase']))
+    if event['event'] == 'phase_start':
+        return start, f"{label}..."
+    if event['event'] == 'phase_end':
+        return end, f"{label} terminé ({event['duration']:.1f}s)"
+    fraction = min(event['done'] / event['total'], 1.0) if event.get('total') else 1.0
+    text = f"{label} : {event['done']:.0f}/{event['total']:.0f}"
+    if 'failed' in event:
+        text += f" — {event['failed']} échecs"
+    return start + (end - start) * fraction, f"{text} ({event['elapsed']:.0f}s écoulées)"
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+def enqueue_job(db, periode_id: int, annee_universitaire: str, mode: str = 'complet',
+                options: Optional[Dict] = None, created_by: Optional[int] = None) -> Tuple[int, bool]:
+    """Queue a generation; returns (job_id, created). An active job of the period is returned instead of a new one."""
+    rows = db.execute_query("""
+        INSERT INTO schedule_jobs (periode_id, annee_universitaire, mode, options, created_by)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (periode_id) WHERE statut IN ('en_attente', 'en_cours') DO NOTHING
+        RETURNING id
+    """, (periode_id, annee_universitaire, mode, Json(options or {}), created_by))
+    if rows:
+        return rows[0]['id'], True
+    
+    active = get_active_job(db, periode_id)
+    return (active['id'] if active else None), False
+
+def get_job(db, job_id: int) -> Optional[Dict]:
+    rows = db.execute_query("SELECT * FROM schedule_jobs WHERE id = %s", (job_id,))
+    return rows[0] if rows else None
+
+def get_active_job(db, periode_id: int) -> Optional[Dict]:
+    rows = db.execute_query("""
+        SELECT * FROM schedule_jobs
+        WHERE periode_id = %s AND statut IN ('en_attente', 'en_cours')
+        ORDER BY created_at
+        LIMIT 1
+    """, (periode_id,))
+    return rows[0] if rows else None
+
+def get_recent_jobs(db, periode_id: Optional[int] = None, limit: int = 10) -> List[Dict]:
+    if periode_id:
+        return db.execute_query("""
+            SELECT * FROM schedule_jobs WHERE periode_id = %s ORDER BY created_at DESC LIMIT %s
+        """, (periode_id, limit))
+    return db.execute_query("SELECT * FROM schedule_jobs ORDER BY created_at DESC LIMIT %s", (limit,))
+
+class JobRunner:
+    """Background executor for schedule_jobs.
+    
+    A dispatcher thread claims queued jobs (FOR UPDATE SKIP LOCKED, so several
+    app servers can share the table) and runs them on a small thread pool. Each run
+    holds a Postgres advisory lock on its periode_id for its whole duration, so a
+    period is never generated twice at the same time, whoever started it.
+    """
+    
+    def __init__(self, db, max_workers: int = 2, poll_interval: float = 2.0, progress_interval: float = 1.0):
+        self.db = db
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.progress_interval = progress_interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='schedule-job')
+        self._slots = threading.Semaphore(max_workers)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def start(self) -> 'JobRunner':
+        if self._thread is None:
+            self._recover_interrupted()
+            self._thread = threading.Thread(target=self._dispatch, name='schedule-job-dispatcher', daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._pool.shutdown(wait=False)
+    
+    def notify(self):
+        """Wake the dispatcher right away (after enqueue_job) instead of waiting for the next poll"""
+        self._wake.set()
+    
+    def _recover_interrupted(self):
+        # A job left 'en_cours' whose period lock is free died with a previous process
+        with self.db.get_connection() as conn:
+            # Autocommit: each job is marked failed, and committed, while its period is locked
+            conn.autocommit = True
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT id, periode_id FROM schedule_jobs
+                WHERE statut = 'en_cours' AND started_at < NOW() - INTERVAL '1 minute'
+            """)
+            for job_id, periode_id in cursor.fetchall():
+                cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (LOCK_NAMESPACE, periode_id))
+                if not cursor.fetchone()[0]:
+                    continue
+                try:
+                    cursor.execute("""
+                        UPDATE schedule_jobs
+                        SET statut = 'échec', erreur = 'Interrompu (redémarrage du serveur)', finished_at = NOW()
+                        WHERE id = %s
+                    """, (job_id,))
+                finally:
+                    cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (LOCK_NAMESPACE, periode_id))
+    
+    def _dispatch(self):
+        while not self._stop.is_set():
+            while self._slots.acquire(blocking=False):
+                job = self._claim()
+                if job is None:
+                    self._slots.release()
+                    break
+                self._pool.submit(self._run, job)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+    
+    def _claim(self) -> Optional[Dict]:
+        try:
+            rows = self.db.execute_query("""
+                UPDATE schedule_jobs
+                SET statut = 'en_cours', started_at = NOW(), message = 'Démarrage...'
+                WHERE id = (
+                    SELECT id FROM schedule_jobs
+                    WHERE statut = 'en_attente'
+                    ORDER BY created_at
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING *
+            """)
+            return rows[0] if rows else None
+        except Exception as e:
+            print(f"Job claim failed: {e}")
+            return None
+    
+    def _run(self, job: Dict):
+        started = time.time()
+        try:
+            with self.db.get_connection() as lock_conn:
+                # Autocommit: the lock connection must not sit idle in a transaction for the whole run
+                lock_conn.autocommit = True
+                lock_cursor = lock_conn.cursor()
+                lock_cursor.execute("SELECT pg_try_advisory_lock(%s, %s)", (LOCK_NAMESPACE, job['periode_id']))
+                if not lock_cursor.fetchone()[0]:
+                    self._finish(job['id'], 'échec', started,
+                                 erreur="Une génération est déjà en cours pour cette période")
+                    return
+                try:
+                    success, result = self._execute(job)
+                    if success:
+                        self._finish(job['id'], 'terminé', started, resultat=result)
+                    else:
+                        self._finish(job['id'], 'échec', started, resultat=result, erreur=result.get('error'))
+                finally:
+                    lock_cursor.execute("SELECT pg_advisory_unlock(%s, %s)", (LOCK_NAMESPACE, job['periode_id']))
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            self._finish(job['id'], 'échec', started, erreur=str(e))
+        finally:
+            self._slots.release()
+            self._wake.set()
+    
+    def _execute(self, job: Dict) -> Tuple[bool, Dict]:
+        options = job['options'] or {}
+        progress = self._progress_writer(job['id'])
+        
+        if job['mode'] == 'incremental':
+            return IncrementalScheduler(self.db, progress=progress).reschedule(
+                job['periode_id'], job['annee_universitaire']
+            )
+        
+        scheduler_cls = ALGORITHMES.get(options.get('algorithme', 'fast'), FastScheduler)
+        n_starts = options.get('n_starts', 1)
+        if n_starts > 1:
+            scheduler = MultiStartScheduler(self.db, scheduler_cls, n_starts=n_starts,
+                                            score=options.get('score', 'echecs'), progress=progress)
+        else:
+            scheduler = scheduler_cls(self.db, progress=progress)
+        return scheduler.generate_schedule(
+            job['periode_id'], job['annee_universitaire'],
+            improve=options.get('improve', False), time_budget=options.get('time_budget', 10.0),
+            precheck=options.get('precheck', True)
+        )
+    
+    def _progress_writer(self, job_id: int):
+        """Progress callback persisting to the job row, at most once per progress_interval (phase ends always)"""
+        last_write = [0.0]
+        
+        def on_event(event):
+            now = time.time()
+            if event['event'] == 'module_failed':
+                return
+            if event['event'] != 'phase_end' and now - last_write[0] < self.progress_interval:
+                return
+            last_write[0] = now
+            fraction, message = describe_progress(event)
+            try:
+                self.db.execute_query("""
+                    UPDATE schedule_jobs SET progression = %s, phase = %s, message = %s WHERE id = %s
+                """, (min(fraction, 1.0), event['phase'], message, job_id), fetch=False)
+            except Exception as e:
+                print(f"Job {job_id} progress update failed: {e}")
+        
+        return on_event
+    
+    def _finish(self, job_id: int, statut: str, started: float, resultat: Optional[Dict] = None,
+                erreur: Optional[str] = None):
+        resultat_json = json.loads(json.dumps(resultat, default=_json_default)) if resultat is not None else None
+        self.db.execute_query("""
+            UPDATE schedule_jobs
+            SET statut = %s, progression = CASE WHEN %s = 'terminé' THEN 1 ELSE progression END,
+                resultat = %s, erreur = %s, duree_secondes = %s, finished_at = NOW(),
+                message = %s
+            WHERE id = %s
+        """, (
+            statut, statut, Json(resultat_json) if resultat_json is not None else None, erreur,
+            time.time() - started, "Terminé" if statut == 'terminé' else erreur, job_id
+        ), fetch=False)
@@ -0,0 +1,279 @@
+import math
+import random
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from src.room_index import ProfOccupancyIndex
+
+# Score: per enrolled student of an unplaced module, and per student conflict
+# (an extra exam the same day). By default a move that adds a conflict is always
+# rejected; with allow_conflicts the weights trade conflicts against unplaced
+# students, conflicts weighing more so a module is only forced in when it
+# clashes with few of its students
+UNPLACED_WEIGHT = 1
+CONFLICT_WEIGHT = 4
+T_START = 2.0
+T_END = 0.05
+
+class SimulatedAnnealing:
+    """Simulated-annealing improvement pass over an in-memory greedy schedule.
+    
+    Moves relocate one exam to another slot, swap the slots of two exams or
+    insert an unplaced module. A move is scored by an incremental delta: only
+    the students of the touched modules are re-counted, and only the touched
+    rooms (occupancy index) and professors (interval index) are re-checked.
+    Unless allow_conflicts is set, no accepted move increases student conflicts.
+    """
+    
+    def __init__(self, modules: List[Dict], placements: Dict[int, Tuple], enrollment, room_index,
+                 prof_by_dept: Dict[int, List[Dict]], professeurs: List[Dict],
+                 available_dates: List, time_slots: List[Tuple[int, int]], seed: Optional[int] = None,
+                 unplaced_weight: float = UNPLACED_WEIGHT, conflict_weight: float = CONFLICT_WEIGHT,
+                 allow_conflicts: bool = False):
+        # placements: {module_id: (date_idx, time_idx, allocation, prof_id)}, rooms already reserved in room_index
+        self.modules = {m['id']: m for m in modules}
+        self.placements = dict(placements)
+        self.unplaced = [mid for mid in self.modules if mid not in self.placements]
+        self.room_index = room_index
+        self.available_dates = available_dates
+        self.time_slots = time_slots
+        self.rng = random.Random(seed)
+        self.unplaced_weight = unplaced_weight
+        self.conflict_weight = conflict_weight
+        self.allow_conflicts = allow_conflicts
+        
+        self.students = {mid: enrollment.students_of(mid) for mid in self.modules}
+        # Rows may be cohorts: conflicts are counted in students through the row weights
+        self.weights = {mid: enrollment.student_weights[students] for mid, students in self.students.items()}
+        self.dept_profs = {
+            mid: [p['id'] for p in prof_by_dept.get(m['dept_id'], professeurs[:5])]
+            for mid, m in self.modules.items()
+        }
+        
+        self.student_day_count = np.zeros((enrollment.n_students, len(available_dates)), dtype=np.int16)
+        self.prof_index = ProfOccupancyIndex(max_per_day=3)
+        for mid, (date_idx, time_idx, allocation, prof_id) in self.placements.items():
+            self.student_day_count[self.students[mid], date_idx] += 1
+            self.prof_index.reserve(prof_id, date_idx, self._start_minute(time_idx), self.modules[mid]['duree_examen'])
+        
+        self.conflicts = int(enrollment.student_weights @ np.maximum(self.student_day_count - 1, 0).sum(axis=1))
+        self.unplaced_students = sum(self.modules[mid]['nb_inscrits'] for mid in self.unplaced)
+        
+        self.best_placements = dict(self.placements)
+        self.best_unplaced = list(self.unplaced)
+        self.best_conflicts = self.conflicts
+    
+    @property
+    def cost(self) -> float:
+        return self.unplaced_weight * self.unplaced_students + self.conflict_weight * self.conflicts
+    
+    def _start_minute(self, time_idx: int) -> int:
+        hour, minute = self.time_slots[time_idx]
+        return hour * 60 + minute
+    
+    def _remove_students(self, mid: int, date_idx: int) -> int:
+        students = self.students[mid]
+        delta = -int(self.weights[mid][self.student_day_count[students, date_idx] >= 2].sum())
+        self.student_day_count[students, date_idx] -= 1
+        return delta
+    
+    def _add_students(self, mid: int, date_idx: int) -> int:
+        students = self.students[mid]
+        delta = int(self.weights[mid][self.student_day_count[students, date_idx] >= 1].sum())
+        self.student_day_count[students, date_idx] += 1
+        return delta
+    
+    def _take_prof(self, mid: int, date_idx: int, start_minute: int, preferred: Optional[int] = None) -> Optional[int]:
+        candidates = self.dept_profs[mid]
+        if preferred in candidates:
+            candidates = [preferred] + [p for p in candidates if p != preferred]
+        duree = self.modules[mid]['duree_examen']
+        for prof_id in candidates:
+            if self.prof_index.is_free(prof_id, date_idx, start_minute, duree):
+                self.prof_index.reserve(prof_id, date_idx, start_minute, duree)
+                return prof_id
+        return None
+    
+    def _unplace(self, mid: int) -> Tuple[Tuple, int]:
+        placement = self.placements.pop(mid)
+        date_idx, time_idx, allocation, prof_id = placement
+        duree = self.modules[mid]['duree_examen']
+        for pos, _ in allocation:
+            self.room_index.release(pos, date_idx, self._start_minute(time_idx), duree)
+        self.prof_index.release(prof_id, date_idx, self._start_minute(time_idx), duree)
+        return placement, self._remove_students(mid, date_idx)
+    
+    def _place(self, mid: int, date_idx: int, time_idx: int, preferred_prof: Optional[int] = None) -> Optional[int]:
+        """Place a module; returns the student delta, or None when rooms or professors are unavailable"""
+        module = self.modules[mid]
+        start_minute = self._start_minute(time_idx)
+        allocation = self.room_index.allocate(
+            date_idx, start_minute, module['duree_examen'], module['nb_inscrits'], module.get('batiment')
+        )
+        if allocation is None:
+            return None
+        prof_id = self._take_prof(mid, date_idx, start_minute, preferred_prof)
+        if prof_id is None:
+            return None
+        for pos, _ in allocation:
+            self.room_index.reserve(pos, date_idx, start_minute, module['duree_examen'])
+        self.placements[mid] = (date_idx, time_idx, allocation, prof_id)
+        return self._add_students(mid, date_idx)
+    
+    def _restore(self, mid: int, placement: Tuple):
+        date_idx, time_idx, allocation, prof_id = placement
+        start_minute, duree = self._start_minute(time_idx), self.modules[mid]['duree_examen']
+        for pos, _ in allocation:
+            self.room_index.reserve(pos, date_idx, start_minute, duree)
+        self.prof_index.reserve(prof_id, date_idx, start_minute, duree)
+        self.placements[mid] = placement
+        self._add_students(mid, date_idx)
+    
+    def _pick_slot(self, mid: int) -> Tuple[int, int]:
+        """Random slot, biased half of the time towards the days with fewest clashes for this module"""
+        n_days = len(self.available_dates)
+        time_idx = self.rng.randrange(len(self.time_slots))
+        students = self.students[mid]
+        if len(students) == 0 or self.rng.random() < 0.5:
+            return self.rng.randrange(n_days), time_idx
+        clashes = self.weights[mid] @ (self.student_day_count[students] >= 1)
+        best_days = np.flatnonzero(clashes == clashes.min())
+        return int(best_days[self.rng.randrange(len(best_days))]), time_idx
+    
+    def _accept(self, conflict_delta: int, unplaced_delta: int, temperature: float) -> bool:
+        if conflict_delta > 0 and not self.allow_conflicts:
+            return False
+        delta = self.conflict_weight * conflict_delta + self.unplaced_weight * unplaced_delta
+        return delta <= 0 or self.rng.random() < math.exp(-delta / temperature)
+    
+    def _try_move(self, temperature: float) -> bool:
+        mid = self.rng.choice(list(self.placements))
+        date_idx, time_idx = self._pick_slot(mid)
+        if (date_idx, time_idx) == self.placements[mid][:2]:
+            return False
+        
+        old, delta = self._unplace(mid)
+        placed = self._place(mid, date_idx, time_idx, old[3])
+        if placed is None:
+            self._restore(mid, old)
+            return False
+        
+        delta += placed
+        if self._accept(delta, 0, temperature):
+            self.conflicts += delta
+            return True
+        self._unplace(mid)
+        self._restore(mid, old)
+        return False
+    
+    def _try_swap(self, temperature: float) -> bool:
+        a, b = self.rng.sample(list(self.placements), 2)
+        if self.placements[a][:2] == self.placements[b][:2]:
+            return False
+        
+        old_a, delta_a = self._unplace(a)
+        old_b, delta_b = self._unplace(b)
+        placed_a = self._place(a, old_b[0], old_b[1], old_a[3])
+        placed_b = self._place(b, old_a[0], old_a[1], old_b[3]) if placed_a is not None else None
+        if placed_b is None:
+            if placed_a is not None:
+                self._unplace(a)
+            self._restore(a, old_a)
+            self._restore(b, old_b)
+            return False
+        
+        delta = delta_a + delta_b + placed_a + placed_b
+        if self._accept(delta, 0, temperature):
+            self.conflicts += delta
+            return True
+        self._unplace(a)
+        self._unplace(b)
+        self._restore(a, old_a)
+        self._restore(b, old_b)
+        return False
+    
+    def _try_insert(self, temperature: float) -> bool:
+        mid = self.rng.choice(self.unplaced)
+        date_idx, time_idx = self._pick_slot(mid)
+        placed = self._place(mid, date_idx, time_idx)
+        if placed is None:
+            return False
+        
+        unplaced_delta = -self.modules[mid]['nb_inscrits']
+        if self._accept(placed, unplaced_delta, temperature):
+            self.unplaced.remove(mid)
+            self.unplaced_students += unplaced_delta
+            self.conflicts += placed
+            return True
+        self._unplace(mid)
+        return False
+    
+    def run(self, time_budget: float, progress: Optional[Callable[[float, int, int], None]] = None) -> Dict:
+        """Anneal until time_budget seconds; progress(elapsed, unplaced, conflicts) is called every 500 moves"""
+        start = time.time()
+        initial_unplaced = len(self.unplaced)
+        initial_conflicts = self.conflicts
+        best_cost = self.cost
+        iterations = 0
+        accepted = 0
+        
+        while self.cost > 0 and len(self.placements) >= 2:
+            elapsed = time.time() - start
+            if elapsed >= time_budget:
+                break
+            temperature = T_START * (T_END / T_START) ** (elapsed / time_budget)
+            
+            r = self.rng.random()
+            if self.unplaced and r < 0.3:
+                accepted += self._try_insert(temperature)
+            elif r < 0.65:
+                accepted += self._try_move(temperature)
+            else:
+                accepted += self._try_swap(temperature)
+            iterations += 1
+            if progress is not None and iterations % 500 == 0:
+                progress(elapsed, len(self.unplaced), self.conflicts)
+            
+            if self.cost < best_cost:
+                best_cost = self.cost
+                self.best_placements = dict(self.placements)
+                self.best_unplaced = list(self.unplaced)
+                self.best_conflicts = self.conflicts
+        
+        return {
+            'iterations': iterations,
+            'accepted': accepted,
+            'unplaced_before': initial_unplaced,
+            'unplaced_after': len(self.best_unplaced),
+            'conflicts_before': initial_conflicts,
+            'conflicts_after': self.best_conflicts,
+            'execution_time': time.time() - start
+        }
+    
+    def to_exams(self, periode_id: int) -> List[Dict]:
+        """Best schedule found, in the schedulers' exams_to_insert format"""
+        exams = []
+        for mid, (date_idx, time_idx, allocation, prof_id) in self.best_placements.items():
+            module = self.modules[mid]
+            slot_hour, slot_minute = self.time_slots[time_idx]
+            exams.append({
+                'module_id': mid,
+                'prof_id': prof_id,
+                'salle_id': self.room_index.salles[allocation[0][0]]['id'],
+                'salles': [(self.room_index.salles[pos]['id'], nb_places) for pos, nb_places in allocation],
+                'periode_id': periode_id,
+                'date_heure': datetime.combine(
+                    self.available_dates[date_idx],
+                    datetime.min.time().replace(hour=slot_hour, minute=slot_minute)
+                ),
+                'duree_minutes': module['duree_examen'],
+                'nb_inscrits': module['nb_inscrits']
+            })
+        return exams
+    
+    def failed_modules(self) -> List[Dict]:
+        return [
+            {'module': self.modules[mid]['nom'], 'nb_inscrits': self.modules[mid]['nb_inscrits']}
+            for mid in self.best_unplaced
+        ]
@@ -0,0 +1,115 @@
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from src.fast_scheduler import FastScheduler
+
+def score_echecs(solution: Dict) -> Tuple:
+    """Fewest unplaced modules, then fewest students without an exam"""
+    failed = solution['failed_modules']
+    return len(failed), sum(f['nb_inscrits'] for f in failed)
+
+def score_etudiants(solution: Dict) -> Tuple:
+    """Fewest students without an exam, then fewest unplaced modules"""
+    failed = solution['failed_modules']
+    return sum(f['nb_inscrits'] for f in failed), len(failed)
+
+def score_jours(solution: Dict) -> Tuple:
+    """Fewest unplaced modules, then the most compact session (fewest exam days)"""
+    days = {exam['date_heure'].date() for exam in solution['exams']}
+    return len(solution['failed_modules']), len(days)
+
+SCORES = {
+    'echecs': score_echecs,
+    'etudiants': score_etudiants,
+    'jours': score_jours
+}
+
+# Read-only problem data, set once per worker process by the pool initializer
+_worker_scheduler = None
+_worker_problem = None
+
+def _init_worker(scheduler_cls, problem: Dict):
+    global _worker_scheduler, _worker_problem
+    _worker_scheduler = scheduler_cls(None)
+    _worker_problem = problem
+
+def start_order(modules: List[Dict], start: int) -> List[Dict]:
+    """Start 0 keeps the scheduler's order; others perturb the size ordering by +/-30%"""
+    if start == 0:
+        return modules
+    rng = random.Random(start)
+    return sorted(modules, key=lambda m: m['nb_inscrits'] * rng.uniform(0.7, 1.3), reverse=True)
+
+def _run_start(start: int, improve: bool, time_budget: float) -> Dict:
+    modules = start_order(_worker_problem['modules'], start)
+    return _worker_scheduler.build_schedule(
+        _worker_problem, modules=modules, seed=start or None, improve=improve, time_budget=time_budget
+    )
+
+class MultiStartScheduler:
+    """Independent starts of one scheduler on a process pool; only the best schedule is saved.
+    
+    The problem is loaded once and handed to each worker through the pool
+    initializer, so tasks only carry their start number.
+    """
+    
+    def __init__(self, db, scheduler_cls=FastScheduler, n_starts: Optional[int] = None,
+                 max_workers: Optional[int] = None, score: Union[str, Callable[[Dict], Tuple]] = 'echecs',
+                 progress: Optional[Callable[[Dict], None]] = None):
+        self.db = db
+        self.scheduler_cls = scheduler_cls
+        self.scheduler = scheduler_cls(db, progress=progress)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.n_starts = n_starts or self.max_workers
+        self.score = SCORES[score] if isinstance(score, str) else score
+    
+    def generate_schedule(self, periode_id: int, annee_universitaire: str,
+                          improve: bool = False, time_budget: float = 10.0,
+                          precheck: bool = True) -> Tuple[bool, Dict]:
+        start_time = datetime.now()
+        self.scheduler._started = time.time()
+        
+        phase_start = self.scheduler._phase_start('chargement')
+        problem = self.scheduler.load_problem(periode_id, annee_universitaire)
+        self.scheduler._phase_end('chargement', phase_start, modules=len(problem['modules']))
+        
+        if precheck:
+            failure = self.scheduler.check_feasibility(problem, start_time)
+            if failure:
+                return False, failure
+        
+        print(f"Running {self.n_starts} starts of {self.scheduler_cls.__name__}...")
+        phase_start = self.scheduler._phase_start('demarrages')
+        solutions = self.run_starts(problem, improve, time_budget)
+        scores = [self.score(solution) for solution in solutions]
+        best_start = min(range(len(solutions)), key=lambda i: scores[i])
+        print(f"Best start: #{best_start} (score {scores[best_start]})")
+        
+        best = solutions[best_start]
+        best['stats'] = dict(best['stats'], starts=len(solutions), best_start=best_start,
+                             violations=self.scheduler.validate_solution(problem, best))
+        self.scheduler._phase_end('demarrages', phase_start, best_start=best_start,
+                                  failed=len(best['failed_modules']))
+        
+        phase_start = self.scheduler._phase_start('enregistrement')
+        result = self.scheduler.save_solution(periode_id, best, start_time)
+        self.scheduler._phase_end('enregistrement', phase_start, scheduled=result['scheduled'])
+        
+        return True, result
+    
+    def run_starts(self, problem: Dict, improve: bool = False, time_budget: float = 10.0) -> List[Dict]:
+        starts = list(range(self.n_starts))
+        workers = min(self.max_workers, self.n_starts)
+        solutions = [None] * len(starts)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self.scheduler_cls, problem)) as pool:
+            futures = {pool.submit(_run_start, start, improve, time_budget): start for start in starts}
+            for done, future in enumerate(as_completed(futures), 1):
+                solution = future.result()
+                solutions[futures[future]] = solution
+                self.scheduler._emit('progress', 'demarrages', done=done, total=len(starts),
+                                     placed=len(solution['exams']), failed=len(solution['failed_modules']))
+        return solutions
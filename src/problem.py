@@ -0,0 +1,226 @@
+import numpy as np
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+from src.enrollment import EnrollmentMatrix
+
+TIME_SLOTS = [(8, 30), (11, 0), (14, 30), (17, 0)]
+
+# Bumped whenever the .npz layout changes
+FORMAT_VERSION = 1
+
+class ProblemInstance:
+    """Array-backed snapshot of one period's scheduling problem.
+    
+    Modules, rooms and professors are stored column-wise as NumPy arrays (a missing
+    department is -1, a missing building ''), the enrollments as an EnrollmentMatrix.
+    An instance loads from Postgres in one pass, round-trips through .npz, and
+    to_problem() gives the dict the schedulers' build_schedule() consumes, so a
+    schedule can be built from a file without any database.
+    """
+    
+    __slots__ = (
+        'periode_id', 'date_debut', 'n_days', 'time_slots',
+        'module_ids', 'module_noms', 'module_codes', 'module_formations', 'module_durees',
+        'module_depts', 'module_batiments', 'module_sizes',
+        'salle_ids', 'salle_noms', 'salle_capacites', 'salle_batiments',
+        'prof_ids', 'prof_depts',
+        'enrollment'
+    )
+    
+    def __init__(self, periode_id: int, date_debut: date, n_days: int,
+                 module_ids, module_noms, module_codes, module_formations, module_durees,
+                 module_depts, module_batiments, module_sizes,
+                 salle_ids, salle_noms, salle_capacites, salle_batiments,
+                 prof_ids, prof_depts, enrollment: EnrollmentMatrix,
+                 time_slots: Optional[List[Tuple[int, int]]] = None):
+        self.periode_id = int(periode_id)
+        self.date_debut = date_debut
+        self.n_days = int(n_days)
+        self.time_slots = np.asarray(time_slots or TIME_SLOTS, dtype=np.int16).reshape(-1, 2)
+        
+        self.module_ids = np.asarray(module_ids, dtype=np.int32)
+        self.module_noms = np.asarray(module_noms, dtype=str)
+        self.module_codes = np.asarray(module_codes, dtype=str)
+        self.module_formations = np.asarray(module_formations, dtype=np.int32)
+        self.module_durees = np.asarray(module_durees, dtype=np.int16)
+        self.module_depts = np.asarray(module_depts, dtype=np.int32)
+        self.module_batiments = np.asarray(module_batiments, dtype=str)
+        self.module_sizes = np.asarray(module_sizes, dtype=np.int32)
+        
+        self.salle_ids = np.asarray(salle_ids, dtype=np.int32)
+        self.salle_noms = np.asarray(salle_noms, dtype=str)
+        self.salle_capacites = np.asarray(salle_capacites, dtype=np.int32)
+        self.salle_batiments = np.asarray(salle_batiments, dtype=str)
+        
+        self.prof_ids = np.asarray(prof_ids, dtype=np.int32)
+        self.prof_depts = np.asarray(prof_depts, dtype=np.int32)
+        
+        self.enrollment = enrollment
+    
+    @classmethod
+    def from_db(cls, db, periode_id: int, annee_universitaire: Optional[str] = None) -> 'ProblemInstance':
+        """Load a period on a single cursor, as plain tuples (no per-row dicts); the
+        enrollments are streamed by EnrollmentMatrix.load().
+        
+        Only modules with at least one active enrollment are kept, largest first
+        (ties by id), like get_modules_with_inscriptions().
+        """
+        with db.get_cursor(dict_cursor=False) as cursor:
+            cursor.execute("SELECT date_debut, date_fin FROM periodes_examen WHERE id = %s", (periode_id,))
+            date_debut, date_fin = cursor.fetchone()
+            
+            cursor.execute("""
+                SELECT m.id, m.nom, m.code, m.formation_id, m.duree_examen, f.dept_id, d.batiment
+                FROM modules m
+                LEFT JOIN formations f ON m.formation_id = f.id
+                LEFT JOIN departements d ON f.dept_id = d.id
+            """)
+            module_rows = cursor.fetchall()
+            
+            cursor.execute("""
+                SELECT id, nom, capacite_examen, batiment
+                FROM lieu_examen
+                WHERE disponible = TRUE
+                ORDER BY capacite_examen DESC
+            """)
+            salle_rows = cursor.fetchall()
+            
+            cursor.execute("SELECT id, dept_id FROM professeurs ORDER BY nom, prenom")
+            prof_rows = cursor.fetchall()
+        
+        enrollment = EnrollmentMatrix.load(db, annee_universitaire)
+        
+        sizes = enrollment.module_sizes()
+        module_rows = [row for row in module_rows if sizes.get(row[0], 0) > 0]
+        module_rows.sort(key=lambda row: (-sizes[row[0]], row[0]))
+        
+        return cls(
+            periode_id=periode_id,
+            date_debut=date_debut,
+            n_days=(date_fin - date_debut).days + 1,
+            module_ids=[r[0] for r in module_rows],
+            module_noms=[r[1] or '' for r in module_rows],
+            module_codes=[r[2] or '' for r in module_rows],
+            module_formations=[r[3] if r[3] is not None else -1 for r in module_rows],
+            module_durees=[r[4] for r in module_rows],
+            module_depts=[r[5] if r[5] is not None else -1 for r in module_rows],
+            module_batiments=[r[6] or '' for r in module_rows],
+            module_sizes=[sizes[r[0]] for r in module_rows],
+            salle_ids=[r[0] for r in salle_rows],
+            salle_noms=[r[1] or '' for r in salle_rows],
+            salle_capacites=[r[2] for r in salle_rows],
+            salle_batiments=[r[3] or '' for r in salle_rows],
+            prof_ids=[r[0] for r in prof_rows],
+            prof_depts=[r[1] if r[1] is not None else -1 for r in prof_rows],
+            enrollment=enrollment
+        )
+    
+    def save(self, path: str, compressed: bool = False):
+        """Write every array to one .npz (uncompressed by default: loading is then a plain read)"""
+        arrays = {
+            'format_version': np.array(FORMAT_VERSION),
+            'periode_id': np.array(self.periode_id),
+            'date_debut': np.array(self.date_debut, dtype='datetime64[D]'),
+            'n_days': np.array(self.n_days),
+            'time_slots': self.time_slots
+        }
+        for name in self.__slots__:
+            if name.startswith(('module_', 'salle_', 'prof_')):
+                arrays[name] = getattr(self, name)
+        for name, array in self.enrollment.to_arrays().items():
+            arrays[f'enrollment_{name}'] = array
+        
+        (np.savez_compressed if compressed else np.savez)(path, **arrays)
+    
+    @classmethod
+    def load(cls, path: str) -> 'ProblemInstance':
+        with np.load(path, allow_pickle=False) as data:
+            version = int(data['format_version'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported instance format {version} (expected {FORMAT_VERSION})")
+            
+            enrollment = EnrollmentMatrix.from_arrays(**{
+                name[len('enrollment_'):]: data[name] for name in data.files if name.startswith('enrollment_')
+            })
+            return cls(
+                periode_id=int(data['periode_id']),
+                date_debut=data['date_debut'].item(),
+                n_days=int(data['n_days']),
+                time_slots=[tuple(slot) for slot in data['time_slots'].tolist()],
+                enrollment=enrollment,
+                **{name: data[name] for name in cls.__slots__ if name.startswith(('module_', 'salle_', 'prof_'))}
+            )
+    
+    @property
+    def n_modules(self) -> int:
+        return len(self.module_ids)
+    
+    @property
+    def n_salles(self) -> int:
+        return len(self.salle_ids)
+    
+    @property
+    def n_professeurs(self) -> int:
+        return len(self.prof_ids)
+    
+    @property
+    def nbytes(self) -> int:
+        arrays = [getattr(self, name) for name in self.__slots__
+                  if name.startswith(('module_', 'salle_', 'prof_'))]
+        return sum(a.nbytes for a in arrays) + self.time_slots.nbytes + self.enrollment.nbytes
+    
+    def __repr__(self) -> str:
+        return (f"ProblemInstance(periode_id={self.periode_id}, {self.n_days} jours, "
+                f"{self.n_modules} modules, {self.n_salles} salles, {self.n_professeurs} professeurs, "
+                f"{self.enrollment.n_students} étudiants, {self.enrollment.n_enrollments} inscriptions)")
+    
+    def to_problem(self, cohorts: bool = True) -> Dict:
+        """The dict consumed by the schedulers' build_schedule() (see FastScheduler.load_problem).
+
+        With cohorts, 'enrollment' holds one weighted row per distinct module set
+        (EnrollmentMatrix.cohorts()) instead of one row per student.
+        """
+        modules = [
+            {
+                'id': module_id,
+                'nom': nom,
+                'code': code,
+                'formation_id': formation_id if formation_id >= 0 else None,
+                'duree_examen': duree,
+                'dept_id': dept_id if dept_id >= 0 else None,
+                'batiment': batiment or None,
+                'nb_inscrits': nb_inscrits
+            }
+            for module_id, nom, code, formation_id, duree, dept_id, batiment, nb_inscrits in zip(
+                self.module_ids.tolist(), self.module_noms.tolist(), self.module_codes.tolist(),
+                self.module_formations.tolist(), self.module_durees.tolist(), self.module_depts.tolist(),
+                self.module_batiments.tolist(), self.module_sizes.tolist()
+            )
+        ]
+        
+        salles = [
+            {'id': salle_id, 'nom': nom, 'capacite_examen': capacite, 'batiment': batiment or None}
+            for salle_id, nom, capacite, batiment in zip(
+                self.salle_ids.tolist(), self.salle_noms.tolist(),
+                self.salle_capacites.tolist(), self.salle_batiments.tolist()
+            )
+        ]
+        
+        professeurs = [
+            {'id': prof_id, 'dept_id': dept_id if dept_id >= 0 else None}
+            for prof_id, dept_id in zip(self.prof_ids.tolist(), self.prof_depts.tolist())
+        ]
+        prof_by_dept = {}
+        for p in professeurs:
+            prof_by_dept.setdefault(p['dept_id'], []).append(p)
+        
+        return {
+            'periode_id': self.periode_id,
+            'modules': modules,
+            'salles': salles,
+            'professeurs': professeurs,
+            'prof_by_dept': prof_by_dept,
+            'time_slots': [tuple(slot) for slot in self.time_slots.tolist()],
+            'available_dates': [self.date_debut + timedelta(days=i) for i in range(self.n_days)],
+            'enrollment': self.enrollment.cohorts() if cohorts else self.enrollment
+        }
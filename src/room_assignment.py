@@ -0,0 +1,103 @@
+from typing import List, Dict, Tuple
+from src.room_index import RoomOccupancyIndex
+
+def reassign_rooms(exams: List[Dict], salles: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Re-pack the rooms of a saved schedule, one time slot (exam start) at a time.
+    
+    Exams use the scheduler format (date_heure, duree_minutes, nb_inscrits, salles
+    as [(salle_id, nb_places)], optional batiment). Every other slot's occupancy is
+    kept in a RoomOccupancyIndex; the slot's exams are released and re-allocated
+    largest first, each to the smallest free fitting room (best-fit decreasing),
+    split over one building like at generation time. The new packing is kept only
+    if every exam still fits and it uses no more seats and no more rooms.
+    
+    Returns (changed exams with their new 'salle_id' / 'salles', per-slot report).
+    """
+    if not exams:
+        return [], []
+    
+    first_day = min(e['date_heure'] for e in exams).date()
+    n_days = (max(e['date_heure'] for e in exams).date() - first_day).days + 1
+    starts = {(e['date_heure'].hour, e['date_heure'].minute) for e in exams}
+    tick = RoomOccupancyIndex.grid_resolution(starts, (e['duree_minutes'] for e in exams))
+    room_index = RoomOccupancyIndex(salles, n_days, tick)
+    position = {s['id']: pos for pos, s in enumerate(room_index.salles)}
+    
+    def rooms_of(exam):
+        return exam.get('salles') or [(exam['salle_id'], exam['nb_inscrits'])]
+    
+    def place(exam, allocation, reserve=True):
+        # allocation: [(pos, nb_places)]
+        day = (exam['date_heure'].date() - first_day).days
+        minute = exam['date_heure'].hour * 60 + exam['date_heure'].minute
+        for pos, _ in allocation:
+            if reserve:
+                room_index.reserve(pos, day, minute, exam['duree_minutes'])
+            else:
+                room_index.release(pos, day, minute, exam['duree_minutes'])
+    
+    # Rooms that are no longer available are left where they are
+    current = {}
+    for i, exam in enumerate(exams):
+        allocation = [(position.get(salle_id), nb_places) for salle_id, nb_places in rooms_of(exam)]
+        current[i] = allocation
+        place(exam, [(pos, n) for pos, n in allocation if pos is not None])
+    
+    slots = {}
+    for i, exam in enumerate(exams):
+        slots.setdefault(exam['date_heure'], []).append(i)
+    
+    changed = []
+    report = []
+    for date_heure in sorted(slots):
+        members = slots[date_heure]
+        if any(pos is None for i in members for pos, _ in current[i]):
+            continue
+        
+        for i in members:
+            place(exams[i], current[i], reserve=False)
+        
+        proposal = {}
+        for i in sorted(members, key=lambda i: exams[i]['nb_inscrits'], reverse=True):
+            exam = exams[i]
+            day = (date_heure.date() - first_day).days
+            minute = date_heure.hour * 60 + date_heure.minute
+            allocation = room_index.allocate(day, minute, exam['duree_minutes'], exam['nb_inscrits'],
+                                             exam.get('batiment'))
+            if not allocation:
+                break
+            proposal[i] = allocation
+            place(exam, allocation)
+        
+        seats_before = sum(int(room_index.capacities[pos]) for i in members for pos, _ in current[i])
+        rooms_before = sum(len(current[i]) for i in members)
+        seats_after = sum(int(room_index.capacities[pos]) for a in proposal.values() for pos, _ in a)
+        rooms_after = sum(len(a) for a in proposal.values())
+        
+        better = (len(proposal) == len(members)
+                  and seats_after <= seats_before and rooms_after <= rooms_before
+                  and (seats_after, rooms_after) != (seats_before, rooms_before))
+        if not better:
+            for i, allocation in proposal.items():
+                place(exams[i], allocation, reserve=False)
+            for i in members:
+                place(exams[i], current[i])
+            continue
+        
+        for i, allocation in proposal.items():
+            if sorted(pos for pos, _ in allocation) == sorted(pos for pos, _ in current[i]):
+                continue
+            salles_exam = [(room_index.salles[pos]['id'], nb_places) for pos, nb_places in allocation]
+            changed.append(dict(exams[i], salle_id=salles_exam[0][0], salles=salles_exam))
+        report.append({
+            'date_heure': date_heure,
+            'examens': len(members),
+            'places_avant': seats_before,
+            'places_apres': seats_after,
+            'places_liberees': seats_before - seats_after,
+            'salles_avant': rooms_before,
+            'salles_apres': rooms_after,
+            'salles_liberees': rooms_before - rooms_after
+        })
+    
+    return changed, report
@@ -0,0 +1,143 @@
+import numpy as np
+from math import gcd
+from typing import List, Dict, Optional, Iterable, Tuple
+
+class RoomOccupancyIndex:
+    """Rooms x time-grid occupancy with a capacity-sorted free-room lookup.
+    
+    Rooms are stored by ascending capacite_examen, so "smallest free room with
+    capacity >= N" is a binary search on the capacity array followed by one
+    vectorised scan of the free mask for the requested interval.
+    """
+    
+    def __init__(self, salles: List[Dict], n_days: int, tick_minutes: int = 30):
+        self.salles = sorted(salles, key=lambda s: (s['capacite_examen'], s['id']))
+        self.room_ids = np.array([s['id'] for s in self.salles], dtype=np.int32)
+        self.capacities = np.array([s['capacite_examen'] for s in self.salles], dtype=np.int32)
+        self.batiment_names = sorted({s.get('batiment') or '' for s in self.salles})
+        self._batiment_lookup = {name: code for code, name in enumerate(self.batiment_names)}
+        self.batiment_codes = np.array(
+            [self._batiment_lookup[s.get('batiment') or ''] for s in self.salles], dtype=np.int32
+        )
+        self.tick_minutes = tick_minutes
+        self.ticks_per_day = (24 * 60) // tick_minutes
+        self.busy = np.zeros((len(self.salles), n_days, self.ticks_per_day), dtype=bool)
+    
+    @staticmethod
+    def grid_resolution(time_slots: Iterable[Tuple[int, int]], durations: Iterable[int]) -> int:
+        """Coarsest tick (minutes) on which every slot start and every exam end falls"""
+        tick = 24 * 60
+        for hour, minute in time_slots:
+            tick = gcd(tick, hour * 60 + minute)
+        for duree in durations:
+            tick = gcd(tick, int(duree))
+        return max(tick, 1)
+    
+    @property
+    def max_capacity(self) -> int:
+        return int(self.capacities[-1]) if len(self.capacities) else 0
+    
+    def _ticks(self, start_minute: int, duree_minutes: int) -> Tuple[int, int]:
+        t0 = start_minute // self.tick_minutes
+        t1 = -(-(start_minute + duree_minutes) // self.tick_minutes)  # ceil: partial ticks block the room
+        return t0, min(t1, self.ticks_per_day)
+    
+    def free_mask(self, day: int, start_minute: int, duree_minutes: int, first: int = 0) -> np.ndarray:
+        t0, t1 = self._ticks(start_minute, duree_minutes)
+        return ~self.busy[first:, day, t0:t1].any(axis=1)
+    
+    def is_free(self, pos: int, day: int, start_minute: int, duree_minutes: int) -> bool:
+        t0, t1 = self._ticks(start_minute, duree_minutes)
+        return not self.busy[pos, day, t0:t1].any()
+    
+    def smallest_free(self, day: int, start_minute: int, duree_minutes: int, min_capacity: int) -> Optional[int]:
+        """Position of the smallest free room with capacity >= min_capacity, or None"""
+        first = int(np.searchsorted(self.capacities, min_capacity, side='left'))
+        if first >= len(self.capacities):
+            return None
+        free = self.free_mask(day, start_minute, duree_minutes, first)
+        hit = int(np.argmax(free))
+        return first + hit if free[hit] else None
+    
+    def largest_free(self, day: int, start_minute: int, duree_minutes: int, limit: Optional[int] = None) -> Optional[int]:
+        """Position of the largest free room, optionally among the `limit` largest rooms only"""
+        first = 0 if limit is None else max(len(self.capacities) - limit, 0)
+        free = self.free_mask(day, start_minute, duree_minutes, first)
+        if not free.any():
+            return None
+        return first + len(free) - 1 - int(np.argmax(free[::-1]))
+    
+    def free_positions(self, day: int, start_minute: int, duree_minutes: int, min_capacity: int = 0) -> np.ndarray:
+        """Positions of every free room with capacity >= min_capacity, smallest first"""
+        first = int(np.searchsorted(self.capacities, min_capacity, side='left'))
+        return first + np.flatnonzero(self.free_mask(day, start_minute, duree_minutes, first))
+    
+    def allocate(self, day: int, start_minute: int, duree_minutes: int, nb_inscrits: int,
+                 batiment: Optional[str] = None) -> Optional[List[Tuple[int, int]]]:
+        """Rooms for nb_inscrits students at one slot as [(pos, nb_places)], or None.
+        
+        A single fitting room is preferred. Otherwise the exam is split over the
+        fewest free rooms of one building (the requested building first, else the
+        building whose free seats fit best), and only spread across buildings when
+        no single building has enough free seats.
+        """
+        pos = self.smallest_free(day, start_minute, duree_minutes, nb_inscrits)
+        if pos is not None:
+            return [(pos, nb_inscrits)]
+        
+        free = np.flatnonzero(self.free_mask(day, start_minute, duree_minutes))
+        if self.capacities[free].sum() < nb_inscrits:
+            return None
+        
+        seats = np.bincount(self.batiment_codes[free], weights=self.capacities[free],
+                            minlength=len(self.batiment_names))
+        candidates = np.flatnonzero(seats >= nb_inscrits)
+        if len(candidates):
+            code = self._batiment_lookup.get(batiment or '')
+            if code is None or seats[code] < nb_inscrits:
+                code = candidates[np.argmin(seats[candidates])]
+            free = free[self.batiment_codes[free] == code]
+        
+        return self._split(free.tolist(), nb_inscrits)
+    
+    def _split(self, pool: List[int], nb_inscrits: int) -> List[Tuple[int, int]]:
+        """Largest rooms first until the remainder fits in one room, then the smallest such room"""
+        allocation = []
+        remaining = nb_inscrits
+        while remaining > 0 and pool:
+            fit = int(np.searchsorted(self.capacities[pool], remaining, side='left'))
+            if fit < len(pool):
+                allocation.append((pool[fit], remaining))
+                break
+            pos = pool.pop()
+            allocation.append((pos, int(self.capacities[pos])))
+            remaining -= int(self.capacities[pos])
+        return allocation
+    
+    def reserve(self, pos: int, day: int, start_minute: int, duree_minutes: int):
+        t0, t1 = self._ticks(start_minute, duree_minutes)
+        self.busy[pos, day, t0:t1] = True
+    
+    def release(self, pos: int, day: int, start_minute: int, duree_minutes: int):
+        t0, t1 = self._ticks(start_minute, duree_minutes)
+        self.busy[pos, day, t0:t1] = False
+
+
+class ProfOccupancyIndex:
+    """Exam intervals per professor and day: at most max_per_day exams, none overlapping"""
+    
+    def __init__(self, max_per_day: int = 3):
+        self.max_per_day = max_per_day
+        self.intervals = {}  # {(prof_id, day): [(start_minute, end_minute)]}
+    
+    def is_free(self, prof_id: int, day: int, start_minute: int, duree_minutes: int) -> bool:
+        booked = self.intervals.get((prof_id, day), ())
+        end_minute = start_minute + duree_minutes
+        return (len(booked) < self.max_per_day
+                and all(end <= start_minute or end_minute <= start for start, end in booked))
+    
+    def reserve(self, prof_id: int, day: int, start_minute: int, duree_minutes: int):
+        self.intervals.setdefault((prof_id, day), []).append((start_minute, start_minute + duree_minutes))
+    
+    def release(self, prof_id: int, day: int, start_minute: int, duree_minutes: int):
+        self.intervals[(prof_id, day)].remove((start_minute, start_minute + duree_minutes))
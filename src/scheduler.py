@@ -1,7 +1,11 @@
 from datetime import datetime, timedelta
 from typing import List, Dict, Tuple
 import random
+import numpy as np
 from src.constraints import ConstraintChecker
+from src.enrollment import EnrollmentMatrix
+from src.room_index import RoomOccupancyIndex
+from src.room_assignment import reassign_rooms
 
 class ExamScheduler:
     def __init__(self, db):
@@ -19,14 +23,13 @@ class ExamScheduler:
         date_debut = periode['date_debut']
         date_fin = periode['date_fin']
         
-        modules = self.db.get_modules_with_inscriptions()
+        modules = self.db.get_modules_with_inscriptions(annee_universitaire)
         modules = sorted(modules, key=lambda x: x['nb_inscrits'], reverse=True)
         
         salles = self.db.get_lieu_examen()
         professeurs = self.db.get_professeurs()
         
-        self.db.delete_all_examens(periode_id)
-        
+        # Built in memory, then staged and swapped in with one transaction (like FastScheduler)
         scheduled_exams = []
         failed_modules = []
         
@@ -34,26 +37,25 @@ class ExamScheduler:
         available_dates = [(date_debut + timedelta(days=i)) for i in range((date_fin - date_debut).days + 1)]
         
         # In-memory tracking for fast constraint checking
-        room_schedule = {}  # {(salle_id, datetime): True}
+        tick = RoomOccupancyIndex.grid_resolution(time_slots, (m['duree_examen'] for m in modules))
+        room_index = RoomOccupancyIndex(salles, len(available_dates), tick)  # rooms x time grid
         prof_schedule = {}  # {(prof_id, date): count}
-        student_exams = {}  # {(student_id, date): count}
-        
-        # Pre-load student enrollments
-        enrollments = self.db.execute_query(
-            "SELECT module_id, etudiant_id FROM inscriptions WHERE statut = 'inscrit'"
-        )
-        module_students = {}
-        for enroll in enrollments:
-            if enroll['module_id'] not in module_students:
-                module_students[enroll['module_id']] = []
-            module_students[enroll['module_id']].append(enroll['etudiant_id'])
+        
+        # Pre-load student enrollments, grouped into cohorts with identical module sets
+        enrollment = EnrollmentMatrix.load(self.db, annee_universitaire).cohorts()
+        self.constraint_checker.enrollment = enrollment
+        print(f"Cohorts: {enrollment.n_represented} students -> {enrollment.n_students} cohorts "
+              f"(x{enrollment.compression_ratio:.1f})")
+        
+        # Cohort x day exam counts, checked with one vectorised gather per module
+        student_day_count = np.zeros((enrollment.n_students, len(available_dates)), dtype=np.uint8)
         
         for module in modules:
             scheduled = False
             module_id = module['id']
-            students = module_students.get(module_id, [])
+            students = enrollment.students_of(module_id)
             
-            for attempt_date in available_dates:
+            for date_idx, attempt_date in enumerate(available_dates):
                 if scheduled:
                     break
                     
@@ -66,22 +68,32 @@ class ExamScheduler:
                         datetime.min.time().replace(hour=slot_hour, minute=slot_minute)
                     )
                     
-                    suitable_salles = [
-                        s for s in salles 
-                        if s['capacite_examen'] >= module['nb_inscrits']
-                        and (s['id'], exam_datetime) not in room_schedule
+                    # Up to 3 single fitting rooms, else one split over several rooms
+                    start_minute = slot_hour * 60 + slot_minute
+                    allocations = [
+                        [(pos, module['nb_inscrits'])]
+                        for pos in room_index.free_positions(
+                            date_idx, start_minute, module['duree_examen'], module['nb_inscrits']
+                        )[:3].tolist()
                     ]
+                    if not allocations:
+                        split = room_index.allocate(
+                            date_idx, start_minute, module['duree_examen'],
+                            module['nb_inscrits'], module.get('batiment')
+                        )
+                        allocations = [split] if split else []
                     
-                    if not suitable_salles:
+                    if not allocations:
                         continue
                     
                     dept_profs = [p for p in professeurs if p['dept_id'] == module['dept_id']]
                     if not dept_profs:
                         dept_profs = professeurs[:5]
                     
-                    for salle in suitable_salles[:3]:
+                    for allocation in allocations:
                         if scheduled:
                             break
+                        salle = room_index.salles[allocation[0][0]]
                         
                         for prof in dept_profs[:3]:
                             # Fast in-memory constraint checks
@@ -91,58 +103,35 @@ class ExamScheduler:
                                 continue
                             
                             # Check student conflicts
-                            student_conflict = False
-                            for student_id in students:
-                                student_key = (student_id, attempt_date)
-                                if student_exams.get(student_key, 0) >= 2:
-                                    student_conflict = True
-                                    break
-                            
-                            if student_conflict:
+                            if len(students) > 0 and student_day_count[students, date_idx].max() >= 2:
                                 continue
                             
                             # All constraints passed - schedule exam
-                            try:
-                                examen_id = self.db.create_examen(
-                                    module_id,
-                                    prof['id'],
-                                    salle['id'],
-                                    periode_id,
-                                    exam_datetime,
-                                    module['duree_examen'],
-                                    module['nb_inscrits']
-                                )
-                                
-                                if examen_id:
-                                    # Update in-memory tracking
-                                    room_schedule[(salle['id'], exam_datetime)] = True
-                                    prof_schedule[prof_key] = prof_count + 1
-                                    for student_id in students:
-                                        student_key = (student_id, attempt_date)
-                                        student_exams[student_key] = student_exams.get(student_key, 0) + 1
-                                    
-                                    # Create surveillances
-                                    self.db.create_surveillance(examen_id, prof['id'], 'responsable')
-                                    
-                                    nb_surveillants = min(2, len(dept_profs) - 1)
-                                    for i, surveillant in enumerate(dept_profs):
-                                        if i >= nb_surveillants or surveillant['id'] == prof['id']:
-                                            break
-                                        self.db.create_surveillance(examen_id, surveillant['id'], 'surveillant')
-                                    
-                                    scheduled_exams.append({
-                                        'module_id': module_id,
-                                        'prof_responsable_id': prof['id'],
-                                        'salle_id': salle['id'],
-                                        'periode_id': periode_id,
-                                        'date_heure': exam_datetime,
-                                        'duree_minutes': module['duree_examen'],
-                                        'nb_inscrits': module['nb_inscrits']
-                                    })
-                                    scheduled = True
+                            for pos, nb_places in allocation:
+                                room_index.reserve(pos, date_idx, start_minute, module['duree_examen'])
+                            prof_schedule[prof_key] = prof_count + 1
+                            student_day_count[students, date_idx] += 1
+                            
+                            surveillants = []
+                            nb_surveillants = min(2, len(dept_profs) - 1)
+                            for i, surveillant in enumerate(dept_profs):
+                                if i >= nb_surveillants or surveillant['id'] == prof['id']:
                                     break
-                            except Exception as e:
-                                continue
+                                surveillants.append(surveillant['id'])
+                            
+                            scheduled_exams.append({
+                                'module_id': module_id,
+                                'prof_id': prof['id'],
+                                'salle_id': salle['id'],
+                                'salles': [(room_index.salles[pos]['id'], nb_places) for pos, nb_places in allocation],
+                                'surveillants': surveillants,
+                                'periode_id': periode_id,
+                                'date_heure': exam_datetime,
+                                'duree_minutes': module['duree_examen'],
+                                'nb_inscrits': module['nb_inscrits']
+                            })
+                            scheduled = True
+                            break
             
             if not scheduled:
                 failed_modules.append({
@@ -150,6 +139,10 @@ class ExamScheduler:
                     'nb_inscrits': module['nb_inscrits']
                 })
         
+        print(f"Staging {len(scheduled_exams)} exams...")
+        self.db.stage_examens(periode_id, scheduled_exams)
+        self.db.swap_examens(periode_id)
+        
         end_time = datetime.now()
         execution_time = (end_time - start_time).total_seconds()
         
@@ -162,54 +155,38 @@ class ExamScheduler:
             'failed_modules': failed_modules,
             'execution_time': execution_time,
             'conflicts': conflicts,
-            'total_conflicts': total_conflicts
+            'total_conflicts': total_conflicts,
+            'cohorts': enrollment.n_students,
+            'compression_ratio': round(enrollment.compression_ratio, 1)
         }
         
         return True, result
     
-    def optimize_schedule(self, periode_id: int):
-        query = """
-            SELECT ex.id, ex.salle_id, ex.nb_inscrits, l.capacite_examen,
-                   l.capacite_examen - ex.nb_inscrits as espace_libre
+    def optimize_schedule(self, periode_id: int) -> Dict:
+        """Re-pack the rooms of a saved period in memory and apply them with one bulk update.
+        
+        Returns the moved exam count and, per time slot, the seats and rooms freed.
+        """
+        exams = self.db.execute_query("""
+            SELECT ex.id, ex.module_id, ex.salle_id, ex.date_heure, ex.duree_minutes, ex.nb_inscrits,
+                   d.batiment,
+                   (SELECT ARRAY_AGG(ARRAY[es.salle_id, es.nb_places] ORDER BY es.salle_id)
+                    FROM examen_salles es WHERE es.examen_id = ex.id) as salles
             FROM examens ex
-            JOIN lieu_examen l ON ex.salle_id = l.id
+            JOIN modules m ON ex.module_id = m.id
+            LEFT JOIN formations f ON m.formation_id = f.id
+            LEFT JOIN departements d ON f.dept_id = d.id
             WHERE ex.periode_id = %s
-              AND l.capacite_examen - ex.nb_inscrits > 10
-            ORDER BY espace_libre DESC
-        """
-        
-        underutilized = self.db.execute_query(query, (periode_id,))
-        
-        optimizations = 0
-        for exam in underutilized:
-            smaller_rooms = self.db.execute_query("""
-                SELECT id, nom, capacite_examen
-                FROM lieu_examen
-                WHERE capacite_examen >= %s
-                  AND capacite_examen < %s
-                ORDER BY capacite_examen ASC
-                LIMIT 1
-            """, (exam['nb_inscrits'], exam['capacite_examen']))
-            
-            if smaller_rooms:
-                new_room = smaller_rooms[0]
-                exam_data = self.db.execute_query(
-                    "SELECT date_heure, duree_minutes FROM examens WHERE id = %s",
-                    (exam['id'],)
-                )[0]
-                
-                valid, _ = self.constraint_checker.check_room_availability(
-                    new_room['id'],
-                    exam_data['date_heure'],
-                    exam_data['duree_minutes']
-                )
-                
-                if valid:
-                    self.db.execute_query(
-                        "UPDATE examens SET salle_id = %s WHERE id = %s",
-                        (new_room['id'], exam['id']),
-                        fetch=False
-                    )
-                    optimizations += 1
-        
-        return optimizations
+        """, (periode_id,)) or []
+        for exam in exams:
+            exam['salles'] = [tuple(pair) for pair in exam['salles'] or []]
+        
+        changed, slots = reassign_rooms(exams, self.db.get_lieu_examen())
+        self.db.bulk_update_salles(changed)
+        
+        return {
+            'examens_deplaces': len(changed),
+            'places_liberees': sum(s['places_liberees'] for s in slots),
+            'salles_liberees': sum(s['salles_liberees'] for s in slots),
+            'creneaux': slots
+        }
@@ -0,0 +1,103 @@
+import numpy as np
+from datetime import date
+from typing import Optional, Tuple
+from src.enrollment import EnrollmentMatrix
+from src.problem import ProblemInstance
+
+def generate_instance(n_etudiants: int, seed: Optional[int] = None,
+                      etudiants_par_formation: int = 124,
+                      formations_par_dept: int = 15,
+                      modules_par_formation: Tuple[int, int] = (8, 12),
+                      min_modules_par_etudiant: int = 6,
+                      profs_par_dept: Tuple[int, int] = (15, 25),
+                      salles_par_dept: int = 15,
+                      amphis_par_dept: int = 3,
+                      capacite_examen: int = 20,
+                      durees: Tuple[int, ...] = (90, 120, 150, 180),
+                      n_days: int = 27,
+                      date_debut: date = date(2025, 1, 20)) -> ProblemInstance:
+    """Synthetic ProblemInstance with the structure of scripts/generate_data.py, built in memory.
+    
+    Departments, formations and rooms scale with the student count: one department
+    (and building) per formations_par_dept formations, about etudiants_par_formation
+    students (+/-20) per formation. Each student takes a random subset of
+    min_modules_par_etudiant..all of their formation's modules, like
+    generate_inscriptions(). Same seed, same instance.
+    """
+    rng = np.random.default_rng(seed)
+    
+    n_formations = max(round(n_etudiants / etudiants_par_formation), 1)
+    n_depts = -(-n_formations // formations_par_dept)
+    formation_depts = np.arange(n_formations, dtype=np.int32) // formations_par_dept
+    
+    # Modules: 8..12 per formation, ids 1..n grouped by formation
+    low, high = modules_par_formation
+    modules_per_formation = rng.integers(low, high + 1, size=n_formations)
+    module_formations = np.repeat(np.arange(n_formations, dtype=np.int32), modules_per_formation)
+    module_starts = np.concatenate(([0], np.cumsum(modules_per_formation)[:-1]))
+    n_modules = len(module_formations)
+    
+    # Students: +/-20 around etudiants_par_formation each, trimmed or topped up to exactly n_etudiants
+    counts = rng.integers(max(etudiants_par_formation - 20, 1), etudiants_par_formation + 21, size=n_formations)
+    student_formations = np.repeat(np.arange(n_formations, dtype=np.int32), counts)
+    if len(student_formations) > n_etudiants:
+        student_formations = np.sort(rng.choice(student_formations, size=n_etudiants, replace=False))
+    elif len(student_formations) < n_etudiants:
+        extra = rng.integers(0, n_formations, size=n_etudiants - len(student_formations), dtype=np.int32)
+        student_formations = np.sort(np.concatenate((student_formations, extra)))
+    
+    # Enrollments: every (student, formation module) pair gets a random key, and each
+    # student keeps their k lowest keys, k uniform in min_modules_par_etudiant..n_f
+    n_offered = modules_per_formation[student_formations]
+    n_taken = rng.integers(np.minimum(min_modules_par_etudiant, n_offered), n_offered + 1)
+    pair_students = np.repeat(np.arange(n_etudiants, dtype=np.int32), n_offered)
+    pair_offsets = np.arange(len(pair_students)) - np.repeat(np.cumsum(n_offered) - n_offered, n_offered)
+    pair_modules = module_starts[student_formations[pair_students]] + pair_offsets
+    
+    order = np.lexsort((rng.random(len(pair_students)), pair_students))
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = pair_offsets  # pairs are grouped by student, so offsets double as ranks within a group
+    keep = ranks < n_taken[pair_students]
+    enrollment = EnrollmentMatrix(pair_modules[keep] + 1, pair_students[keep] + 1)
+    
+    # Only modules with students, largest first (ties by id), like ProblemInstance.from_db()
+    sizes = np.zeros(n_modules, dtype=np.int32)
+    sizes[enrollment.module_ids - 1] = np.diff(enrollment.module_indptr)
+    kept_modules = np.flatnonzero(sizes > 0)
+    kept_modules = kept_modules[np.lexsort((kept_modules, -sizes[kept_modules]))]
+    
+    module_depts = formation_depts[module_formations[kept_modules]]
+    batiments = np.array([f"Bâtiment {dept + 1}" for dept in range(n_depts)], dtype=str)
+    
+    # Rooms: salles then amphis in each department's building
+    rooms_per_dept = salles_par_dept + amphis_par_dept
+    salle_depts = np.repeat(np.arange(n_depts), rooms_per_dept)
+    salle_rank = np.tile(np.arange(rooms_per_dept), n_depts)
+    salle_noms = [
+        f"Salle {dept + 1}-{rank + 1:02d}" if rank < salles_par_dept else f"Amphi {dept + 1}-{rank - salles_par_dept + 1}"
+        for dept, rank in zip(salle_depts.tolist(), salle_rank.tolist())
+    ]
+    
+    low, high = profs_par_dept
+    prof_depts = np.repeat(np.arange(n_depts, dtype=np.int32), rng.integers(low, high + 1, size=n_depts))
+    
+    return ProblemInstance(
+        periode_id=0,
+        date_debut=date_debut,
+        n_days=n_days,
+        module_ids=kept_modules + 1,
+        module_noms=[f"Module {module_id}" for module_id in (kept_modules + 1).tolist()],
+        module_codes=[f"SYN-{module_id:06d}" for module_id in (kept_modules + 1).tolist()],
+        module_formations=module_formations[kept_modules] + 1,
+        module_durees=rng.choice(durees, size=n_modules)[kept_modules],
+        module_depts=module_depts + 1,
+        module_batiments=batiments[module_depts],
+        module_sizes=sizes[kept_modules],
+        salle_ids=np.arange(1, len(salle_depts) + 1),
+        salle_noms=salle_noms,
+        salle_capacites=np.full(len(salle_depts), capacite_examen),
+        salle_batiments=batiments[salle_depts],
+        prof_ids=np.arange(1, len(prof_depts) + 1),
+        prof_depts=prof_depts + 1,
+        enrollment=enrollment
+    )